@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+雷达帧解码吞吐量测试
+
+对比逐帧 LD_DataHandle 和批量 LD_DataHandleBatch:
+    python3 benchmarks/bench_lidar_decode.py --frames 20000 --batch 64
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+
+from laser import LD_DataHandle, LD_DataHandleBatch, LD_F_LEN
+from generators import synthetic_stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description='雷达帧解码吞吐量测试')
+    parser.add_argument('--frames', type=int, default=20000, help='合成数据帧数')
+    parser.add_argument('--batch', type=int, default=64, help='批量解码每批帧数')
+    args = parser.parse_args()
+
+    data = synthetic_stream(args.frames, noise=0)
+    frames = [memoryview(data)[i:i + LD_F_LEN] for i in range(0, len(data), LD_F_LEN)]
+
+    t0 = time.perf_counter()
+    for frame in frames:
+        LD_DataHandle(frame)
+    dt = time.perf_counter() - t0
+    print(f"逐帧 LD_DataHandle        {len(frames) / dt:>12.0f} 帧/s")
+
+    step = args.batch * LD_F_LEN
+    t0 = time.perf_counter()
+    for i in range(0, len(data), step):
+        LD_DataHandleBatch(data[i:i + step])
+    dt = time.perf_counter() - t0
+    print(f"批量 LD_DataHandleBatch   {len(frames) / dt:>12.0f} 帧/s (每批 {args.batch} 帧)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+雷达帧读取吞吐量测试
+
+对比逐字节状态机和 LidarFrameReader 分块读取, 数据源为合成字节流或录制的原始串口数据:
+    python3 benchmarks/bench_lidar_reader.py
+    python3 benchmarks/bench_lidar_reader.py --file /tmp/lidar_raw.bin
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+
+from laser import LidarFrameReader, LD_HEADER1, LD_HEADER2, LD_F_LEN
+from generators import synthetic_stream
+
+
+class FakeSerial:
+    """按串口接口回放字节流, 每次最多返回 chunk 字节"""
+
+    def __init__(self, data, chunk=4096):
+        self.data = data
+        self.pos = 0
+        self.chunk = chunk
+
+    @property
+    def in_waiting(self):
+        return min(len(self.data) - self.pos, self.chunk)
+
+    def read(self, size=1):
+        out = self.data[self.pos:self.pos + size]
+        self.pos += len(out)
+        return out
+
+
+def legacy_count(ser):
+    """原逐字节状态机"""
+    frames = 0
+    con = 0
+    buf = [0] * 100
+    while ser.in_waiting:
+        res = ser.read(1)[0]
+        if con < 2:
+            if (con == 0 and res == LD_HEADER1) or (con == 1 and res == LD_HEADER2):
+                buf[con] = res
+                con += 1
+        else:
+            buf[con] = res
+            con += 1
+            if con >= LD_F_LEN:
+                frames += 1
+                con = 0
+    return frames
+
+
+def reader_count(ser):
+    reader = LidarFrameReader(ser)
+    frames = 0
+    while ser.in_waiting:
+        for _ in reader.poll():
+            frames += 1
+    return frames, reader
+
+
+def run(name, func, data):
+    t0 = time.perf_counter()
+    result = func(FakeSerial(data))
+    dt = time.perf_counter() - t0
+    frames = result[0] if isinstance(result, tuple) else result
+    print(f"{name:<18} {frames:>8} 帧 {dt * 1000:>9.1f} ms "
+          f"{frames / dt:>12.0f} 帧/s {len(data) / dt / 1e6:>8.2f} MB/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='雷达帧读取吞吐量测试')
+    parser.add_argument('--file', help='录制的原始串口数据文件')
+    parser.add_argument('--frames', type=int, default=20000, help='合成数据帧数')
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_stream(args.frames)
+    print(f"数据量: {len(data)} 字节")
+
+    run('逐字节状态机', legacy_count, data)
+    _, reader = run('LidarFrameReader', reader_count, data)
+    print(f"重同步 {reader.resyncs} 次, 丢弃 {reader.dropped_bytes} 字节")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NMEA解析吞吐量测试
+
+在合成的多兆字节NMEA日志上对比原来基于 str 的逐行解析和 GNSS._parse_nmea (逐行) / GNSS._parse_lines (分块):
+    python3 benchmarks/bench_nmea.py --mb 4
+
+完整日志上新实现额外解析 GSA/GSV, 另外在只含 GGA/RMC 的日志上比较相同工作量下的速度。
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+
+from GNSS import GNSS
+from generators import synthetic_log
+
+
+class LegacyParser:
+    """原 GNSS._parse_nmea 的实现 (逐字符异或校验, if/elif 分发, str 字段, GSA/GSV 未实现)"""
+
+    def __init__(self):
+        self.data_lock = threading.Lock()
+        self.gps_data = {}
+
+    def parse(self, sentence):
+        try:
+            if not self._validate_checksum(sentence):
+                return
+            parts = sentence.split(',')
+            sentence_type = parts[0][3:]
+            with self.data_lock:
+                if sentence_type == 'GGA':
+                    self._parse_gga(parts)
+                elif sentence_type == 'RMC':
+                    self._parse_rmc(parts)
+                elif sentence_type == 'GSA':
+                    pass
+                elif sentence_type == 'GSV':
+                    pass
+        except Exception as e:
+            print(f"解析NMEA数据错误: {e}")
+
+    @staticmethod
+    def _validate_checksum(sentence):
+        if '*' not in sentence:
+            return False
+        try:
+            data, checksum = sentence.split('*')
+            calculated_checksum = 0
+            for char in data[1:]:
+                calculated_checksum ^= ord(char)
+            return format(calculated_checksum, '02X') == checksum.upper()
+        except:
+            return False
+
+    def _parse_gga(self, parts):
+        if len(parts) >= 13:
+            if parts[1]:
+                self.gps_data['timestamp'] = self._parse_time(parts[1])
+            if parts[2] and parts[3]:
+                self.gps_data['latitude'] = self._parse_coordinate(parts[2], parts[3])
+            if parts[4] and parts[5]:
+                self.gps_data['longitude'] = self._parse_coordinate(parts[4], parts[5])
+            if parts[6]:
+                self.gps_data['fix_quality'] = int(parts[6])
+            if parts[7]:
+                self.gps_data['satellites'] = int(parts[7])
+            if parts[8]:
+                self.gps_data['hdop'] = float(parts[8])
+            if parts[9]:
+                self.gps_data['altitude'] = float(parts[9])
+
+    def _parse_rmc(self, parts):
+        if len(parts) >= 10:
+            if parts[1]:
+                self.gps_data['timestamp'] = self._parse_time(parts[1])
+            if parts[9]:
+                self.gps_data['date'] = self._parse_date(parts[9])
+            if parts[3] and parts[4]:
+                self.gps_data['latitude'] = self._parse_coordinate(parts[3], parts[4])
+            if parts[5] and parts[6]:
+                self.gps_data['longitude'] = self._parse_coordinate(parts[5], parts[6])
+            if parts[7]:
+                self.gps_data['speed'] = float(parts[7]) * 1.852
+            if parts[8]:
+                self.gps_data['course'] = float(parts[8])
+
+    @staticmethod
+    def _parse_coordinate(coord_str, direction):
+        degrees = int(coord_str[:2] if direction in ['N', 'S'] else coord_str[:3])
+        minutes = float(coord_str[2:] if direction in ['N', 'S'] else coord_str[3:])
+        value = degrees + minutes / 60.0
+        return -value if direction in ['S', 'W'] else value
+
+    @staticmethod
+    def _parse_time(time_str):
+        hours = time_str[:2]
+        minutes = time_str[2:4]
+        if '.' in time_str and len(time_str) > 6:
+            sec_part, ms_part = time_str[4:].split('.')
+            return f"{hours}:{minutes}:{sec_part}.{ms_part[:3].ljust(3, '0')}"
+        return f"{hours}:{minutes}:{time_str[4:6]}.000"
+
+    @staticmethod
+    def _parse_date(date_str):
+        return f"20{date_str[4:6]}-{date_str[2:4]}-{date_str[:2]}"
+
+
+def run(title, log, chunk, repeat):
+    """在同一份日志上交替运行三种解析 repeat 轮, 按每种的最快一轮打印吞吐量和相对原实现的倍数"""
+    lines = log.split(b'\r\n')[:-1]
+    print(f"{title}: {len(log) / 1e6:.1f} MB, {len(lines)} 条语句")
+
+    def legacy():
+        parser = LegacyParser()
+        for line in lines:
+            parser.parse(line.decode('ascii', errors='ignore').strip())
+
+    def by_line():
+        gnss = GNSS()
+        for line in lines:
+            gnss._parse_nmea(line)
+
+    def by_chunk():
+        gnss = GNSS()
+        buf = b''
+        for i in range(0, len(log), chunk):
+            buf += log[i:i + chunk]
+            buf = buf[gnss._parse_lines(buf):]
+
+    best = {legacy: float('inf'), by_line: float('inf'), by_chunk: float('inf')}
+    for _ in range(repeat):
+        for fn in best:
+            t0 = time.perf_counter()
+            fn()
+            best[fn] = min(best[fn], time.perf_counter() - t0)
+
+    dt_legacy = best[legacy]
+    print(f"  原实现 (str, 逐行)        {len(lines) / dt_legacy:>10.0f} 条/s")
+    dt = best[by_line]
+    print(f"  GNSS._parse_nmea (逐行)   {len(lines) / dt:>10.0f} 条/s  {dt_legacy / dt:.2f}x")
+    dt = best[by_chunk]
+    print(f"  GNSS._parse_lines (分块)  {len(lines) / dt:>10.0f} 条/s  {dt_legacy / dt:.2f}x  (每块 {chunk} 字节)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NMEA解析吞吐量测试')
+    parser.add_argument('--mb', type=float, default=4, help='合成日志大小 (MB)')
+    parser.add_argument('--chunk', type=int, default=4096, help='分块解析时每块字节数')
+    parser.add_argument('--repeat', type=int, default=5, help='每种解析运行的轮数, 取最快一轮')
+    args = parser.parse_args()
+
+    log = synthetic_log(int(args.mb * 1e6))
+    # 原实现跳过 GSA/GSV, 新实现解析它们并写入定位历史; 只含 GGA/RMC 的日志上两者做的工作相同
+    fix_lines = [line for line in log.split(b'\r\n') if line[3:6] in (b'GGA', b'RMC')]
+    fix_log = b'\r\n'.join(fix_lines) + b'\r\n'
+
+    run('完整日志 (新实现额外解析 GSA/GSV)', log, args.chunk, args.repeat)
+    run('只含 GGA/RMC (相同工作量)', fix_log, args.chunk, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+确定性的合成数据生成器
+
+相同参数和种子总是生成相同的字节, 不需要连接任何硬件:
+    synthetic_stream  雷达 LD 帧字节流
+    synthetic_log     NMEA 日志
+    synthetic_arm_stream  机械臂输入帧字节流
+    synthetic_scans   一圈扫描的距离数组 (MQTT 载荷用)
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+
+from laser import LD_HEADER1, LD_HEADER2, LD_F_LEN, LD_PNAM
+from arm import ARM_HEADER, ARM_PAYLOAD_LEN
+
+
+def make_frame(angle_start, angle_end, distances):
+    """按 LD_DataHandle 的解码方式构造一帧"""
+    frame = bytearray(LD_F_LEN)
+    frame[0] = LD_HEADER1
+    frame[1] = LD_HEADER2
+    for offset, angle in ((4, angle_start), (6, angle_end)):
+        raw = int(angle * 64) & 0xFF7F  # 低字节只有7位有效
+        frame[offset] = (raw & 0x7F) << 1
+        frame[offset + 1] = raw >> 8
+    for i, distance in enumerate(distances):
+        frame[11 + i * 3] = (distance & 0x3F) << 2
+        frame[12 + i * 3] = (distance >> 6) & 0xFF
+    return frame
+
+
+def synthetic_stream(n_frames, noise=0.01, seed=0):
+    """生成 n_frames 帧的连续字节流, 按 noise 概率在帧间插入垃圾字节"""
+    rng = random.Random(seed)
+    out = bytearray()
+    angle = 0.0
+    step = 360.0 / 20  # 每圈约20帧
+    for _ in range(n_frames):
+        distances = [rng.randint(0, 8000) for _ in range(LD_PNAM)]
+        out += make_frame(angle, (angle + step) % 360, distances)
+        angle = (angle + step) % 360
+        if rng.random() < noise:
+            out += bytes(rng.randint(0, 0xA9) for _ in range(rng.randint(1, 20)))
+    return bytes(out)
+
+
+def with_checksum(body):
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+    return f"${body}*{checksum:02X}"
+
+
+def _coord(value, is_lat):
+    degrees = int(abs(value))
+    minutes = (abs(value) - degrees) * 60
+    if is_lat:
+        return f"{degrees:02d}{minutes:07.4f}", 'N' if value >= 0 else 'S'
+    return f"{degrees:03d}{minutes:07.4f}", 'E' if value >= 0 else 'W'
+
+
+def synthetic_epoch(rng, t, lat, lon):
+    """一个定位周期的语句: GNGGA, GNRMC, 两条GSA, GPGSV/GLGSV"""
+    hhmmss = time.strftime('%H%M%S', time.gmtime(t)) + f".{int(t * 100) % 100:02d}"
+    lat_s, ns = _coord(lat, True)
+    lon_s, ew = _coord(lon, False)
+    lines = [
+        with_checksum(f"GNGGA,{hhmmss},{lat_s},{ns},{lon_s},{ew},1,{rng.randint(6, 20):02d},"
+                      f"{rng.uniform(0.5, 2):.1f},{rng.uniform(400, 600):.1f},M,46.9,M,,"),
+        with_checksum(f"GNRMC,{hhmmss},A,{lat_s},{ns},{lon_s},{ew},{rng.uniform(0, 30):.2f},"
+                      f"{rng.uniform(0, 360):.2f},170126,,,A"),
+        with_checksum("GNGSA,A,3,02,05,12,15,18,24,29,,,,,,1.8,0.9,1.5,1"),
+        with_checksum("GNGSA,A,3,65,71,72,,,,,,,,,,1.8,0.9,1.5,2"),
+    ]
+    for talker, base in (('GP', 1), ('GL', 65)):
+        sats = [(base + i, rng.randint(0, 90), rng.randint(0, 359), rng.randint(0, 50)) for i in range(10)]
+        total = (len(sats) + 3) // 4
+        for n in range(total):
+            group = ''.join(f",{p:02d},{e:02d},{a:03d},{s:02d}" for p, e, a, s in sats[n * 4:n * 4 + 4])
+            lines.append(with_checksum(f"{talker}GSV,{total},{n + 1},{len(sats)}{group}"))
+    return lines
+
+
+def synthetic_log(size_bytes, seed=0):
+    """生成约 size_bytes 字节的NMEA日志, 每行以 \\r\\n 结尾"""
+    rng = random.Random(seed)
+    out = []
+    size = 0
+    t = 1700000000.0
+    lat, lon = 30.5, 104.0
+    while size < size_bytes:
+        for line in synthetic_epoch(rng, t, lat, lon):
+            out.append(line)
+            size += len(line) + 2
+        t += 0.1
+        lat += rng.uniform(-1e-5, 1e-5)
+        lon += rng.uniform(-1e-5, 1e-5)
+    return ('\r\n'.join(out) + '\r\n').encode('ascii')
+
+
+def make_arm_frame(values):
+    """机械臂输入帧: 帧头 + 12个字节值"""
+    return ARM_HEADER + bytes(values)
+
+
+def synthetic_arm_stream(n_frames, noise=0.01, seed=0):
+    """生成 n_frames 个机械臂输入帧, 关节值随机游走, 按 noise 概率在帧间插入垃圾字节"""
+    rng = random.Random(seed)
+    values = [128] * ARM_PAYLOAD_LEN
+    out = bytearray()
+    for _ in range(n_frames):
+        values = [min(255, max(0, v + rng.randint(-3, 3))) for v in values]
+        out += make_arm_frame(values)
+        if rng.random() < noise:
+            out += bytes(rng.randint(0, 0xFE) for _ in range(rng.randint(1, 8)))
+    return bytes(out)
+
+
+def synthetic_scans(n_scans, points=360, seed=0):
+    """生成 n_scans 圈扫描距离 (列表), 相邻两圈只有少量角度变化, 接近实际场景"""
+    rng = random.Random(seed)
+    scan = [rng.randint(200, 8000) for _ in range(points)]
+    scans = []
+    for _ in range(n_scans):
+        scan = list(scan)
+        for _ in range(points // 10):
+            i = rng.randrange(points)
+            scan[i] = min(0xFFFF, max(0, scan[i] + rng.randint(-50, 50)))
+        scans.append(scan)
+    return scans
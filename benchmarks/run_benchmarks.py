@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据接收与发布热路径基准测试
+
+在确定性的合成数据上逐级测试, 不需要硬件:
+    lidar_sync      LidarFrameReader 分块帧同步 (含垃圾字节)
+    lidar_handle    LD_DataHandle 逐帧解码 (原有入口)
+    lidar_decode    LD_DecodeFrames 批量解码
+    min_distance    ObstacleIndex 批量更新 + 最近障碍物查询
+    nmea_parse      GNSS._parse_lines 分块解析
+    arm_write       输入帧到两个机械臂串口写出完成 (解析 + ArmWriter 写线程 + pty 串口写入)
+    mqtt_json / mqtt_binary / mqtt_delta  一圈扫描 (uint16 数组, 与发布端相同) 的 MQTT 载荷编码
+
+每级报告吞吐量 (条/s)、单次调用延迟 p50/p99 (微秒) 和 tracemalloc 统计的内存分配
+(单次调用的峰值临时内存, 按条均摊)。结果写成 JSON, 可与之前提交的结果对比:
+    python3 benchmarks/run_benchmarks.py -o bench.json
+    python3 benchmarks/run_benchmarks.py --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import serial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+
+from laser import LidarFrameReader, LD_DataHandle, LD_DecodeFrames, LD_F_LEN, ObstacleIndex
+from GNSS import GNSS, count_nmea_sentences
+from arm import ArmFrameParser, ArmWriter, ARM_FRAME_LEN
+from capture import open_pty
+from lidar_codec import LidarEncoder, FORMAT_JSON, FORMAT_BINARY, FORMAT_DELTA
+from generators import synthetic_stream, synthetic_log, synthetic_arm_stream, synthetic_scans
+
+CHUNK_SIZE = 4096  # 模拟串口每次读到的字节数
+LIDAR_BATCH = 64  # 批量解码每批帧数
+
+
+class Stage:
+    """
+    一个测试级
+
+    calls 为每次调用的参数列表, items 为每次调用处理的条数 (列表或统一的整数),
+    func(arg) 为被测函数。setup 在每轮开始前调用, 返回新的 func, 用于重置解析器等状态。
+    """
+
+    def __init__(self, name, setup, calls, items, unit):
+        self.name = name
+        self.setup = setup
+        self.calls = calls
+        self.items = items if isinstance(items, list) else [items] * len(calls)
+        self.unit = unit
+
+
+class SignalingSerial:
+    """写出完成后置位 done 的串口包装, 用于等待写线程"""
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.done = threading.Event()
+
+    def write(self, data):
+        n = self.ser.write(data)
+        self.done.set()
+        return n
+
+
+def open_pty_serial(baudrate=115200):
+    """在 pty 从端打开串口, 主端由后台线程读空 (相当于一直在接收的机械臂)"""
+    master, _, path = open_pty()
+
+    def drain():
+        while True:
+            try:
+                os.read(master, 65536)
+            except OSError:
+                return
+    threading.Thread(target=drain, daemon=True).start()
+    return serial.Serial(path, baudrate=baudrate, timeout=0, write_timeout=1)
+
+
+def run_stage(stage, repeat):
+    total_items = sum(stage.items)
+    latencies = np.empty(len(stage.calls) * repeat)
+    perf_counter = time.perf_counter
+    # 预热
+    func = stage.setup()
+    for arg in stage.calls[:10]:
+        func(arg)
+    k = 0
+    t_start = perf_counter()
+    for _ in range(repeat):
+        func = stage.setup()
+        for arg in stage.calls:
+            t0 = perf_counter()
+            func(arg)
+            latencies[k] = perf_counter() - t0
+            k += 1
+    elapsed = perf_counter() - t_start
+
+    # 内存分配单独跑一轮, tracemalloc 会明显拖慢速度
+    func = stage.setup()
+    tracemalloc.start()
+    peaks = []
+    base = tracemalloc.get_traced_memory()[0]
+    for arg in stage.calls:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(arg)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    return {
+        'unit': stage.unit,
+        'items': total_items * repeat,
+        'calls': len(latencies),
+        'seconds': elapsed,
+        'throughput': total_items * repeat / elapsed,
+        'latency_us_p50': p50,
+        'latency_us_p99': p99,
+        'items_per_call': total_items / len(stage.calls),
+        'alloc_peak_bytes_per_call': float(np.mean(peaks)),
+        'alloc_bytes_per_item': float(np.sum(peaks)) / total_items,
+        'retained_bytes': retained,
+    }
+
+
+def build_stages(scale):
+    n_frames = int(20000 * scale)
+    stages = []
+
+    # 雷达帧同步
+    stream = synthetic_stream(n_frames, noise=0.01)
+    chunks = [stream[i:i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+    counter = LidarFrameReader()
+    chunk_frames = [sum(1 for _ in counter.feed(chunk)) for chunk in chunks]
+
+    def sync_setup():
+        reader = LidarFrameReader()
+        return lambda chunk: sum(1 for _ in reader.feed(chunk))
+    stages.append(Stage('lidar_sync', sync_setup, chunks, chunk_frames, 'frame'))
+
+    # 雷达解码
+    clean = synthetic_stream(n_frames, noise=0)
+    frames = [clean[i:i + LD_F_LEN] for i in range(0, len(clean), LD_F_LEN)]
+    stages.append(Stage('lidar_handle', lambda: LD_DataHandle, frames[:max(1, n_frames // 4)], 1, 'frame'))
+
+    step = LIDAR_BATCH * LD_F_LEN
+    batches = [clean[i:i + step] for i in range(0, len(clean), step)]
+    batch_frames = [len(b) // LD_F_LEN for b in batches]
+    stages.append(Stage('lidar_decode', lambda: LD_DecodeFrames, batches, batch_frames, 'frame'))
+
+    # 最近障碍物
+    decoded = []
+    for batch in batches:
+        angles, distances = LD_DecodeFrames(batch)
+        index = angles.astype(np.intp).ravel() % 360
+        decoded.append((index, distances.ravel()))
+
+    def min_setup():
+        obstacles = ObstacleIndex()
+
+        def step_func(arg):
+            obstacles.update_many(*arg)
+            return obstacles.nearest()
+        return step_func
+    stages.append(Stage('min_distance', min_setup, decoded, batch_frames, 'frame'))
+
+    # NMEA 解析
+    log = synthetic_log(int(2e6 * scale))
+    nmea_chunks = [log[i:i + CHUNK_SIZE] for i in range(0, len(log), CHUNK_SIZE)]
+    # 分块边界会切断语句, 按每块结束的完整语句数计条
+    nmea_items = []
+    pending = b''
+    for chunk in nmea_chunks:
+        pending += chunk
+        end = pending.rfind(b'\n') + 1
+        nmea_items.append(sum(count_nmea_sentences(pending[:end]).values()))
+        pending = pending[end:]
+
+    def nmea_setup():
+        gnss = GNSS()
+        state = {'buf': b''}
+
+        def step_func(chunk):
+            buf = state['buf'] + chunk
+            state['buf'] = buf[gnss._parse_lines(buf):]
+        return step_func
+    stages.append(Stage('nmea_parse', nmea_setup, nmea_chunks, nmea_items, 'sentence'))
+
+    # 机械臂: 输入帧 -> 写线程 -> 串口写出完成, 每次调用等到两个机械臂的命令都写入 pty
+    arm_stream = synthetic_arm_stream(max(10, n_frames // 4), noise=0)
+    arm_frames = [arm_stream[i:i + ARM_FRAME_LEN] for i in range(0, len(arm_stream), ARM_FRAME_LEN)]
+    arm_ports = [open_pty_serial() for _ in range(2)]
+    arm_writers = []
+
+    def arm_setup():
+        for writer in arm_writers:
+            writer.stop()
+            writer.join()
+        parser = ArmFrameParser()
+        outputs = [SignalingSerial(ser) for ser in arm_ports]
+        # 不限速; 死区 -1 表示相同的命令也发送, 保证每帧都有一次写出
+        arm_writers[:] = [ArmWriter(out, f'ARM{i + 1}', max_rate=0, deadband=-1) for i, out in enumerate(outputs)]
+        for writer in arm_writers:
+            writer.start()
+        writers = tuple(arm_writers)
+
+        def step_func(frame):
+            for out in outputs:
+                out.done.clear()
+            for values in parser.feed(frame):
+                writers[0].submit(values[:5])
+                writers[1].submit(values[6:11])
+            for out in outputs:
+                out.done.wait()
+        return step_func
+    stages.append(Stage('arm_write', arm_setup, arm_frames, 1, 'frame'))
+
+    # MQTT 载荷
+    # 发布端传入的是 ScanBuffer 的 uint16 数组, 不是列表
+    scans = [np.array(scan, dtype=np.uint16) for scan in synthetic_scans(max(10, int(2000 * scale)))]
+    timestamps = [1700000000.0 + i * 0.1 for i in range(len(scans))]
+    payload_args = list(zip(timestamps, scans))
+    for fmt in (FORMAT_JSON, FORMAT_BINARY, FORMAT_DELTA):
+        def payload_setup(fmt=fmt):
+            encoder = LidarEncoder(fmt)
+            return lambda arg: encoder.encode(*arg)
+        stages.append(Stage(f'mqtt_{fmt}', payload_setup, payload_args, 1, 'scan'))
+
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据接收与发布热路径基准测试')
+    parser.add_argument('-o', '--output', help='结果 JSON 文件')
+    parser.add_argument('--baseline', help='对比的历史结果 JSON 文件')
+    parser.add_argument('--scale', type=float, default=1.0, help='数据量倍数')
+    parser.add_argument('--repeat', type=int, default=3, help='每级重复轮数')
+    parser.add_argument('--stages', help='只运行指定的级, 逗号分隔')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['stages']
+
+    stages = build_stages(args.scale)
+    if args.stages:
+        wanted = set(args.stages.split(','))
+        stages = [s for s in stages if s.name in wanted]
+
+    results = {}
+    print(f"{'stage':<14} {'throughput':>18} {'p50 us':>10} {'p99 us':>10} {'B/item':>10}")
+    for stage in stages:
+        r = results[stage.name] = run_stage(stage, args.repeat)
+        line = (f"{stage.name:<14} {r['throughput']:>10.0f} {stage.unit + '/s':<8}"
+                f"{r['latency_us_p50']:>10.1f} {r['latency_us_p99']:>10.1f} {r['alloc_bytes_per_item']:>10.1f}")
+        old = baseline.get(stage.name)
+        if old:
+            line += f"  {r['throughput'] / old['throughput']:.2f}x"
+        print(line)
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'stages': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
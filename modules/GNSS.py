@@ -1,10 +1,224 @@
 import serial
 import time
+import struct
+import asyncio
 import threading
-from typing import Optional, Dict, Any
+from collections import namedtuple
+import numpy as np
+from typing import Optional, Dict, Any, Union, Callable, Iterable
+from metrics import REGISTRY
+
+# 支持的发送者 (talker) ID
+TALKERS = frozenset((b'GP', b'GN', b'GL', b'GB', b'GA', b'BD', b'GQ'))
+
+# GSA 语句中 NMEA 4.11 的系统ID与发送者对应关系
+GSA_SYSTEM_ID = {b'1': 'GP', b'2': 'GL', b'3': 'GA', b'4': 'GB', b'5': 'GQ'}
+
+# 卫星表: 每个系统预分配的行数, 每行为 (PRN, 仰角, 方位角, 信噪比), 缺省值为 -1
+GSV_SYSTEMS = ('GP', 'GL', 'GA', 'GB', 'GQ', 'GN')
+GSV_TALKER_INDEX = {b'GP': 0, b'GL': 1, b'GA': 2, b'GB': 3, b'BD': 3, b'GQ': 4, b'GN': 5}
+GSV_MAX_SATS = 64
+
+# 两位十六进制校验和 (大小写均可) -> 整数, 查表比 int(..., 16) 快
+NMEA_HEX = {(a + b).encode(): int(a + b, 16) for a in '0123456789abcdefABCDEF' for b in '0123456789abcdefABCDEF'}
+
+# 自动波特率检测的候选波特率, 按常见程度排列
+AUTOBAUD_CANDIDATES = (9600, 115200, 38400, 57600, 19200, 4800, 230400)
+
+# PMTK314 输出语句频率字段顺序 (其余字段为保留/不常用, 填0)
+PMTK314_SENTENCES = ('GLL', 'RMC', 'VTG', 'GGA', 'GSA', 'GSV')
+PMTK314_FIELDS = 19
+
+# UBX CFG-MSG 中 NMEA 标准语句的消息ID (类别 0xF0)
+UBX_NMEA_MSG_ID = {'GGA': 0x00, 'GLL': 0x01, 'GSA': 0x02, 'GSV': 0x03, 'RMC': 0x04, 'VTG': 0x05,
+                   'GRS': 0x06, 'GST': 0x07, 'ZDA': 0x08, 'GBS': 0x09, 'DTM': 0x0A}
+
+
+class GNSSFix(namedtuple('GNSSFix', [
+        'latitude', 'longitude', 'altitude', 'speed', 'course', 'satellites', 'fix_quality',
+        'timestamp', 'date', 'hdop', 'recv_time_ns', 'fix_type', 'pdop', 'vdop',
+        'active_satellites', 'satellites_in_view', 'hdop_gsa'])):
+    """gps_data 的只读快照, 字段与 gps_data 的键相同"""
+    __slots__ = ()
+    
+    def is_valid(self) -> bool:
+        """定位是否有效"""
+        return (self.fix_quality is not None and self.fix_quality > 0 and
+                self.latitude is not None and self.longitude is not None)
+
+
+def nmea_checksum(data: bytes) -> int:
+    """计算NMEA校验和 (所有字节异或), 把字节串当作大整数对半折叠, 避免逐字节循环"""
+    n = len(data)
+    x = int.from_bytes(data, 'little')
+    while n > 8:
+        half = (n + 1) >> 1
+        bits = half << 3
+        x = (x >> bits) ^ (x & ((1 << bits) - 1))
+        n = half
+    x ^= x >> 32
+    x ^= x >> 16
+    x ^= x >> 8
+    return x & 0xFF
+
+
+def pmtk_command(body: str) -> bytes:
+    """生成带校验和的PMTK命令, body 不含 $ 和 *"""
+    return f"${body}*{nmea_checksum(body.encode('ascii')):02X}\r\n".encode('ascii')
+
+
+def ubx_command(msg_class: int, msg_id: int, payload: bytes = b'') -> bytes:
+    """生成UBX命令帧 (同步字 B5 62, 8位Fletcher校验)"""
+    body = struct.pack('<BBH', msg_class, msg_id, len(payload)) + payload
+    ck_a = ck_b = 0
+    for byte in body:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return b'\xB5\x62' + body + bytes([ck_a, ck_b])
+
+
+def count_nmea_sentences(data: bytes) -> Dict[str, int]:
+    """统计一段原始数据中校验和正确的NMEA语句数量, 按句子类型 (如 'GGA') 分类"""
+    counts = {}
+    for line in data.split(b'\n'):
+        dollar = line.find(b'$')
+        if dollar < 0:
+            continue
+        line = line[dollar:].rstrip()
+        if len(line) < 7 or line[-3] != 0x2A:
+            continue
+        try:
+            if nmea_checksum(line[1:-3]) != int(line[-2:], 16):
+                continue
+        except ValueError:
+            continue
+        sentence_type = line[3:6].decode('ascii', errors='ignore')
+        counts[sentence_type] = counts.get(sentence_type, 0) + 1
+    return counts
+
+
+def _int_or_none(field: bytes) -> Optional[int]:
+    return int(field) if field else None
+
+
+def _float_or_none(field: bytes) -> Optional[float]:
+    return float(field) if field else None
+
+
+class FixHistory:
+    """
+    定位历史环形缓冲区, 各字段分别存放在并行的 NumPy 数组中
+
+    时间轴为 time.monotonic() 秒; 每个样本同时写入 i 和 i+capacity 两处,
+    使任意时刻保存的样本在数组中都是连续有序的, 可以直接二分查找。
+    失去定位时写入一个全 NaN 的标记样本: 标记之前保持最后一次定位, 之后到下一次定位之间没有位置,
+    也不会跨过这段时间插值。
+    """
+
+    FIELDS = ('latitude', 'longitude', 'altitude', 'speed', 'course', 'hdop')
+
+    def __init__(self, capacity: int = 600, max_age: float = 1.0):
+        """
+        Args:
+            capacity: 保留的定位数量
+            max_age: 查询时间晚于最后一次定位不超过该秒数时, 返回最后一次定位
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.times = np.zeros(2 * capacity, dtype=np.float64)
+        self.values = np.full((len(self.FIELDS), 2 * capacity), np.nan, dtype=np.float64)
+        self.start = 0  # 最早样本位置
+        self.count = 0
+        self.last_utc = None  # 最后一个样本的UTC时间, 同一历元的GGA/RMC合并为一个样本
+        self.lost = False  # 最后一个样本是否为失去定位的标记
+        self.lock = threading.Lock()
+
+    def append(self, t: float, utc: Optional[str], values):
+        """追加一次定位, values 按 FIELDS 顺序, 缺失的字段为 None"""
+        row = [np.nan if v is None else v for v in values]
+        with self.lock:
+            if self.count and utc is not None and utc == self.last_utc:
+                # 同一历元: 覆盖最后一个样本
+                pos = (self.start + self.count - 1) % self.capacity
+            else:
+                if self.count and t < self.times[self.start + self.count - 1]:
+                    return  # 时间倒退, 丢弃
+                if self.count == self.capacity:
+                    self.start = (self.start + 1) % self.capacity
+                else:
+                    self.count += 1
+                pos = (self.start + self.count - 1) % self.capacity
+                self.times[pos] = t
+                self.times[pos + self.capacity] = t
+            self.values[:, pos] = row
+            self.values[:, pos + self.capacity] = row
+            self.last_utc = utc
+            self.lost = False
+
+    def mark_lost(self, t: float):
+        """记录在 t 时刻失去定位, 连续失去定位只记录第一次"""
+        if self.lost or not self.count:
+            return
+        self.append(t, None, [None] * len(self.FIELDS))
+        self.lost = True
+
+    def positions_at(self, t) -> Dict[str, np.ndarray]:
+        """
+        批量查询: 二分查找相邻两次定位并线性插值 (航向按最短角度插值)
+
+        Args:
+            t: time.monotonic() 秒, 标量或数组
+
+        Returns:
+            字段名 -> 与 t 同形状的数组, 超出历史范围的为 NaN
+        """
+        t = np.asarray(t, dtype=np.float64)
+        with self.lock:
+            n = self.count
+            if n == 0:
+                nan = np.full(t.shape, np.nan)
+                return {field: nan.copy() for field in self.FIELDS}
+            # 直接在镜像数组的连续视图上二分查找, 只拷贝每个查询时刻两侧的样本
+            start = self.start
+            times = self.times[start:start + n]
+            i = np.clip(np.searchsorted(times, t, side='right'), 1, max(n - 1, 1))
+            t0 = times[i - 1]
+            t1 = times[i] if n > 1 else t0
+            v0 = self.values[:, start + i - 1]
+            v1 = self.values[:, start + i] if n > 1 else v0
+            first, last = times[0], times[-1]
+        result = {}
+
+        span = t1 - t0
+        w = np.divide(t - t0, span, out=np.zeros(t.shape), where=span > 0)
+        w = np.clip(w, 0.0, 1.0)
+        delta = v1 - v0
+        course = self.FIELDS.index('course')
+        delta[course] = (delta[course] + 180.0) % 360.0 - 180.0
+        out = v0 + delta * w
+        out[course] %= 360.0
+        # 下一个样本是失去定位的标记: 在此之前保持最后一次定位
+        lost = np.isnan(v1[0]) & (t < t1)
+        out[:, lost] = v0[:, lost]
+
+        # 早于第一次定位, 或晚于最后一次定位超过 max_age
+        invalid = (t < first) | (t > last + self.max_age)
+        out[:, invalid] = np.nan
+        for k, field in enumerate(self.FIELDS):
+            result[field] = out[k]
+        return result
+
+    def position_at(self, t: float) -> Optional[Dict[str, float]]:
+        """查询单个时刻的位置, 超出历史范围时返回 None"""
+        result = self.positions_at(t)
+        if np.isnan(result['latitude']):
+            return None
+        return {field: (None if np.isnan(v) else float(v)) for field, v in result.items()}
+
 
 class GNSS:
-    def __init__(self, port: str = '/dev/ttyUSB1', baudrate: int = 9600, timeout: float = 1.0):
+    def __init__(self, port: str = '/dev/ttyUSB1', baudrate: int = 9600, timeout: float = 1.0,
+                 blocking_read: bool = True, history_size: int = 600):
         """
         初始化GNSS模块
         
@@ -12,10 +226,13 @@ class GNSS:
             port: 串口端口名
             baudrate: 波特率
             timeout: 超时时间
+            blocking_read: True 时阻塞等待串口数据并分块读取, False 时使用原来的轮询方式
+            history_size: 定位历史保留的定位数量
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.blocking_read = blocking_read
         self.serial_conn = None
         self.is_running = False
         self.data_lock = threading.Lock()
@@ -31,14 +248,67 @@ class GNSS:
             'fix_quality': None,
             'timestamp': None,
             'date': None,
-            'hdop': None
+            'hdop': None,
+            'recv_time_ns': None,  # 收到该定位语句时的 time.monotonic_ns()
+            'fix_type': None,  # GSA: 1=未定位, 2=2D, 3=3D
+            'pdop': None,
+            'vdop': None,
+            'hdop_gsa': None,  # GSA 的水平精度因子, hdop 只取 GGA 的值
+            'active_satellites': {},  # GSA: 系统 -> 参与解算的卫星PRN元组
+            'satellites_in_view': None  # GSV: 各系统可见卫星数之和
+        }
+        
+        # 按句子类型分发 (去掉 $ 和发送者ID后的部分)
+        self._handlers = {
+            b'GGA': self._parse_gga,
+            b'RMC': self._parse_rmc,
+            b'GSA': self._parse_gsa,
+            b'GSV': self._parse_gsv
         }
+        
+        # GSV 卫星表, 一组GSV语句收齐后整体替换对应系统的数据
+        # 读取线程只保存原始字段, 查询时才转换成整数写入预分配的表
+        self.sat_table = np.full((len(GSV_SYSTEMS), GSV_MAX_SATS, 4), -1, dtype=np.int16)
+        self.sat_count = [0] * len(GSV_SYSTEMS)
+        self._sat_pending = [[] for _ in GSV_SYSTEMS]  # 未收齐的一组的原始字段
+        self._sat_raw = [None] * len(GSV_SYSTEMS)  # 已收齐但还未转换的一组
+        self._sat_in_view = [0] * len(GSV_SYSTEMS)  # 各系统GSV报告的可见卫星数
+        # 上一条 GSA 的原始字段: 定位类型和精度因子, 各系统参与解算的卫星
+        self._gsa_dop = None
+        self._gsa_prns = {}
+        
+        # 定位历史, 用于按时间插值位置
+        self.history = FixHistory(history_size)
+        
+        # 只读快照, 数据更新后置空, 下次读取时重建
+        self._snapshot = None
+        # 订阅者: [回调, 关注的字段, 上次通知时这些字段的值]
+        # 写时复制的元组: 订阅/取消订阅在 data_lock 内整体替换, 读取线程遍历时不会看到修改到一半的列表
+        self._subscribers = ()
+        
+        # 最近一条 GGA/RMC 是否报告了有效定位
+        self._fix_valid = False
+        # 还未写入定位历史的定位: (时间, 是否有效)
+        self._pending_fix = None
+        # 当前历元的时间字段、坐标字段和日期字段 (原始字节)
+        self._epoch = None
+        self._epoch_coords = None
+        self._date = None
+        
+        # 接收缓冲区, 保存还没有换行的半条语句
+        self._rx_buf = bytearray()
+        
+        # 统计
+        self.bytes_read = 0
+        self.sentences = 0  # 校验通过的语句数
+        self.checksum_errors = 0
     
     def connect(self) -> bool:
         """连接串口"""
         try:
-            self.serial_conn = serial.Serial(
-                port=self.port,
+            # serial_for_url 同时支持设备路径和 loop:// 等URL, 便于用模拟接收机测试
+            self.serial_conn = serial.serial_for_url(
+                self.port,
                 baudrate=self.baudrate,
                 timeout=self.timeout
             )
@@ -55,6 +325,128 @@ class GNSS:
             self.serial_conn.close()
             print("📡 GNSS已断开")
     
+    def _capture(self, duration: float) -> bytes:
+        """读取 duration 秒内收到的原始数据 (读取线程未运行时使用)"""
+        self.serial_conn.reset_input_buffer()
+        data = bytearray()
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.serial_conn.timeout = min(remaining, 0.1)
+            data += self.serial_conn.read(self.serial_conn.in_waiting or 1)
+        self.serial_conn.timeout = self.timeout
+        return bytes(data)
+    
+    def set_baudrate(self, baudrate: int):
+        """修改本机串口波特率"""
+        self.baudrate = baudrate
+        self.serial_conn.baudrate = baudrate
+    
+    def detect_baudrate(self, candidates: Iterable[int] = AUTOBAUD_CANDIDATES,
+                        duration: float = 1.2, min_sentences: int = 2) -> Optional[int]:
+        """
+        自动检测接收机当前波特率: 依次在候选波特率下读取, 收到足够多校验正确的NMEA语句即认为匹配
+
+        Args:
+            candidates: 候选波特率
+            duration: 每个波特率的监听时间 (秒), 应大于接收机的输出周期
+            min_sentences: 判定匹配所需的最少有效语句数
+
+        Returns:
+            检测到的波特率 (串口已切换到该波特率), 失败返回 None
+        """
+        if self.is_running:
+            raise RuntimeError("读取线程运行时不能检测波特率")
+        if not self.serial_conn or not self.serial_conn.is_open:
+            if not self.connect():
+                return None
+        for baudrate in candidates:
+            self.set_baudrate(baudrate)
+            counts = count_nmea_sentences(self._capture(duration))
+            if sum(counts.values()) >= min_sentences:
+                print(f"📡 GNSS波特率: {baudrate}")
+                return baudrate
+        return None
+    
+    def measure_sentence_rate(self, duration: float = 2.0) -> Dict[str, float]:
+        """测量各类语句的实际输出频率 (Hz)"""
+        counts = count_nmea_sentences(self._capture(duration))
+        return {sentence_type: n / duration for sentence_type, n in counts.items()}
+    
+    def configure_receiver(self, baudrate: int = 115200, rate_hz: int = 10,
+                           sentences: Iterable[str] = ('GGA', 'RMC', 'GSA', 'GSV'),
+                           gsv_divider: int = 5, protocol: str = 'auto',
+                           verify: bool = True) -> bool:
+        """
+        配置接收机: 提高波特率和定位频率, 关闭不需要的语句
+
+        流程: 检测当前波特率 -> 发送波特率命令并切换本机波特率 -> 发送频率和语句命令 -> 测量实际频率验证
+
+        Args:
+            baudrate: 目标波特率
+            rate_hz: 目标定位频率 (Hz)
+            sentences: 需要输出的语句, 其余关闭
+            gsv_divider: GSV 每隔多少次定位输出一次
+            protocol: 'pmtk' (MTK芯片), 'ubx' (u-blox), 'auto' 两种命令都发送 (接收机会忽略不认识的命令)
+            verify: 是否测量语句频率验证配置生效
+
+        Returns:
+            配置是否成功 (verify 为 False 时只表示命令已发出)
+        """
+        if protocol not in ('pmtk', 'ubx', 'auto'):
+            raise ValueError(f"未知的协议: {protocol}")
+        sentences = set(sentences)
+        use_pmtk = protocol in ('pmtk', 'auto')
+        use_ubx = protocol in ('ubx', 'auto')
+        
+        current = self.detect_baudrate()
+        if current is None:
+            print("❌ 未检测到GNSS输出")
+            return False
+        
+        # 1. 波特率
+        if current != baudrate:
+            if use_pmtk:
+                self.serial_conn.write(pmtk_command(f"PMTK251,{baudrate}"))
+            if use_ubx:
+                # CFG-PRT: UART1, 8N1, 输入 UBX+NMEA+RTCM, 输出 NMEA
+                payload = struct.pack('<BBHIIHHHH', 1, 0, 0, 0x08D0, baudrate, 0x0007, 0x0002, 0, 0)
+                self.serial_conn.write(ubx_command(0x06, 0x00, payload))
+            self.serial_conn.flush()
+            time.sleep(0.2)
+            self.set_baudrate(baudrate)
+            time.sleep(0.2)
+        
+        # 2. 定位频率和输出语句
+        period_ms = int(round(1000 / rate_hz))
+        if use_pmtk:
+            self.serial_conn.write(pmtk_command(f"PMTK220,{period_ms}"))
+            fields = [0] * PMTK314_FIELDS
+            for i, name in enumerate(PMTK314_SENTENCES):
+                if name in sentences:
+                    fields[i] = gsv_divider if name == 'GSV' else 1
+            self.serial_conn.write(pmtk_command("PMTK314," + ",".join(map(str, fields))))
+        if use_ubx:
+            # CFG-RATE: 测量周期, 每次测量输出一次, 时间基准GPS
+            self.serial_conn.write(ubx_command(0x06, 0x08, struct.pack('<HHH', period_ms, 1, 1)))
+            for name, msg_id in UBX_NMEA_MSG_ID.items():
+                rate = (gsv_divider if name == 'GSV' else 1) if name in sentences else 0
+                self.serial_conn.write(ubx_command(0x06, 0x01, bytes([0xF0, msg_id, rate])))
+        self.serial_conn.flush()
+        
+        if not verify:
+            return True
+        
+        # 3. 验证: 等新配置稳定后, 定位语句频率达到目标的80%
+        time.sleep(1.0)
+        rates = self.measure_sentence_rate()
+        fix_rate = max(rates.get('GGA', 0.0), rates.get('RMC', 0.0))
+        ok = fix_rate >= 0.8 * rate_hz
+        print(f"{'✅' if ok else '❌'} GNSS配置: {self.baudrate} bps, 定位频率 {fix_rate:.1f} Hz, 语句频率 {rates}")
+        return ok
+    
     def start_reading(self):
         """开始读取数据"""
         if not self.serial_conn or not self.serial_conn.is_open:
@@ -62,7 +454,8 @@ class GNSS:
                 return False
         
         self.is_running = True
-        self.read_thread = threading.Thread(target=self._read_data)
+        target = self._read_data_blocking if self.blocking_read else self._read_data
+        self.read_thread = threading.Thread(target=target)
         self.read_thread.daemon = True
         self.read_thread.start()
         return True
@@ -82,43 +475,210 @@ class GNSS:
                 print(f"GNSS读取错误: {e}")
                 time.sleep(0.1)
     
-    def _parse_nmea(self, sentence: str):
-        """解析NMEA句子"""
-        try:
-            # 验证校验和
-            if not self._validate_checksum(sentence):
+    def _read_data_blocking(self):
+        """
+        阻塞读取串口数据的线程函数
+
+        串口读取在没有数据时阻塞到有数据或超时, 有数据时一次读出全部可用字节,
+        在复用的缓冲区中按换行切分语句, 并记录每块数据的接收时间。
+        """
+        while self.is_running:
+            try:
+                chunk = self.serial_conn.read(self.serial_conn.in_waiting or 1)
+                if chunk:
+                    self.feed(chunk, time.monotonic_ns())
+            except Exception as e:
+                print(f"GNSS读取错误: {e}")
+                time.sleep(0.1)
+    
+    def feed(self, chunk: bytes, recv_time_ns: Optional[int] = None):
+        """
+        喂入一段原始数据, 解析其中完整的语句
+
+        读取线程和外部事件循环 (如 airunit 中的 loop.add_reader) 都通过这里送入数据。
+        """
+        buf = self._rx_buf
+        buf += chunk
+        self.bytes_read += len(chunk)
+        if b'\n' in chunk:
+            if recv_time_ns is None:
+                recv_time_ns = time.monotonic_ns()
+            del buf[:self._parse_lines(bytes(buf), recv_time_ns)]
+
+        # 长时间没有换行 (错误波特率等) 时丢弃
+        if len(buf) > 4096:
+            buf.clear()
+    
+    def _parse_lines(self, data: bytes, recv_time_ns: Optional[int] = None) -> int:
+        """
+        解析 data 中所有以换行结尾的语句, 返回已处理的字节数
+
+        整块数据先用 NumPy 计算一次前缀异或, 每条语句的校验和只需两次查表。
+        整块语句在一次加锁内解析, 定位历史每个历元只写一次, 快照和订阅通知也按块处理。
+        """
+        last = data.rfind(b'\n')
+        if last < 0:
+            return 0
+        xor = np.bitwise_xor.accumulate(np.frombuffer(data, dtype=np.uint8, count=last)).tobytes()
+        if recv_time_ns is None:
+            recv_time_ns = time.monotonic_ns()
+        
+        updated = False
+        with self.data_lock:
+            start = 0
+            while start < last:
+                end = data.find(b'\n', start)
+                dollar = data.find(b'$', start, end)
+                start = end + 1
+                if dollar < 0:
+                    continue
+                stop = dollar + len(data[dollar:end].rstrip())  # 去掉 \r 和空格
+                star = data.rfind(b'*', dollar, stop)
+                if star < 0:
+                    continue
+                # 校验和不是两位十六进制数 (如 *ZZ, *7) 时按校验错误计数
+                checksum = NMEA_HEX.get(data[star + 1:stop], -1)
+                # 语句 $ 与 * 之间所有字节的异或
+                if xor[star - 1] ^ xor[dollar] == checksum:
+                    self.sentences += 1
+                    if self._handle(data[dollar:star], recv_time_ns):
+                        updated = True
+                else:
+                    self.checksum_errors += 1
+            if updated:
+                self._flush_fix()
+                self._snapshot = None
+        
+        if updated and self._subscribers:
+            self._notify()
+        return last + 1
+    
+    def _parse_nmea(self, sentence: Union[bytes, str], recv_time_ns: Optional[int] = None):
+        """
+        解析一条NMEA语句 (不含换行)
+
+        Args:
+            sentence: 语句字节串, 也接受 str
+            recv_time_ns: 接收时间 (time.monotonic_ns()), 为空时取当前时间
+        """
+        if isinstance(sentence, str):
+            sentence = sentence.encode('ascii', errors='ignore')
+        
+        # 验证校验和
+        if not self._validate_checksum(sentence):
+            self.checksum_errors += 1
+            return
+        self.sentences += 1
+        self._dispatch(sentence[:-3], recv_time_ns)
+    
+    def _dispatch(self, sentence: bytes, recv_time_ns: Optional[int] = None):
+        """解析一条已校验的语句 (不含 *HH 校验和), 立即写入定位历史并通知订阅者"""
+        if recv_time_ns is None:
+            recv_time_ns = time.monotonic_ns()
+        with self.data_lock:
+            if not self._handle(sentence, recv_time_ns):
                 return
-            
-            parts = sentence.split(',')
-            sentence_type = parts[0][3:]  # 去掉$GP前缀
-            
-            with self.data_lock:
-                if sentence_type == 'GGA':
-                    self._parse_gga(parts)
-                elif sentence_type == 'RMC':
-                    self._parse_rmc(parts)
-                elif sentence_type == 'GSA':
-                    self._parse_gsa(parts)
-                elif sentence_type == 'GSV':
-                    self._parse_gsv(parts)
-                    
+            self._flush_fix()
+            self._snapshot = None
+        if self._subscribers:
+            self._notify()
+    
+    def _handle(self, sentence: bytes, recv_time_ns: int) -> bool:
+        """按句子类型解析一条已校验的语句, 返回是否更新了数据 (需持有 data_lock)"""
+        try:
+            parts = sentence.split(b',')
+            talker = parts[0][1:3]
+            if talker not in TALKERS:
+                return False
+            handler = self._handlers.get(parts[0][3:])
+            if handler is None:
+                return False
+            if handler(parts, talker):
+                self.gps_data['recv_time_ns'] = recv_time_ns
+                self._record_fix(recv_time_ns, self._fix_valid)
+            return True
         except Exception as e:
             print(f"解析NMEA数据错误: {e}")
+            return False
+    
+    def _notify(self):
+        """通知关注字段发生变化的订阅者"""
+        fix = self.get_snapshot()
+        for subscriber in self._subscribers:
+            callback, fields, last = subscriber
+            values = tuple(getattr(fix, field) for field in fields)
+            if values == last:
+                continue
+            subscriber[2] = values
+            try:
+                callback(fix)
+            except Exception as e:
+                print(f"GNSS订阅回调错误: {e}")
+    
+    def _record_fix(self, recv_time_ns: int, valid: bool):
+        """
+        记录一条定位语句 (需持有 data_lock)
+
+        同一历元的 GGA/RMC 在历史中合并为一个样本, 这里只暂存接收时间, 历元变化或 _flush_fix() 时
+        才按 gps_data 的当前值写入历史; 样本时间取该历元第一条语句的接收时间, 数值取最后一条。
+        """
+        pending = self._pending_fix
+        if pending is not None and pending[1] != valid:
+            self._flush_fix()
+            pending = None
+        if pending is None:
+            self._pending_fix = (recv_time_ns / 1e9, valid)
     
-    def _parse_gga(self, parts: list):
-        """解析GGA句子 - 全球定位系统定位数据"""
+    def _flush_fix(self):
+        """把暂存的定位写入历史, 语句报告未定位时记录失去定位 (需持有 data_lock)"""
+        pending = self._pending_fix
+        if pending is None:
+            return
+        self._pending_fix = None
+        t, valid = pending
+        if not valid:
+            self.history.mark_lost(t)
+            return
+        data = self.gps_data
+        self.history.append(t, data['timestamp'] if self._epoch else None,
+                            [data[field] for field in FixHistory.FIELDS])
+    
+    def _update_epoch(self, utc: bytes, coords: list):
+        """
+        更新 GGA/RMC 共有的时间和坐标 (需持有 data_lock)
+
+        时间变化时先把上一历元写入定位历史, 再覆盖 gps_data。
+        同一历元的 GGA 和 RMC 坐标通常相同, 原始字段与上一条相同时不重复转换。
+
+        Args:
+            utc: 时间字段 HHMMSS.SS
+            coords: 纬度, N/S, 经度, E/W 四个字段
+        """
+        if utc != self._epoch or not utc:
+            self._flush_fix()
+            self._epoch = utc
+            if utc:
+                self.gps_data['timestamp'] = self._parse_time(utc)
+        elif coords == self._epoch_coords:
+            return
+        self._epoch_coords = coords
+        
+        # 纬度
+        if coords[0] and coords[1]:
+            self.gps_data['latitude'] = self._parse_coordinate(coords[0], coords[1])
+        
+        # 经度
+        if coords[2] and coords[3]:
+            self.gps_data['longitude'] = self._parse_coordinate(coords[2], coords[3])
+    
+    def _parse_gga(self, parts: list, talker: bytes) -> bool:
+        """解析GGA句子 - 全球定位系统定位数据, 返回是否为定位语句"""
+        # 定位质量为0或没有坐标时不是有效定位, 其余字段照常更新
+        self._fix_valid = (len(parts) >= 13 and parts[6] not in (b'', b'0')
+                           and bool(parts[2] and parts[3] and parts[4] and parts[5]))
         if len(parts) >= 13:
-            # 时间
-            if parts[1]:
-                self.gps_data['timestamp'] = self._parse_time(parts[1])
-            
-            # 纬度
-            if parts[2] and parts[3]:
-                self.gps_data['latitude'] = self._parse_coordinate(parts[2], parts[3])
-            
-            # 经度
-            if parts[4] and parts[5]:
-                self.gps_data['longitude'] = self._parse_coordinate(parts[4], parts[5])
+            # 时间和坐标
+            self._update_epoch(parts[1], parts[2:6])
             
             # 定位质量
             if parts[6]:
@@ -135,26 +695,22 @@ class GNSS:
             # 海拔高度
             if parts[9]:
                 self.gps_data['altitude'] = float(parts[9])
+        return True
     
-    def _parse_rmc(self, parts: list):
-        """解析RMC句子 - 推荐最小定位信息"""
+    def _parse_rmc(self, parts: list, talker: bytes) -> bool:
+        """解析RMC句子 - 推荐最小定位信息, 返回是否为定位语句"""
+        # 状态 'V' 表示无效定位
+        self._fix_valid = (len(parts) >= 10 and parts[2] == b'A'
+                           and bool(parts[3] and parts[4] and parts[5] and parts[6]))
         if len(parts) >= 10:
-            # 时间
-            if parts[1]:
-                self.gps_data['timestamp'] = self._parse_time(parts[1])
+            # 时间和坐标
+            self._update_epoch(parts[1], parts[3:7])
             
-            # 日期
-            if parts[9]:
+            # 日期, 只在变化时转换
+            if parts[9] and parts[9] != self._date:
+                self._date = parts[9]
                 self.gps_data['date'] = self._parse_date(parts[9])
             
-            # 纬度
-            if parts[3] and parts[4]:
-                self.gps_data['latitude'] = self._parse_coordinate(parts[3], parts[4])
-            
-            # 经度
-            if parts[5] and parts[6]:
-                self.gps_data['longitude'] = self._parse_coordinate(parts[5], parts[6])
-            
             # 速度 (节)
             if parts[7]:
                 self.gps_data['speed'] = float(parts[7]) * 1.852  # 转换为km/h
@@ -162,55 +718,90 @@ class GNSS:
             # 航向
             if parts[8]:
                 self.gps_data['course'] = float(parts[8])
+        return True
     
-    def _parse_gsa(self, parts: list):
+    def _parse_gsa(self, parts: list, talker: bytes) -> bool:
         """解析GSA句子 - GNSS DOP和有效卫星"""
-        pass  # 可根据需要实现
+        if len(parts) < 18:
+            return False
+        
+        # 各系统的 GSA 和相邻周期的 GSA 通常相同, 原始字段没变时不重复转换
+        # 定位类型和精度因子
+        dop = (parts[2], parts[15], parts[16], parts[17])
+        if dop != self._gsa_dop:
+            self._gsa_dop = dop
+            self.gps_data['fix_type'] = _int_or_none(parts[2])
+            self.gps_data['pdop'] = _float_or_none(parts[15])
+            self.gps_data['hdop_gsa'] = _float_or_none(parts[16])
+            self.gps_data['vdop'] = _float_or_none(parts[17])
+        
+        # 参与解算的卫星, GN 发送者按 NMEA 4.11 的系统ID区分
+        system = talker.decode()
+        if talker == b'GN' and len(parts) >= 19:
+            system = GSA_SYSTEM_ID.get(parts[18], system)
+        prns = parts[3:15]
+        if prns != self._gsa_prns.get(system):
+            self._gsa_prns[system] = prns
+            active = dict(self.gps_data['active_satellites'])
+            active[system] = tuple(int(prn) for prn in prns if prn)
+            self.gps_data['active_satellites'] = active
+        return False
+    
+    def _parse_gsv(self, parts: list, talker: bytes) -> bool:
+        """解析GSV句子 - GNSS卫星可见信息, 收齐一组后替换该系统的卫星数据"""
+        if len(parts) < 4 or not parts[1] or not parts[2]:
+            return False
+        index = GSV_TALKER_INDEX[talker]
+        
+        pending = self._sat_pending[index]
+        if parts[2] == b'1':
+            pending.clear()
+        # 每颗卫星4个字段: PRN, 仰角, 方位角, 信噪比; NMEA 4.1 末尾可能多一个信号ID
+        pending += parts[4:4 + ((len(parts) - 4) & ~3)]
+        
+        if parts[1] == parts[2]:
+            self._sat_raw[index] = pending
+            self._sat_pending[index] = []
+            if parts[3]:
+                self._sat_in_view[index] = int(parts[3])
+            self.gps_data['satellites_in_view'] = sum(self._sat_in_view)
+        return False
     
-    def _parse_gsv(self, parts: list):
-        """解析GSV句子 - GNSS卫星可见信息"""
-        pass  # 可根据需要实现
+    def _update_sat_table(self):
+        """把收齐的GSV原始字段转换写入卫星表 (需持有 data_lock)"""
+        for index, raw in enumerate(self._sat_raw):
+            if raw is None:
+                continue
+            self._sat_raw[index] = None
+            values = [int(field) if field else -1 for field in raw]
+            # 去掉PRN为空的占位组
+            rows = [values[i:i + 4] for i in range(0, len(values), 4) if values[i] >= 0][:GSV_MAX_SATS]
+            if rows:
+                self.sat_table[index, :len(rows)] = rows
+            self.sat_count[index] = len(rows)
     
-    def _parse_coordinate(self, coord_str: str, direction: str) -> float:
+    def _parse_coordinate(self, coord_str: bytes, direction: bytes) -> float:
         """解析坐标"""
-        if not coord_str or not direction:
+        if not coord_str or not direction or len(coord_str) < 4:
             return None
         
-        # DDMM.MMMM格式转换为十进制度数
-        if len(coord_str) >= 4:
-            degrees = int(coord_str[:2] if direction in ['N', 'S'] else coord_str[:3])
-            minutes = float(coord_str[2:] if direction in ['N', 'S'] else coord_str[3:])
-            decimal_degrees = degrees + minutes / 60.0
-            
-            if direction in ['S', 'W']:
-                decimal_degrees = -decimal_degrees
-            
-            return decimal_degrees
-        return None
+        # DDMM.MMMM (纬度) / DDDMM.MMMM (经度) 格式转换为十进制度数
+        split = 2 if direction in (b'N', b'S') else 3
+        decimal_degrees = int(coord_str[:split]) + float(coord_str[split:]) / 60.0
+        return -decimal_degrees if direction in (b'S', b'W') else decimal_degrees
     
-    def _parse_time(self, time_str: str) -> str:
-        """解析时间 HHMMSS.SS"""
-        if len(time_str) >= 6:
-            hours = time_str[:2]
-            minutes = time_str[2:4]
-            # 支持毫秒级精度
-            if '.' in time_str and len(time_str) > 6:
-                seconds_with_ms = time_str[4:]
-                # 确保毫秒部分有3位
-                if '.' in seconds_with_ms:
-                    sec_part, ms_part = seconds_with_ms.split('.')
-                    ms_part = ms_part[:3].ljust(3, '0')  # 截取或补齐到3位
-                    return f"{hours}:{minutes}:{sec_part}.{ms_part}"
-                else:
-                    seconds = time_str[4:6]
-                    return f"{hours}:{minutes}:{seconds}.000"
-            else:
-                seconds = time_str[4:6]
-                return f"{hours}:{minutes}:{seconds}.000"
-        return None
+    def _parse_time(self, time_str: bytes) -> str:
+        """解析时间 HHMMSS.SS, 毫秒截取或补齐到3位"""
+        if len(time_str) < 6:
+            return None
+        time_str = time_str.decode('ascii')
+        if len(time_str) > 7 and time_str[6] == '.':
+            return f"{time_str[:2]}:{time_str[2:4]}:{time_str[4:6]}.{time_str[7:10].ljust(3, '0')}"
+        return f"{time_str[:2]}:{time_str[2:4]}:{time_str[4:6]}.000"
     
-    def _parse_date(self, date_str: str) -> str:
+    def _parse_date(self, date_str: bytes) -> str:
         """解析日期 DDMMYY"""
+        date_str = date_str.decode('ascii')
         if len(date_str) >= 6:
             day = date_str[:2]
             month = date_str[2:4]
@@ -218,65 +809,157 @@ class GNSS:
             return f"{year}-{month}-{day}"
         return None
     
-    def _validate_checksum(self, sentence: str) -> bool:
-        """验证NMEA校验和"""
-        if '*' not in sentence:
+    def _validate_checksum(self, sentence: bytes) -> bool:
+        """验证NMEA校验和, 语句以 *HH 结尾"""
+        if len(sentence) < 4 or sentence[-3] != 0x2A:  # '*'
             return False
-        
         try:
-            data, checksum = sentence.split('*')
-            calculated_checksum = 0
-            for char in data[1:]:  # 跳过$符号
-                calculated_checksum ^= ord(char)
-            
-            return format(calculated_checksum, '02X') == checksum.upper()
-        except:
+            return nmea_checksum(sentence[1:-3]) == int(sentence[-2:], 16)
+        except ValueError:
             return False
     
+    def register_metrics(self, prefix: str = 'gnss', registry=REGISTRY):
+        """把统计计数注册为指标 (采集时读取)"""
+        registry.counter(f'{prefix}_bytes_read_total', '串口读取字节数', fn=lambda: self.bytes_read)
+        registry.counter(f'{prefix}_sentences_total', '校验通过的语句数', fn=lambda: self.sentences)
+        registry.counter(f'{prefix}_checksum_errors_total', '校验和错误的语句数', fn=lambda: self.checksum_errors)
+        registry.gauge(f'{prefix}_fix_age_ms', '距最近一次定位的时间 (毫秒)', fn=self.get_fix_age_ms)
+    
+    def get_snapshot(self) -> GNSSFix:
+        """
+        获取当前数据的只读快照
+
+        快照在数据更新后才重建, 数据未变化时直接返回同一对象, 不加锁也不拷贝。
+        """
+        fix = self._snapshot
+        if fix is None:
+            with self.data_lock:
+                fix = self._snapshot
+                if fix is None:
+                    fix = self._snapshot = GNSSFix(**self.gps_data)
+        return fix
+    
+    def subscribe(self, callback: Callable[[GNSSFix], None],
+                  fields: Iterable[str] = ('latitude', 'longitude', 'altitude')):
+        """
+        订阅数据变化, fields 中任一字段变化时在读取线程中调用 callback(fix)
+
+        Args:
+            callback: 回调函数, 参数为 GNSSFix 快照, 应尽快返回
+            fields: 关注的字段, 为空时关注所有字段
+
+        Returns:
+            订阅句柄, 用于 unsubscribe
+        """
+        fields = tuple(fields) if fields else GNSSFix._fields
+        for field in fields:
+            if field not in GNSSFix._fields:
+                raise ValueError(f"未知字段: {field}")
+        subscriber = [callback, fields, None]
+        with self.data_lock:
+            self._subscribers += (subscriber,)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        """取消订阅"""
+        with self.data_lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+    
+    async def stream(self, fields: Iterable[str] = ('latitude', 'longitude', 'altitude'), maxsize: int = 1):
+        """
+        异步迭代数据变化: async for fix in gnss.stream(): ...
+
+        队列满时丢弃最旧的数据, 消费者慢时只会拿到最新的快照。
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=maxsize)
+        
+        def put_latest(fix):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(fix)
+        
+        subscriber = self.subscribe(lambda fix: loop.call_soon_threadsafe(put_latest, fix), fields)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(subscriber)
+    
     def get_position(self) -> Dict[str, Any]:
         """获取当前位置信息"""
-        with self.data_lock:
-            return {
-                'latitude': self.gps_data['latitude'],
-                'longitude': self.gps_data['longitude'],
-                'altitude': self.gps_data['altitude']
-            }
+        fix = self.get_snapshot()
+        return {
+            'latitude': fix.latitude,
+            'longitude': fix.longitude,
+            'altitude': fix.altitude
+        }
+    
+    def position_at(self, t: float) -> Optional[Dict[str, float]]:
+        """
+        获取 time.monotonic() 时刻 t 的插值位置
+
+        Returns:
+            FixHistory.FIELDS 各字段的字典, 超出历史范围时返回 None
+        """
+        return self.history.position_at(t)
+    
+    def positions_at(self, t_array) -> Dict[str, np.ndarray]:
+        """批量获取多个时刻的插值位置, 见 FixHistory.positions_at"""
+        return self.history.positions_at(t_array)
     
     def get_all_data(self) -> Dict[str, Any]:
         """获取所有GPS数据"""
+        return self.get_snapshot()._asdict()
+    
+    def get_fix_age_ms(self) -> Optional[float]:
+        """最近一次定位语句从接收到现在经过的时间 (毫秒)"""
+        recv_time_ns = self.get_snapshot().recv_time_ns
+        if recv_time_ns is None:
+            return None
+        return (time.monotonic_ns() - recv_time_ns) / 1e6
+    
+    def get_satellites(self) -> Dict[str, np.ndarray]:
+        """
+        获取可见卫星表
+
+        Returns:
+            系统 ('GP', 'GL', ...) -> (n, 4) int16 数组, 每行为 (PRN, 仰角, 方位角, 信噪比), 缺省值为 -1
+        """
         with self.data_lock:
-            return self.gps_data.copy()
+            self._update_sat_table()
+            return {system: self.sat_table[i, :self.sat_count[i]].copy()
+                    for i, system in enumerate(GSV_SYSTEMS) if self.sat_count[i]}
     
     def is_fix_valid(self) -> bool:
         """检查GPS定位是否有效"""
-        with self.data_lock:
-            return (self.gps_data['fix_quality'] is not None and 
-                   self.gps_data['fix_quality'] > 0 and
-                   self.gps_data['latitude'] is not None and
-                   self.gps_data['longitude'] is not None)
+        return self.get_snapshot().is_valid()
 
 
 # 使用示例
 if __name__ == "__main__":
     gnss = GNSS(port='/dev/ttyUSB1', baudrate=9600)
     
+    def on_fix(fix):
+        if fix.is_valid():
+            print(f"位置: {fix.latitude:.6f}, {fix.longitude:.6f}")
+            print(f"高度: {fix.altitude}m")
+            print(f"速度: {fix.speed}km/h")
+            print(f"卫星数: {fix.satellites}")
+            print(f"时间: {fix.timestamp}")
+            print("-" * 40)
+        else:
+            print("等待GPS定位...")
+    
+    # 位置或定位质量变化时打印
+    gnss.subscribe(on_fix, fields=('latitude', 'longitude', 'altitude', 'fix_quality'))
+    
     if gnss.start_reading():
         print("开始读取GNSS数据...")
         
         try:
             while True:
-                time.sleep(2)
-                data = gnss.get_all_data()
-                
-                if gnss.is_fix_valid():
-                    print(f"位置: {data['latitude']:.6f}, {data['longitude']:.6f}")
-                    print(f"高度: {data['altitude']}m")
-                    print(f"速度: {data['speed']}km/h")
-                    print(f"卫星数: {data['satellites']}")
-                    print(f"时间: {data['timestamp']}")
-                    print("-" * 40)
-                else:
-                    print("等待GPS定位...")
+                time.sleep(1)
                     
         except KeyboardInterrupt:
             print("\n停止读取...")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+airunit: 单进程 asyncio 运行时
+
+在一个事件循环中运行雷达读取、GNSS 和机械臂桥接, 不再为每个设备单独起进程和线程。
+串口用 loop.add_reader 监听文件描述符, 有数据时才读取, 机械臂命令用 loop.add_writer 非阻塞写出。
+MQTT 发布使用 mqtt_publisher.MqttPublisher (有界队列、自动重连), 事件循环中的 publish 只入队, 不等待网络。
+各子系统在同一个配置文件 (JSON) 中启用, 配置文件只需写出与 DEFAULT_CONFIG 不同的项:
+    python3 modules/airunit.py -c airunit.json
+
+串口写成 "auto" 时启动前用 discovery.py 按数据特征识别 (结果有缓存), 机械臂输出需要先在缓存中
+手工标记为 arm_output1 / arm_output2。识别只监听串口; 雷达还没有启动 (没有输出) 时, 首次识别需要把
+lidar 段的 probe_active 设为 true, 向没有输出的串口发送雷达启动命令。
+
+metrics 段的 port 非 0 时在 http://127.0.0.1:<port>/metrics 提供各单元的计数和延迟指标,
+stats_topic 非空时每 stats_interval 秒把指标以 JSON 发布到该主题。
+
+Ctrl+C 或 SIGTERM 时按启动的相反顺序停止: 停止雷达 (AX_LIDAR_Stop), 关闭串口, 断开 MQTT。
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import signal
+import sys
+import time
+
+import serial
+
+from laser import init_serial, AX_LIDAR_Init, AX_LIDAR_Start, AX_LIDAR_Stop, LD_DecodeFrames, LidarFrameReader, ScanBuffer
+from lidar_codec import LidarEncoder, encode_json, FORMAT_JSON
+from GNSS import GNSS
+from metrics import REGISTRY, start_http_server
+from arm import ArmFrameParser, AsyncArmWriter, ARM_MAX_RATE, ARM_DEADBAND, ARM_SPD, ARM_ACC, ARM_WRITE_TIMEOUT
+from mqtt_publisher import MqttPublisher
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'airunit.json')
+
+AUTO_PORT = 'auto'
+
+DEFAULT_CONFIG = {
+    'mqtt': {
+        'enabled': True,
+        'broker': '47.109.142.1',
+        'port': 1883,
+        'client_id': '',
+        'keepalive': 60,
+        'qos': 0,
+        'max_queue': 100,  # 待发送消息上限, 超出时丢弃最旧的
+        'max_inflight': 2,
+        'max_batch': 1,  # 大于 1 时合并积压的同主题消息发往 "<主题>/batch", 订阅端需要支持
+        'reconnect_min': 1.0,  # 重连退避的最小/最大间隔 (秒)
+        'reconnect_max': 60.0
+    },
+    'lidar': {
+        'enabled': True,
+        'port': '/dev/ttyUSB0',
+        'topic': 'lidar',
+        'payload_format': 'json',  # 见 lidar_codec.FORMATS
+        'resolution': 1.0,
+        'probe_active': False  # port 为 auto 时允许向没有输出的串口发送雷达启动命令 (见 discovery.py)
+    },
+    'gnss': {
+        'enabled': False,
+        'port': '/dev/ttyUSB1',
+        'baudrate': 9600,
+        'topic': 'gnss'
+    },
+    'arm': {
+        'enabled': False,
+        'input': '/dev/ttyUSB2',
+        'outputs': ['/dev/ttyUSB3', '/dev/ttyUSB4'],
+        'baudrate': 115200,
+        'max_rate': ARM_MAX_RATE,
+        'deadband': ARM_DEADBAND,
+        'spd': ARM_SPD,
+        'acc': ARM_ACC,
+        'write_timeout': ARM_WRITE_TIMEOUT
+    },
+    'metrics': {
+        'port': 9100,  # 0 表示不启动 HTTP 服务
+        'host': '127.0.0.1',
+        'stats_topic': '',  # 非空时定时发布指标 JSON
+        'stats_interval': 10.0
+    }
+}
+
+
+def load_config(path=None):
+    """读取配置文件并与默认配置合并, 文件不存在时使用默认配置"""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    path = path or DEFAULT_CONFIG_PATH
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            user = json.load(f)
+        for section, values in user.items():
+            if section not in config:
+                raise ValueError(f"未知的配置项: {section}")
+            config[section].update(values)
+    return config
+
+
+def resolve_ports(config):
+    """把启用的子系统中写成 'auto' 的串口替换为自动识别的结果"""
+    slots = []  # (子系统, 配置项, 列表下标, 设备类型)
+    if config['lidar']['enabled'] and config['lidar']['port'] == AUTO_PORT:
+        slots.append(('lidar', 'port', None, 'lidar'))
+    if config['gnss']['enabled'] and config['gnss']['port'] == AUTO_PORT:
+        slots.append(('gnss', 'port', None, 'gnss'))
+    if config['arm']['enabled']:
+        if config['arm']['input'] == AUTO_PORT:
+            slots.append(('arm', 'input', None, 'arm_input'))
+        for i, port in enumerate(config['arm']['outputs']):
+            if port == AUTO_PORT:
+                slots.append(('arm', 'outputs', i, f'arm_output{i + 1}'))
+    if not slots:
+        return
+
+    from discovery import discover
+    found = discover(roles=[role for _, _, _, role in slots], active=config['lidar']['probe_active'])
+    for section, key, index, role in slots:
+        info = found.get(role)
+        if info is None:
+            raise RuntimeError(f"没有识别到 {role} 设备")
+        if index is None:
+            config[section][key] = info.port
+        else:
+            config[section][key][index] = info.port
+        if role == 'gnss' and info.baudrate:
+            config['gnss']['baudrate'] = info.baudrate
+        print(f"{role}: {info.port}")
+
+
+def watch_serial(ser, callback):
+    """
+    在事件循环中监听串口, 有数据时读出全部可用字节交给 callback
+
+    串口改为非阻塞读取 (timeout=0)。读取出错 (设备拔出等) 时停止监听。
+    """
+    loop = asyncio.get_running_loop()
+    ser.timeout = 0
+    fd = ser.fileno()
+
+    def on_readable():
+        try:
+            data = ser.read(ser.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            print(f"串口读取错误 {ser.port}: {e}")
+            loop.remove_reader(fd)
+            return
+        if data:
+            callback(data)
+
+    loop.add_reader(fd, on_readable)
+    return fd
+
+
+class MqttUnit:
+    """
+    MQTT 发布单元
+
+    MqttPublisher 在自己的线程中连接、重连和发送, publish 只把消息放入有界队列, 不阻塞事件循环。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.publisher = MqttPublisher(config['broker'], config['port'], config['client_id'], config['keepalive'],
+                                       config['qos'], config['max_queue'], config['max_inflight'],
+                                       config['max_batch'], config['reconnect_min'], config['reconnect_max'])
+
+    async def start(self):
+        self.publisher.start()
+
+    def register_metrics(self, registry=REGISTRY):
+        self.publisher.register_metrics(registry)
+
+    def publish(self, topic, payload):
+        """消息入队, 不阻塞"""
+        self.publisher.publish(topic, payload)
+
+    async def stop(self):
+        # stop 会等待队列发完, 放到执行器中
+        await asyncio.get_running_loop().run_in_executor(None, self.publisher.stop)
+        metrics = self.publisher.metrics()
+        print(f"MQTT: 发布 {metrics['published']} 条, 丢弃 {metrics['dropped']} 条, 丢失 {metrics['lost']} 条")
+
+
+class LidarUnit:
+    """雷达读取和按圈发布"""
+
+    def __init__(self, config, mqtt):
+        self.config = config
+        self.mqtt = mqtt
+        self.ser = None
+        self.reader = LidarFrameReader()
+        self.scan_buffer = ScanBuffer(config['resolution'])
+        fmt = config['payload_format']
+        self.encoder = None if fmt == FORMAT_JSON else LidarEncoder(fmt, resolution=config['resolution'])
+        self.task = None
+
+    def _on_data(self, data):
+        # 一次读到的所有帧合并成一块批量解码
+        frames = b''.join(self.reader.feed(data))
+        if frames:
+            self.scan_buffer.update(*LD_DecodeFrames(frames))
+
+    async def start(self):
+        self.ser = init_serial(self.config['port'])
+        if not self.ser:
+            raise RuntimeError("雷达串口初始化失败")
+        AX_LIDAR_Init(self.ser)
+        await asyncio.sleep(1)
+        AX_LIDAR_Start(self.ser)
+        self.reader.register_metrics()
+        REGISTRY.counter('lidar_scans_total', '完整扫描圈数', fn=lambda: getattr(self.scan_buffer.latest(), 'seq', 0))
+        watch_serial(self.ser, self._on_data)
+        self.task = asyncio.get_running_loop().create_task(self._publish())
+        print(f"雷达: {self.config['port']}")
+
+    async def _publish(self):
+        seq = 0
+        topic = self.config['topic']
+        while True:
+            # 每转完一圈发送一次
+            scan = await self.scan_buffer.next_scan(seq)
+            seq = scan.seq
+            if self.mqtt:
+                if self.encoder is None:
+                    payload = encode_json(scan.timestamp, scan.distances.tolist())
+                else:
+                    payload = self.encoder.encode(scan.timestamp, scan.distances)
+                self.mqtt.publish(topic, payload)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        if self.ser:
+            asyncio.get_running_loop().remove_reader(self.ser.fileno())
+            try:
+                AX_LIDAR_Stop(self.ser)
+            finally:
+                self.ser.close()
+        print(f"雷达: {self.reader.frame_count} 帧, 重同步 {self.reader.resyncs} 次")
+
+
+class GnssUnit:
+    """GNSS 解析和定位发布"""
+
+    FIELDS = ('latitude', 'longitude', 'altitude', 'fix_quality', 'speed', 'course')
+
+    def __init__(self, config, mqtt):
+        self.config = config
+        self.mqtt = mqtt
+        self.gnss = GNSS(port=config['port'], baudrate=config['baudrate'])
+        self.task = None
+
+    async def start(self):
+        if not self.gnss.connect():
+            raise RuntimeError("GNSS串口连接失败")
+        self.gnss.register_metrics()
+        watch_serial(self.gnss.serial_conn, lambda data: self.gnss.feed(data, time.monotonic_ns()))
+        if self.mqtt:
+            self.task = asyncio.get_running_loop().create_task(self._publish())
+
+    async def _publish(self):
+        topic = self.config['topic']
+        async for fix in self.gnss.stream(self.FIELDS):
+            if fix.is_valid():
+                self.mqtt.publish(topic, json.dumps(fix._asdict(), separators=(',', ':')))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        conn = self.gnss.serial_conn
+        if conn and conn.is_open:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+        self.gnss.disconnect()
+
+
+class ArmUnit:
+    """机械臂桥接: 输入帧解析后交给两个机械臂的写任务"""
+
+    def __init__(self, config):
+        self.config = config
+        self.parser = ArmFrameParser()
+        self.ser_input = None
+        self.outputs = []
+        self.writers = []
+        self.tasks = []
+
+    def _on_data(self, data):
+        for values in self.parser.feed(data):
+            # 每组6个字节的前5个为关节值
+            self.writers[0].submit(values[:5])
+            self.writers[1].submit(values[6:11])
+
+    def _open(self, port):
+        # 读写都在事件循环中非阻塞进行 (watch_serial / AsyncArmWriter), write_timeout 只是兜底
+        ser = serial.Serial(port, baudrate=self.config['baudrate'], timeout=0,
+                            write_timeout=self.config['write_timeout'])
+        try:
+            ser.setRTS(False)
+            ser.setDTR(False)
+        except OSError:
+            pass  # pty 没有 modem 控制线
+        return ser
+
+    async def start(self):
+        config = self.config
+        loop = asyncio.get_running_loop()
+        self.ser_input = self._open(config['input'])
+        for i, port in enumerate(config['outputs']):
+            ser = self._open(port)
+            self.outputs.append(ser)
+            writer = AsyncArmWriter(ser, f'ARM{i + 1}', config['max_rate'], config['deadband'],
+                                    config['spd'], config['acc'], config['write_timeout'])
+            self.writers.append(writer)
+            writer.register_metrics()
+            self.tasks.append(loop.create_task(writer.run()))
+        self.parser.register_metrics()
+        watch_serial(self.ser_input, self._on_data)
+        print(f"机械臂: {config['input']} -> {', '.join(config['outputs'])}")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.ser_input:
+            asyncio.get_running_loop().remove_reader(self.ser_input.fileno())
+            self.ser_input.close()
+        for ser in self.outputs:
+            ser.close()
+        for writer in self.writers:
+            print(f"{writer.writer_name}: {writer.stats()}")
+        print(f"机械臂输入: {self.parser.frame_count} 帧, 重同步 {self.parser.resyncs} 次")
+
+
+class MetricsUnit:
+    """指标 HTTP 服务和定时发布"""
+
+    def __init__(self, config, mqtt):
+        self.config = config
+        self.mqtt = mqtt
+        self.server = None
+        self.task = None
+
+    async def start(self):
+        config = self.config
+        if self.mqtt:
+            self.mqtt.register_metrics()
+        if config['port']:
+            self.server = start_http_server(config['port'], config['host'])
+        if self.mqtt and config['stats_topic']:
+            self.task = asyncio.get_running_loop().create_task(self._publish())
+
+    async def _publish(self):
+        while True:
+            await asyncio.sleep(self.config['stats_interval'])
+            payload = json.dumps({'time': time.time(), 'metrics': REGISTRY.snapshot()}, separators=(',', ':'))
+            self.mqtt.publish(self.config['stats_topic'], payload)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+async def run(config):
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    mqtt = MqttUnit(config['mqtt']) if config['mqtt']['enabled'] else None
+    units = []
+    if mqtt:
+        units.append(mqtt)
+    if config['lidar']['enabled']:
+        units.append(LidarUnit(config['lidar'], mqtt))
+    if config['gnss']['enabled']:
+        units.append(GnssUnit(config['gnss'], mqtt))
+    if config['arm']['enabled']:
+        units.append(ArmUnit(config['arm']))
+    # 最后启动, 此时各单元的指标都已注册
+    units.append(MetricsUnit(config['metrics'], mqtt))
+
+    started = []
+    try:
+        for unit in units:
+            await unit.start()
+            started.append(unit)
+        print("airunit 已启动, Ctrl+C 退出")
+        await stop_event.wait()
+    finally:
+        print("正在停止...")
+        for unit in reversed(started):
+            try:
+                await unit.stop()
+            except Exception as e:
+                print(f"停止 {type(unit).__name__} 出错: {e}")
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='airunit 单进程运行时')
+    parser.add_argument('-c', '--config', help='配置文件 (JSON), 默认为仓库根目录的 airunit.json')
+    args = parser.parse_args()
+    config = load_config(args.config)
+    try:
+        resolve_ports(config)
+        asyncio.run(run(config))
+    except Exception as e:
+        # 以非 0 状态退出, 由 supervisor / systemd 按启动失败处理
+        print(f"启动失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
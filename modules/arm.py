@@ -1,13 +1,118 @@
 import serial
 import argparse
+import asyncio
 import threading
-import json
+import math
+import os
 import time
+from metrics import REGISTRY, Histogram, LATENCY_BUCKETS_MS, hotlog, start_http_server
 
 # 全局变量
 ser_input = None  # ttyUSB2 输入
 ser_output1 = None  # ttyUSB3 输出 (机械臂1)
 ser_output2 = None  # ttyUSB4 输出 (机械臂2)
+frame_parser = None  # 输入帧解析器
+arm_writer1 = None  # 机械臂1 写线程
+arm_writer2 = None  # 机械臂2 写线程
+arm_controller = None  # 定频控制线程 (启用定频模式时)
+
+# 输入帧格式: 帧头 03 FF D0 C7 + 12字节数据
+ARM_HEADER = b'\x03\xFF\xD0\xC7'
+ARM_PAYLOAD_LEN = 12
+ARM_FRAME_LEN = len(ARM_HEADER) + ARM_PAYLOAD_LEN
+ARM_READ_BUF_SIZE = 4096  # 接收缓冲区大小
+
+# 机械臂命令
+ARM_JOINTS = ('b', 's', 'e', 't', 'r')  # 每个机械臂使用的关节, 对应每组6个字节中的前5个
+ARM_SPD = 10
+ARM_ACC = 10
+ARM_MAX_RATE = 50.0  # 每个机械臂的最大命令频率 (Hz), 0 表示不限制
+ARM_DEADBAND = 0  # 各关节变化都不超过该值时不发送, 0 表示只跳过完全相同的命令
+ARM_CONTROL_RATE = 0.0  # 定频控制频率 (Hz), 0 表示不启用, 收到输入即发送
+ARM_MAX_VELOCITY = 100.0  # 定频控制时关节最大速度 (单位/秒)
+ARM_METRICS_PORT = 9101  # 本地 /metrics 端口, 0 表示不启动
+ARM_WRITE_TIMEOUT = 1.0  # 一条命令的写超时 (秒), 机械臂不读取或串口流控卡住时放弃这条命令
+
+# 定频控制抖动统计的分桶上界 (毫秒)
+JITTER_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50)
+# 超时周期超出截止时间的分桶上界 (毫秒), 以及一次超时跳过的周期数的分桶上界
+OVERRUN_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+OVERRUN_PERIOD_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+
+class ArmFrameParser:
+    """
+    输入帧增量解析器
+
+    数据分块写入预分配的缓冲区, 帧头查找从上次停止的位置继续, 不重复扫描;
+    12字节数据直接转换为整数元组产出。
+    """
+
+    def __init__(self, buf_size=ARM_READ_BUF_SIZE):
+        if buf_size < 2 * ARM_FRAME_LEN:
+            raise ValueError("buf_size 至少为两帧长度")
+        self.buf = bytearray(buf_size)
+        self.view = memoryview(self.buf)
+        self.head = 0  # 未处理数据起点 (帧头查找从这里继续)
+        self.tail = 0  # 有效数据终点
+
+        # 统计
+        self.bytes_read = 0
+        self.frame_count = 0
+        self.resyncs = 0
+        self.dropped_bytes = 0
+
+    def _compact(self):
+        """把未处理的数据搬到缓冲区开头"""
+        if self.head:
+            n = self.tail - self.head
+            if n:
+                self.view[:n] = self.view[self.head:self.tail]
+            self.head = 0
+            self.tail = n
+
+    def _drop(self, n):
+        self.resyncs += 1
+        self.dropped_bytes += n
+        self.head += n
+
+    def _extract(self):
+        """切出缓冲区中所有完整帧"""
+        buf = self.buf
+        while True:
+            pos = buf.find(ARM_HEADER, self.head, self.tail)
+            if pos < 0:
+                # 没有帧头: 只保留末尾可能是半个帧头的字节, 下次从这里继续查找
+                skipped = self.tail - self.head - (len(ARM_HEADER) - 1)
+                if skipped > 0:
+                    self._drop(skipped)
+                return
+            if pos != self.head:
+                self._drop(pos - self.head)
+            if pos + ARM_FRAME_LEN > self.tail:
+                return
+            self.head = pos + ARM_FRAME_LEN
+            self.frame_count += 1
+            yield tuple(self.view[pos + len(ARM_HEADER):self.head])
+
+    def register_metrics(self, prefix='arm_input', registry=REGISTRY):
+        """把统计计数注册为指标"""
+        registry.counter(f'{prefix}_bytes_read_total', '输入串口读取字节数', fn=lambda: self.bytes_read)
+        registry.counter(f'{prefix}_frames_total', '输入帧数', fn=lambda: self.frame_count)
+        registry.counter(f'{prefix}_resyncs_total', '帧头重同步次数', fn=lambda: self.resyncs)
+        registry.counter(f'{prefix}_dropped_bytes_total', '重同步丢弃的字节数', fn=lambda: self.dropped_bytes)
+
+    def feed(self, data):
+        """喂入一段原始数据, 逐个产出其中完整帧的12个数据字节 (整数元组)"""
+        src = memoryview(data)
+        size = len(self.buf)
+        self.bytes_read += len(src)
+        while len(src):
+            self._compact()
+            n = min(len(src), size - self.tail)
+            self.view[self.tail:self.tail + n] = src[:n]
+            self.tail += n
+            src = src[n:]
+            yield from self._extract()
 
 def parse_hex_data(hex_values):
     """
@@ -16,8 +121,14 @@ def parse_hex_data(hex_values):
     返回: 两个机械臂的参数字典
     """
     # 将16进制字符串转换为整数
-    values = [int(hex_val, 16) for hex_val in hex_values]
-    
+    return parse_values([int(hex_val, 16) for hex_val in hex_values])
+
+def parse_values(values):
+    """
+    解析12个字节值到机械臂参数
+    values: 12个整数
+    返回: 两个机械臂的参数字典
+    """
     # 分成两组，每组6个参数对应一个机械臂
     arm1_values = values[:6]
     arm2_values = values[6:]
@@ -42,89 +153,440 @@ def parse_hex_data(hex_values):
     
     return arm1_json, arm2_json
 
+class ArmCommandEncoder:
+    """
+    机械臂命令编码器
+
+    用预编译的字节模板生成与 json.dumps 完全一致的 {"T":122,...} 命令行,
+    与上一次发送的命令相比变化不超过死区时不生成命令。
+    """
+
+    def __init__(self, spd=ARM_SPD, acc=ARM_ACC, h=180, deadband=ARM_DEADBAND):
+        self.template = (b'{"T": 122, "b": %d, "s": %d, "e": %d, "t": %d, "r": %d, "h": '
+                         + str(int(h)).encode() + b', "spd": ' + str(int(spd)).encode()
+                         + b', "acc": ' + str(int(acc)).encode() + b'}\n')
+        self.deadband = deadband
+        self.last = None  # 上一次发送的关节值
+        self.suppressed = 0
+
+    def encode(self, joints):
+        """生成命令行 (含换行)"""
+        return self.template % tuple(joints)
+
+    def encode_if_changed(self, joints):
+        """
+        关节值相对上次发送的变化超过死区时返回命令行, 否则返回 None
+
+        不记录为已发送: 写出成功后由调用方调用 mark_sent, 写失败时下一次同样的关节值仍会重发。
+        """
+        last = self.last
+        if last is not None and all(abs(a - b) <= self.deadband for a, b in zip(joints, last)):
+            self.suppressed += 1
+            return None
+        return self.template % tuple(joints)
+
+    def mark_sent(self, joints):
+        """记录已经写出的关节值, 作为死区比较的基准"""
+        self.last = tuple(joints)
+
 def read_serial():
     """从ttyUSB2读取数据并解析"""
-    buffer = b''
+    global frame_parser
+    parser = frame_parser = ArmFrameParser()
+    parser.register_metrics()
     while True:
         try:
-            # 读取数据
-            data = ser_input.read(1)
-            if data:
-                buffer += data
-                
-                # 查找帧头 03 FF D0 C7
-                header = b'\x03\xFF\xD0\xC7'
-                header_pos = buffer.find(header)
+            # 读取当前可用的全部数据 (没有数据时按串口超时阻塞)
+            data = ser_input.read(ser_input.in_waiting or 1)
+            for values in parser.feed(data):
+                if hotlog.enabled:
+                    hotlog('arm_rx', data=bytes(values).hex(' ').upper())
                 
-                if header_pos != -1:
-                    # 找到帧头，提取数据部分
-                    start_pos = header_pos + len(header)
-                    
-                    # 需要12个字节的数据 (12个16进制数)
-                    if len(buffer) >= start_pos + 12:
-                        hex_data = buffer[start_pos:start_pos + 12]
-                        
-                        # 将字节转换为16进制字符串
-                        hex_strings = [f"{byte:02X}" for byte in hex_data]
-                        
-                        print(f"Received hex data: {' '.join(hex_strings)}")
-                        
-                        # 解析数据
-                        arm1_json, arm2_json = parse_hex_data(hex_strings)
-                        
-                        # 发送到两个机械臂
-                        send_to_arms(arm1_json, arm2_json)
-                        
-                        # 清理缓冲区
-                        buffer = buffer[start_pos + 12:]
-                        
-                # 限制缓冲区大小
-                if len(buffer) > 100:
-                    buffer = buffer[-50:]
+                # 每组6个字节的前5个为关节值, 直接交给两个机械臂的写线程
+                send_joints_to_arms(values[:5], values[6:11])
                     
         except Exception as e:
             print(f"Error reading serial: {e}")
             time.sleep(0.1)
 
-def send_to_arms(arm1_json, arm2_json):
-    """发送JSON数据到两个机械臂"""
+class _ArmWriterBase:
+    """写线程和 asyncio 写任务共用的命令槽设置与统计"""
+
+    def _setup(self, ser, name, max_rate, deadband, spd, acc):
+        self.ser = ser
+        self.writer_name = name
+        self.encoder = ArmCommandEncoder(spd=spd, acc=acc, deadband=deadband)
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.next_allowed = 0.0
+        self.pending = None  # (关节值, 提交时间)
+        self.running = True
+
+        # 统计
+        self.sent = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.write_time_total = 0.0
+        self.write_time_max = 0.0
+        self.queue_age_total = 0.0
+        self.queue_age_max = 0.0
+        self.latency = Histogram(bounds=LATENCY_BUCKETS_MS)  # 提交到写出完成 (毫秒)
+
+    def register_metrics(self, prefix=None, registry=REGISTRY):
+        """把统计计数注册为指标, prefix 默认为 arm1 / arm2"""
+        prefix = prefix or self.writer_name.lower()
+        registry.counter(f'{prefix}_commands_sent_total', '发出的命令数', fn=lambda: self.sent)
+        registry.counter(f'{prefix}_commands_coalesced_total', '被新命令覆盖的命令数', fn=lambda: self.coalesced)
+        registry.counter(f'{prefix}_commands_suppressed_total', '死区内未发送的命令数',
+                         fn=lambda: self.encoder.suppressed)
+        registry.counter(f'{prefix}_write_errors_total', '串口写错误数', fn=lambda: self.errors)
+        self.latency.name = f'{prefix}_command_latency_ms'
+        self.latency.help = '命令提交到写出完成的延迟 (毫秒)'
+        registry.register(self.latency)
+
+    def _write(self, line, submitted):
+        """写出一条命令并记录统计, 失败时返回 False"""
+        start = time.monotonic()
+        try:
+            self.ser.write(line)
+        except Exception as e:
+            return self._write_failed(e)
+        return self._written(start, submitted)
+
+    def _write_failed(self, error):
+        self.errors += 1
+        print(f"Error sending to {self.writer_name}: {error}")
+        return False
+
+    def _written(self, start, submitted):
+        """记录一次成功写出的统计, 返回 True"""
+        end = time.monotonic()
+        self.next_allowed = start + self.min_interval
+
+        age = start - submitted
+        write_time = end - start
+        self.sent += 1
+        self.queue_age_total += age
+        self.queue_age_max = max(self.queue_age_max, age)
+        self.write_time_total += write_time
+        self.write_time_max = max(self.write_time_max, write_time)
+        self.latency.observe((end - submitted) * 1000)
+        return True
+
+    def stats(self):
+        """统计信息, 时间单位为毫秒"""
+        n = max(self.sent, 1)
+        return {
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'suppressed': self.encoder.suppressed,
+            'errors': self.errors,
+            'write_ms_avg': self.write_time_total / n * 1000,
+            'write_ms_max': self.write_time_max * 1000,
+            'queue_age_ms_avg': self.queue_age_total / n * 1000,
+            'queue_age_ms_max': self.queue_age_max * 1000
+        }
+
+class ArmWriter(_ArmWriterBase, threading.Thread):
+    """
+    单个机械臂的写线程
+
+    只有一个命令槽, 新命令直接覆盖还没发出的旧命令 (计入 coalesced),
+    读取线程提交命令不会被串口输出阻塞。
+    两次发送间隔不小于 1/max_rate, 间隔内到达的命令只保留最新的;
+    与上次发送相同 (或在死区内) 的命令不发送 (计入 suppressed)。
+    """
+
+    def __init__(self, ser, name, max_rate=ARM_MAX_RATE, deadband=ARM_DEADBAND, spd=ARM_SPD, acc=ARM_ACC):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self._setup(ser, name, max_rate, deadband, spd, acc)
+        self.cond = threading.Condition()
+
+    def submit(self, joints):
+        """提交最新的关节值 (b, s, e, t, r), 不阻塞"""
+        with self.cond:
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = (joints, time.monotonic())
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                # 等待新命令, 并等到允许发送的时间 (期间到达的命令互相覆盖)
+                while self.running:
+                    if self.pending is None:
+                        self.cond.wait()
+                        continue
+                    delay = self.next_allowed - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if not self.running:
+                    return
+                joints, submitted = self.pending
+                self.pending = None
+
+            line = self.encoder.encode_if_changed(joints)
+            if line is not None and self._write(line, submitted):
+                self.encoder.mark_sent(joints)
+                if hotlog.enabled:
+                    hotlog('arm_tx', arm=self.name, command=line.decode().rstrip())
+
+async def _wait_writable(loop, fd, timeout):
+    """等待 fd 可写, 超时抛出 asyncio.TimeoutError"""
+    if timeout <= 0:
+        raise asyncio.TimeoutError
+    ready = loop.create_future()
+    loop.add_writer(fd, lambda: ready.done() or ready.set_result(None))
     try:
-        # 发送到机械臂1 (ttyUSB3)
-        if ser_output1:
-            json_str1 = json.dumps(arm1_json)
-            ser_output1.write(json_str1.encode() + b'\n')
-            print(f"Sent to ARM1: {json_str1}")
-        
-        # 发送到机械臂2 (ttyUSB4)  
-        if ser_output2:
-            json_str2 = json.dumps(arm2_json)
-            ser_output2.write(json_str2.encode() + b'\n')
-            print(f"Sent to ARM2: {json_str2}")
-            
-    except Exception as e:
-        print(f"Error sending to arms: {e}")
+        await asyncio.wait_for(ready, timeout)
+    finally:
+        loop.remove_writer(fd)
+
+class AsyncArmWriter(_ArmWriterBase):
+    """
+    ArmWriter 的 asyncio 版本, 在事件循环中以任务运行 (见 airunit.py)
+
+    语义与 ArmWriter 相同: 单命令槽、限速、死区。submit 只能在事件循环线程中调用。
+    串口写不下时用 loop.add_writer 等待可写, 不阻塞事件循环; 超过 write_timeout 没写完的命令放弃 (计入 errors),
+    写了一半的行在下一条命令前用换行结束。
+    """
+
+    def __init__(self, ser, name, max_rate=ARM_MAX_RATE, deadband=ARM_DEADBAND, spd=ARM_SPD, acc=ARM_ACC,
+                 write_timeout=ARM_WRITE_TIMEOUT):
+        self._setup(ser, name, max_rate, deadband, spd, acc)
+        self.write_timeout = write_timeout
+        self.partial = False  # 上一条命令只写出了一部分
+        self.event = asyncio.Event()
+
+    def submit(self, joints):
+        """提交最新的关节值 (b, s, e, t, r), 不阻塞"""
+        if self.pending is not None:
+            self.coalesced += 1
+        self.pending = (joints, time.monotonic())
+        self.event.set()
+
+    async def run(self):
+        while self.running:
+            await self.event.wait()
+            self.event.clear()
+            delay = self.next_allowed - time.monotonic()
+            if delay > 0:
+                # 等待期间到达的命令互相覆盖
+                await asyncio.sleep(delay)
+            if self.pending is None:
+                continue
+            joints, submitted = self.pending
+            self.pending = None
+
+            line = self.encoder.encode_if_changed(joints)
+            if line is not None and await self._write_async(line, submitted):
+                self.encoder.mark_sent(joints)
+
+    async def _write_async(self, line, submitted):
+        """在非阻塞的串口文件描述符上写出一条命令 (pyserial 以 O_NONBLOCK 打开), 失败时返回 False"""
+        loop = asyncio.get_running_loop()
+        fd = self.ser.fileno()
+        data = b'\n' + line if self.partial else line
+        view = memoryview(data)
+        start = time.monotonic()
+        deadline = start + self.write_timeout
+        try:
+            while view:
+                try:
+                    n = os.write(fd, view)
+                except BlockingIOError:
+                    n = 0
+                view = view[n:]
+                if view:
+                    await _wait_writable(loop, fd, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.partial = self.partial or len(view) < len(data)
+            return self._write_failed(f"写超时 ({self.write_timeout} s)")
+        except OSError as e:
+            self.partial = self.partial or len(view) < len(data)
+            return self._write_failed(e)
+        self.partial = False
+        return self._written(start, submitted)
+
+class ArmController(threading.Thread):
+    """
+    定频控制线程
+
+    按固定频率读取最新的操作目标, 关节设定值以不超过 max_velocity 的速度向目标插值,
+    再交给各机械臂的写线程。时刻按 time.monotonic 上的绝对截止时间排定, 不累积 sleep 漂移;
+    错过的周期直接跳过并计入 overruns。
+    唤醒延迟记入 jitter 直方图; 每次超时超出截止时间的时长和跳过的周期数分别记入
+    overrun 和 overrun_periods 直方图, 用于区分偶发的长停顿和持续的小超时。
+    """
+
+    def __init__(self, writers, rate=50.0, max_velocity=ARM_MAX_VELOCITY):
+        super().__init__(name='ArmController', daemon=True)
+        self.writers = writers
+        self.period = 1.0 / rate
+        self.max_step = max_velocity * self.period
+        self.targets = [None] * len(writers)  # 最新操作目标, 读取线程直接替换
+        self.setpoints = [None] * len(writers)  # 当前设定值 (浮点)
+        self.running = True
+
+        # 统计
+        self.ticks = 0
+        self.overruns = 0  # 跳过的周期数
+        self.jitter = Histogram('arm_control_lateness_ms', '控制周期唤醒相对截止时间的延迟 (毫秒)',
+                                JITTER_BUCKETS_MS)
+        self.overrun = Histogram('arm_control_overrun_ms', '超时周期超出截止时间的时长 (毫秒)',
+                                 OVERRUN_BUCKETS_MS)
+        self.overrun_periods = Histogram('arm_control_overrun_periods', '一次超时跳过的周期数',
+                                         OVERRUN_PERIOD_BUCKETS)
+
+    def register_metrics(self, registry=REGISTRY):
+        registry.counter('arm_control_ticks_total', '控制周期数', fn=lambda: self.ticks)
+        registry.counter('arm_control_overruns_total', '跳过的控制周期数', fn=lambda: self.overruns)
+        registry.register(self.jitter)
+        registry.register(self.overrun)
+        registry.register(self.overrun_periods)
+
+    def set_targets(self, *targets):
+        """设置各机械臂的目标关节值, 不阻塞"""
+        for i, joints in enumerate(targets):
+            self.targets[i] = joints
+
+    def stop(self):
+        self.running = False
+
+    def _step(self, index):
+        target = self.targets[index]
+        if target is None:
+            return
+        current = self.setpoints[index]
+        if current is None:
+            # 第一次收到目标, 直接到位
+            current = [float(v) for v in target]
+        else:
+            max_step = self.max_step
+            current = [c + max(-max_step, min(max_step, t - c)) for c, t in zip(current, target)]
+        self.setpoints[index] = current
+        self.writers[index].submit(tuple(int(round(v)) for v in current))
+
+    def run(self):
+        period = self.period
+        deadline = time.monotonic() + period
+        while self.running:
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.monotonic()
+            self.jitter.observe((now - deadline) * 1000)
+            self.ticks += 1
+
+            for index in range(len(self.writers)):
+                self._step(index)
+
+            # 下一个截止时间; 处理超时时跳过已经错过的周期
+            deadline += period
+            now = time.monotonic()
+            if now > deadline:
+                missed = math.ceil((now - deadline) / period)
+                self.overruns += missed
+                self.overrun.observe((now - deadline) * 1000)
+                self.overrun_periods.observe(missed)
+                deadline += missed * period
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'jitter_ms_max': self.jitter.max,
+            'jitter_ms': self.jitter.summary(),
+            'overrun_ms_max': self.overrun.max,
+            'overrun_ms': self.overrun.summary(),
+            'overrun_periods': self.overrun_periods.summary()
+        }
+
+def send_joints_to_arms(arm1_joints, arm2_joints):
+    """把两个机械臂的关节值 (b, s, e, t, r) 交给写线程 (定频模式下交给控制线程), 不等待发送完成"""
+    if arm_controller:
+        arm_controller.set_targets(arm1_joints, arm2_joints)
+        return
+    
+    # 机械臂1 (ttyUSB3)
+    if arm_writer1:
+        arm_writer1.submit(arm1_joints)
+    
+    # 机械臂2 (ttyUSB4)
+    if arm_writer2:
+        arm_writer2.submit(arm2_joints)
+
+def send_to_arms(arm1_json, arm2_json):
+    """把 parse_values 生成的命令字典交给两个机械臂的写线程"""
+    send_joints_to_arms([arm1_json[k] for k in ARM_JOINTS], [arm2_json[k] for k in ARM_JOINTS])
 
 def main():
-    global ser_input, ser_output1, ser_output2
+    global ser_input, ser_output1, ser_output2, arm_writer1, arm_writer2, arm_controller
+    
+    parser = argparse.ArgumentParser(description='机械臂串口桥接')
+    parser.add_argument('--max-rate', type=float, default=ARM_MAX_RATE,
+                        help='每个机械臂的最大命令频率 (Hz), 0 表示不限制')
+    parser.add_argument('--deadband', type=int, default=ARM_DEADBAND,
+                        help='关节变化死区, 变化不超过该值时不发送')
+    parser.add_argument('--control-rate', type=float, default=ARM_CONTROL_RATE,
+                        help='定频控制频率 (Hz), 0 表示收到输入即发送')
+    parser.add_argument('--max-velocity', type=float, default=ARM_MAX_VELOCITY,
+                        help='定频控制时关节最大速度 (单位/秒)')
+    parser.add_argument('--spd', type=int, default=ARM_SPD, help='命令中的 spd')
+    parser.add_argument('--acc', type=int, default=ARM_ACC, help='命令中的 acc')
+    parser.add_argument('--input', default='/dev/ttyUSB2', help='输入串口 (回放时为 pty 路径)')
+    parser.add_argument('--output1', default='/dev/ttyUSB3', help='机械臂1 串口')
+    parser.add_argument('--output2', default='/dev/ttyUSB4', help='机械臂2 串口')
+    parser.add_argument('--metrics-port', type=int, default=ARM_METRICS_PORT,
+                        help='本地 /metrics 端口, 0 表示不启动')
+    args = parser.parse_args()
     
     try:
         # 打开串口
         print("Opening serial ports...")
-        ser_input = serial.Serial('/dev/ttyUSB2', baudrate=115200, timeout=1)
-        ser_output1 = serial.Serial('/dev/ttyUSB3', baudrate=115200, timeout=1)
-        ser_output2 = serial.Serial('/dev/ttyUSB4', baudrate=115200, timeout=1)
+        ser_input = serial.Serial(args.input, baudrate=115200, timeout=1)
+        ser_output1 = serial.Serial(args.output1, baudrate=115200, timeout=1, write_timeout=ARM_WRITE_TIMEOUT)
+        ser_output2 = serial.Serial(args.output2, baudrate=115200, timeout=1, write_timeout=ARM_WRITE_TIMEOUT)
         
         # 设置串口参数
         for ser in [ser_input, ser_output1, ser_output2]:
-            ser.setRTS(False)
-            ser.setDTR(False)
+            try:
+                ser.setRTS(False)
+                ser.setDTR(False)
+            except OSError:
+                pass  # pty 没有 modem 控制线
         
         print("Serial ports opened successfully")
-        print("Input: /dev/ttyUSB2")
-        print("Output1 (ARM1): /dev/ttyUSB3") 
-        print("Output2 (ARM2): /dev/ttyUSB4")
+        print(f"Input: {args.input}")
+        print(f"Output1 (ARM1): {args.output1}") 
+        print(f"Output2 (ARM2): {args.output2}")
         print("Waiting for data...")
         
+        # 启动两个机械臂的写线程, 定频模式下由控制线程限速
+        max_rate = 0 if args.control_rate > 0 else args.max_rate
+        arm_writer1 = ArmWriter(ser_output1, 'ARM1', max_rate, args.deadband, args.spd, args.acc)
+        arm_writer2 = ArmWriter(ser_output2, 'ARM2', max_rate, args.deadband, args.spd, args.acc)
+        arm_writer1.register_metrics()
+        arm_writer2.register_metrics()
+        arm_writer1.start()
+        arm_writer2.start()
+        
+        # 定频控制线程
+        if args.control_rate > 0:
+            arm_controller = ArmController([arm_writer1, arm_writer2], args.control_rate, args.max_velocity)
+            arm_controller.register_metrics()
+            arm_controller.start()
+            print(f"Control loop: {args.control_rate} Hz, max velocity {args.max_velocity}/s")
+        
+        if args.metrics_port:
+            start_http_server(args.metrics_port)
+        
         # 启动读取线程
         serial_recv_thread = threading.Thread(target=read_serial)
         serial_recv_thread.daemon = True
@@ -141,6 +603,18 @@ def main():
         print(f"Error: {e}")
         
     finally:
+        # 停止控制线程和写线程
+        if arm_controller:
+            arm_controller.stop()
+            arm_controller.join(timeout=2)
+            print(f"Control loop: {arm_controller.stats()}")
+
+        for writer in (arm_writer1, arm_writer2):
+            if writer:
+                writer.stop()
+                writer.join(timeout=2)
+                print(f"{writer.name}: {writer.stats()}")
+        
         # 关闭串口
         if ser_input:
             ser_input.close()
@@ -149,6 +623,9 @@ def main():
         if ser_output2:
             ser_output2.close()
         print("Serial ports closed")
+        if frame_parser:
+            print(f"Frames: {frame_parser.frame_count}, resyncs: {frame_parser.resyncs}, "
+                  f"dropped bytes: {frame_parser.dropped_bytes}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
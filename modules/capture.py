@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多设备原始串口数据录制与回放
+
+录制: 打开各设备串口, 把收发的原始字节按 (单调时间戳, 设备号, 方向, 数据块) 追加写入日志。
+可选为每个设备创建 pty 并转发 (tee), 原程序改为打开 pty 即可在录制的同时正常工作:
+    python3 capture.py record -o field.cap \\
+        --device lidar=/dev/ttyUSB0:230400 --device gnss=/dev/ttyUSB1:9600 \\
+        --device arm=/dev/ttyUSB2:115200 --link lidar=/tmp/ttyLIDAR
+
+回放: 按 1 倍、N 倍或最快速度把设备发出的字节写入 pty (或进程内的 loop:// 串口),
+laser / GNSS / arm 的读取代码不需要修改, 打开回放的 pty 即可:
+    python3 capture.py replay field.cap --speed 10 --link lidar=/tmp/ttyLIDAR --link gnss=/tmp/ttyGNSS
+    python3 capture.py info field.cap
+
+日志格式 (小端, 只追加, 可直接 mmap 读取):
+    文件头 8 字节: 魔数 b'AXCAP' + 版本 u8 + 2 字节保留
+    记录头 16 字节: 时间戳 i64 (time.monotonic_ns), 设备号 u8, 方向 u8, 保留 u16, 长度 u32
+    记录数据: 长度个字节
+    方向 DIR_SESSION 的记录开始一个录制会话, 数据为 JSON {"wall_time"}
+    方向 DIR_META 的记录声明设备, 数据为 JSON {"name", "port", "baudrate"}
+
+每次录制追加一个会话: 单调时钟在重启后从头开始, 设备号在每个会话中重新分配。
+读取时同名设备合并为一个设备号, 各会话的时间戳依次接在上一个会话之后, 回放不会在会话之间停顿或倒退。
+"""
+
+import argparse
+import json
+import mmap
+import os
+import select
+import struct
+import threading
+import time
+import tty
+from collections import namedtuple
+
+import serial
+
+CAPTURE_MAGIC = b'AXCAP'
+CAPTURE_VERSION = 1
+FILE_HEADER = struct.Struct('<5sB2x')
+RECORD_HEADER = struct.Struct('<qBBHI')
+
+DIR_RX = 0  # 设备 -> 主机
+DIR_TX = 1  # 主机 -> 设备
+DIR_SESSION = 0xFE  # 会话开始
+DIR_META = 0xFF  # 设备声明
+
+CAPTURE_READ_SIZE = 65536  # 每次读取的最大字节数
+CAPTURE_FLUSH_INTERVAL = 0.5  # 录制时刷新到磁盘的间隔 (秒)
+CAPTURE_TEE_BUFFER = 1 << 20  # 转发到 pty 的待写数据上限, 超出部分丢弃 (只影响转发, 不影响录制)
+
+Record = namedtuple('Record', ['timestamp_ns', 'device', 'direction', 'data'])
+
+
+def parse_device(spec):
+    """解析 name=port[:baudrate]"""
+    name, _, rest = spec.partition('=')
+    if not name or not rest:
+        raise argparse.ArgumentTypeError(f"设备格式应为 name=port[:baudrate]: {spec}")
+    port, baudrate = rest, 115200
+    head, sep, tail = rest.rpartition(':')
+    if sep and tail.isdigit():
+        port, baudrate = head, int(tail)
+    return name, port, baudrate
+
+
+def parse_link(spec):
+    """解析 name=path"""
+    name, _, path = spec.partition('=')
+    if not name or not path:
+        raise argparse.ArgumentTypeError(f"链接格式应为 name=path: {spec}")
+    return name, path
+
+
+class CaptureWriter:
+    """
+    只追加的录制日志
+
+    打开已有的日志时先检查文件头 (不是录制日志时抛出 ValueError), 截掉上次被中断的不完整记录,
+    再写入会话开始记录。
+    """
+
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            log = CaptureLog(path)
+            end = log.end
+            log.close()
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION))
+        self.lock = threading.Lock()
+        self.devices = {}  # name -> 设备号
+        self.records = 0
+        self.bytes = 0
+        self.write(0, DIR_SESSION, json.dumps({'wall_time': time.time()}).encode())
+
+    def add_device(self, name, port='', baudrate=0):
+        """声明设备, 返回设备号"""
+        if name in self.devices:
+            return self.devices[name]
+        device = len(self.devices)
+        self.devices[name] = device
+        meta = json.dumps({'name': name, 'port': port, 'baudrate': baudrate}).encode()
+        self.write(device, DIR_META, meta)
+        return device
+
+    def write(self, device, direction, data, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        with self.lock:
+            self.file.write(RECORD_HEADER.pack(timestamp_ns, device, direction, 0, len(data)))
+            self.file.write(data)
+            self.records += 1
+            self.bytes += len(data)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class CaptureLog:
+    """
+    用 mmap 读取录制日志, 记录数据为 memoryview, 不复制
+
+    records 返回的设备号和时间戳已经换算为全日志统一的设备号和连续的时间轴 (见模块说明)。
+    记录数据在 close 之后仍然可以使用: 还有记录引用映射时, 映射在这些记录释放后才解除。
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            raise ValueError("不是录制日志")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.map)
+        if magic != CAPTURE_MAGIC:
+            raise ValueError("不是录制日志")
+        if version != CAPTURE_VERSION:
+            raise ValueError(f"不支持的版本: {version}")
+        self.view = memoryview(self.map)
+        self.devices = {}  # 设备号 -> 设备信息 (同名设备取最后一次声明)
+        self.sessions = []  # 每个会话: wall_time, first_ns, last_ns, offset_ns, devices (会话内设备号 -> 设备号)
+        self.truncated = False  # 末尾记录不完整 (录制被中断)
+        self.end = FILE_HEADER.size  # 最后一条完整记录的结束位置
+        self._scan()
+
+    def _raw_records(self):
+        """依次返回文件中的原始记录 (会话内的设备号和时间戳)"""
+        view = self.view
+        end = len(view)
+        pos = FILE_HEADER.size
+        unpack = RECORD_HEADER.unpack_from
+        size = RECORD_HEADER.size
+        while pos + size <= end:
+            timestamp_ns, device, direction, _, length = unpack(view, pos)
+            pos += size
+            if pos + length > end:
+                self.truncated = True
+                return
+            yield Record(timestamp_ns, device, direction, view[pos:pos + length])
+            pos += length
+            self.end = pos
+        if pos < end:
+            self.truncated = True
+
+    def _sessions(self):
+        """依次返回 (原始记录, 所属会话); 第一条会话记录之前的记录 (没有会话记录的旧日志) 属于一个隐含的会话"""
+        sessions = iter(self.sessions)
+        session = None
+        for record in self._raw_records():
+            if session is None or record.direction == DIR_SESSION:
+                session = next(sessions)
+            yield record, session
+
+    def _scan(self):
+        """读取设备声明, 统计各会话的时间范围, 计算时间戳偏移"""
+        names = {}  # 设备名 -> 设备号
+        session = None
+        for record in self._raw_records():
+            if session is None or record.direction == DIR_SESSION:
+                session = {'wall_time': None, 'first_ns': None, 'last_ns': None, 'offset_ns': 0, 'devices': {}}
+                self.sessions.append(session)
+            if record.direction == DIR_SESSION:
+                session['wall_time'] = json.loads(bytes(record.data)).get('wall_time')
+            elif record.direction == DIR_META:
+                info = json.loads(bytes(record.data))
+                device = names.setdefault(info['name'], len(names))
+                self.devices[device] = info
+                session['devices'][record.device] = device
+            else:
+                if session['first_ns'] is None:
+                    session['first_ns'] = record.timestamp_ns
+                session['last_ns'] = record.timestamp_ns
+
+        # 每个会话的第一条记录接在上一个会话的最后一条记录之后
+        end_ns = None
+        for session in self.sessions:
+            if session['first_ns'] is None:
+                continue
+            if end_ns is not None:
+                session['offset_ns'] = end_ns - session['first_ns']
+            end_ns = session['last_ns'] + session['offset_ns']
+
+    def records(self, meta=False):
+        """依次返回日志中的记录, meta 为 True 时包括会话开始和设备声明记录"""
+        for record, session in self._sessions():
+            direction = record.direction
+            if direction == DIR_SESSION or direction == DIR_META:
+                if meta:
+                    yield record
+                continue
+            yield Record(record.timestamp_ns + session['offset_ns'],
+                         session['devices'].get(record.device, record.device), direction, record.data)
+
+    def device_id(self, name):
+        for device, info in self.devices.items():
+            if info['name'] == name:
+                return device
+        raise KeyError(f"日志中没有设备: {name}")
+
+    def summary(self):
+        stats = {}
+        first = last = None
+        for record in self.records():
+            if first is None:
+                first = record.timestamp_ns
+            last = record.timestamp_ns
+            key = (self.devices.get(record.device, {}).get('name', record.device),
+                   'rx' if record.direction == DIR_RX else 'tx')
+            count, total = stats.get(key, (0, 0))
+            stats[key] = (count + 1, total + len(record.data))
+        duration = (last - first) / 1e9 if first is not None else 0.0
+        return duration, stats
+
+    def close(self):
+        self.view.release()
+        self.file.close()
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # 还有记录数据引用映射, 最后一个引用释放时由 mmap 对象自己解除映射
+
+
+def open_pty(link=None):
+    """创建 pty, 返回 (主端 fd, 从端 fd, 从端路径); link 不为空时在该路径创建指向从端的符号链接"""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    if link:
+        if os.path.islink(link):
+            os.unlink(link)
+        os.symlink(path, link)
+    # 保持从端打开, 程序关闭再重开从端时主端不会读到 EIO
+    return master, slave, path
+
+
+class Recorder:
+    """
+    录制多个串口设备的收发数据
+
+    设备有对应的 pty 时, 设备发来的数据转发到 pty, 程序写入 pty 的数据转发到设备 (同时录制为 DIR_TX)。
+    所有设备在一个 select 循环中处理。
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.channels = []  # (设备号, 名称, 串口, pty 主端 fd)
+        self.running = True
+        self.tee_pending = {}  # pty 主端 fd -> 待写入的数据
+        self.tee_dropped = 0  # 程序没在读, 待写数据超过上限时丢弃的字节数
+
+    def add(self, name, port, baudrate, link=None):
+        ser = serial.serial_for_url(port, baudrate=baudrate, timeout=0)
+        device = self.writer.add_device(name, port, baudrate)
+        master = None
+        if link:
+            master, _, path = open_pty(link)
+            os.set_blocking(master, False)
+            print(f"{name}: {port} -> {path} ({link})")
+        self.channels.append((device, name, ser, master))
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        writer = self.writer
+        readers = {}
+        for device, name, ser, master in self.channels:
+            readers[ser.fileno()] = (device, DIR_RX, ser, master)
+            if master is not None:
+                readers[master] = (device, DIR_TX, ser, master)
+
+        pending = self.tee_pending
+        last_flush = time.monotonic()
+        while self.running:
+            ready, writable, _ = select.select(list(readers), [fd for fd in pending if pending[fd]], [], 0.2)
+            for fd in writable:
+                self._flush_tee(fd)
+            for fd in ready:
+                device, direction, ser, master = readers[fd]
+                try:
+                    data = os.read(fd, CAPTURE_READ_SIZE)
+                except OSError:
+                    continue
+                if not data:
+                    continue
+                writer.write(device, direction, data)
+                if direction == DIR_RX:
+                    if master is not None:
+                        buf = pending.setdefault(master, bytearray())
+                        room = CAPTURE_TEE_BUFFER - len(buf)
+                        if len(data) > room:
+                            self.tee_dropped += len(data) - max(room, 0)
+                            data = data[:max(room, 0)]
+                        buf += data
+                        self._flush_tee(master)
+                else:
+                    ser.write(data)
+
+            now = time.monotonic()
+            if now - last_flush >= CAPTURE_FLUSH_INTERVAL:
+                writer.flush()
+                last_flush = now
+
+        writer.flush()
+        for _, _, ser, _ in self.channels:
+            ser.close()
+
+    def _flush_tee(self, fd):
+        buf = self.tee_pending[fd]
+        try:
+            n = os.write(fd, buf)
+        except BlockingIOError:
+            return
+        del buf[:n]
+
+
+class Replayer:
+    """
+    按录制时的时间间隔回放设备发出的数据
+
+    speed 为回放倍速, 0 表示不等待, 尽快回放。
+    目标可以是 pty (open_pty) 或任何带 write 方法的对象, 例如 serial_for_url('loop://')。
+    pyserial 的 loop:// 缓冲区只有 4096 字节, 写满后阻塞, 读取端需要在另一个线程中同时读取。
+    """
+
+    def __init__(self, log, speed=1.0):
+        self.log = log
+        self.speed = speed
+        self.targets = {}  # 设备号 -> 写函数
+        self.masters = []  # 需要排空的 pty 主端 (程序写入的数据)
+        self.running = True
+
+        # 统计
+        self.records = 0
+        self.bytes = 0
+        self.late_ns = 0  # 最大落后时间
+        self.drained = 0  # 程序写入 pty 的字节数
+
+    def attach(self, name, target):
+        """把设备 name 的数据写入 target (带 write 方法的对象)"""
+        self.targets[self.log.device_id(name)] = target.write
+
+    def attach_pty(self, name, link=None):
+        """为设备 name 创建 pty, 返回从端路径"""
+        master, _, path = open_pty(link)
+        os.set_blocking(master, False)
+        device = self.log.device_id(name)
+        self.targets[device] = lambda data, fd=master: self._write_fd(fd, data)
+        self.masters.append(master)
+        return path
+
+    def stop(self):
+        self.running = False
+
+    def _write_fd(self, fd, data):
+        view = memoryview(data)
+        while view:
+            try:
+                n = os.write(fd, view)
+            except BlockingIOError:
+                n = 0
+            view = view[n:]
+            if view:
+                # pty 缓冲区满, 等待程序读取, 同时排空程序写入的数据
+                select.select([], [fd], [], 0.05)
+                self._drain()
+
+    def _drain(self):
+        if not self.masters:
+            return
+        ready, _, _ = select.select(self.masters, [], [], 0)
+        for fd in ready:
+            try:
+                self.drained += len(os.read(fd, CAPTURE_READ_SIZE))
+            except OSError:
+                pass
+
+    def run(self):
+        targets = self.targets
+        speed = self.speed
+        start = None
+        for record in self.log.records():
+            if not self.running:
+                break
+            if record.direction != DIR_RX:
+                continue
+            write = targets.get(record.device)
+            if write is None:
+                continue
+
+            now = time.monotonic_ns()
+            if start is None:
+                start = (now, record.timestamp_ns)
+            elif speed > 0:
+                due = start[0] + int((record.timestamp_ns - start[1]) / speed)
+                if due > now:
+                    time.sleep((due - now) / 1e9)
+                elif now - due > self.late_ns:
+                    self.late_ns = now - due
+
+            write(record.data)
+            self.records += 1
+            self.bytes += len(record.data)
+            self._drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多设备原始串口数据录制与回放')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='录制')
+    rec.add_argument('-o', '--output', required=True, help='日志文件 (追加写入)')
+    rec.add_argument('--device', type=parse_device, action='append', required=True,
+                     help='name=port[:baudrate], 可重复')
+    rec.add_argument('--link', type=parse_link, action='append', default=[],
+                     help='name=path, 为设备创建 pty 转发并在 path 创建链接')
+
+    rep = sub.add_parser('replay', help='回放')
+    rep.add_argument('log', help='日志文件')
+    rep.add_argument('--speed', type=float, default=1.0, help='回放倍速, 0 表示尽快回放')
+    rep.add_argument('--link', type=parse_link, action='append', default=[],
+                     help='name=path, 为设备创建 pty 并在 path 创建链接, 不指定则回放全部设备')
+    rep.add_argument('--wait', type=float, default=1.0, help='创建 pty 后等待程序打开的时间 (秒)')
+
+    info = sub.add_parser('info', help='查看日志')
+    info.add_argument('log', help='日志文件')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        writer = CaptureWriter(args.output)
+        recorder = Recorder(writer)
+        links = dict(args.link)
+        for name, port, baudrate in args.device:
+            recorder.add(name, port, baudrate, links.get(name))
+        print(f"录制到 {args.output}, Ctrl+C 结束")
+        try:
+            recorder.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+            print(f"记录 {writer.records} 条, {writer.bytes} 字节, pty 丢弃 {recorder.tee_dropped} 字节")
+
+    elif args.command == 'replay':
+        log = CaptureLog(args.log)
+        replayer = Replayer(log, args.speed)
+        links = args.link or [(info['name'], None) for info in log.devices.values()]
+        for name, link in links:
+            path = replayer.attach_pty(name, link)
+            print(f"{name}: {path}" + (f" ({link})" if link else ""))
+        time.sleep(args.wait)
+        t0 = time.perf_counter()
+        try:
+            replayer.run()
+        except KeyboardInterrupt:
+            pass
+        dt = time.perf_counter() - t0
+        print(f"回放 {replayer.records} 条, {replayer.bytes} 字节, 用时 {dt:.2f} s, "
+              f"最大落后 {replayer.late_ns / 1e6:.1f} ms")
+        log.close()
+
+    else:
+        log = CaptureLog(args.log)
+        duration, stats = log.summary()
+        print(f"时长 {duration:.2f} s, {len(log.sessions)} 个会话" + (" (末尾记录不完整)" if log.truncated else ""))
+        for device, info in sorted(log.devices.items()):
+            print(f"  [{device}] {info['name']}: {info['port']} @ {info['baudrate']}")
+        for (name, direction), (count, total) in sorted(stats.items(), key=str):
+            print(f"  {name} {direction}: {count} 块, {total} 字节")
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
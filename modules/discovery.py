@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口设备自动识别
+
+USB 串口的枚举顺序每次开机都可能不同, 写死 /dev/ttyUSB0 ~ 4 时经常出现 GNSS 读到雷达数据的情况。
+这里同时探测所有 /dev/ttyUSB* 和 /dev/ttyACM* (每个串口一个线程), 依次在候选波特率下读取,
+按数据特征判断设备:
+    lidar      LD 帧头 AA 55, 且间隔 LD_F_LEN 字节重复出现 (230400)
+    gnss       校验和正确的 $..GGA 语句 (9600 / 115200 / 38400 / 57600)
+    arm_input  机械臂输入帧头 03 FF D0 C7, 且间隔 ARM_FRAME_LEN 字节重复出现 (115200)
+默认只监听, 不向串口写任何数据。雷达未启动时不输出数据, 可以用 --active (active=True) 主动探测:
+230400 下没有收到任何数据的串口会发送一次 AX_LIDAR_Start, 识别后再 AX_LIDAR_Stop。
+没有输出的机械臂控制板等也会收到这条命令, 所以只在首次识别时使用, 结果写入缓存后不再需要;
+缓存中的设备 (包括手工标记的机械臂输出) 不会再被探测。
+
+结果按 USB 序列号缓存 (没有序列号时为 VID:PID 加 USB 口位置, 非 USB 串口为设备路径),
+下次启动时缓存中的设备直接使用, 只探测新出现的串口。机械臂输出等无法识别的设备可以手工写入缓存,
+如 {"1A86:7523@1-1.3": {"role": "arm_output1"}}。
+
+    ports = discover()                  # {'lidar': PortInfo(port='/dev/ttyUSB2', ...), ...}
+    port = find_port('gnss', '/dev/ttyUSB1')
+    python3 modules/discovery.py [--refresh] [--verify] [--active]
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+from serial.tools import list_ports
+
+from laser import LD_HEADER, LD_F_LEN, AX_LIDAR_Start, AX_LIDAR_Stop
+from GNSS import count_nmea_sentences
+from arm import ARM_HEADER, ARM_FRAME_LEN
+
+PORT_PATTERNS = ('/dev/ttyUSB*', '/dev/ttyACM*')
+CACHE_PATH = os.path.expanduser('~/.cache/airunit/serial_ports.json')
+
+# 按顺序尝试的波特率; 每个波特率下检查所有特征
+PROBE_BAUDRATES = (230400, 115200, 9600, 38400, 57600)
+PROBE_DURATION = 1.2  # 每个波特率的最长监听时间 (秒), 应大于 GNSS 的输出周期
+PROBE_MAX_BYTES = 16384
+MIN_FRAMES = 3  # 判定为雷达/机械臂输入所需的最少连续帧数
+
+ROLES = ('lidar', 'gnss', 'arm_input')  # 能按数据特征识别的设备
+
+PortInfo = namedtuple('PortInfo', ['port', 'role', 'baudrate', 'identity', 'cached'])
+
+
+def _count_spaced(data, header, frame_len):
+    """统计后面 frame_len 字节处紧跟着下一个帧头的帧头个数"""
+    count = 0
+    pos = data.find(header)
+    while pos >= 0 and pos + frame_len + len(header) <= len(data):
+        if data.startswith(header, pos + frame_len):
+            count += 1
+            pos += frame_len
+        else:
+            pos = data.find(header, pos + 1)
+    return count
+
+
+def classify(data):
+    """根据一段原始数据判断设备类型, 无法判断返回 None"""
+    if _count_spaced(data, LD_HEADER, LD_F_LEN) >= MIN_FRAMES:
+        return 'lidar'
+    if _count_spaced(data, ARM_HEADER, ARM_FRAME_LEN) >= MIN_FRAMES:
+        return 'arm_input'
+    if count_nmea_sentences(data).get('GGA', 0) >= 1:
+        return 'gnss'
+    return None
+
+
+def _capture(ser, duration):
+    """读取 duration 秒, 识别出设备后提前返回 (数据, 设备类型)"""
+    data = bytearray()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline and len(data) < PROBE_MAX_BYTES:
+        chunk = ser.read(ser.in_waiting or 1)
+        if chunk:
+            data += chunk
+            role = classify(bytes(data))
+            if role:
+                return bytes(data), role
+    return bytes(data), None
+
+
+def probe_port(port, baudrates=PROBE_BAUDRATES, duration=PROBE_DURATION, active=False):
+    """
+    探测一个串口, active 为 True 时没有输出的串口会收到雷达启动命令
+
+    Returns:
+        (设备类型, 波特率), 无法识别时为 (None, None)
+    """
+    ser = serial.Serial()
+    ser.port = port
+    ser.baudrate = baudrates[0]
+    ser.timeout = 0.05
+    # 打开时不拉 DTR/RTS, 避免复位 ESP32 一类的开发板
+    ser.dtr = False
+    ser.rts = False
+    try:
+        ser.open()
+    except (serial.SerialException, OSError) as e:
+        print(f"无法打开 {port}: {e}")
+        return None, None
+    try:
+        for baudrate in baudrates:
+            ser.baudrate = baudrate
+            ser.reset_input_buffer()
+            data, role = _capture(ser, duration)
+            if role:
+                return role, baudrate
+            if active and not data and baudrate == 230400:
+                # 没有任何输出: 可能是未启动的雷达
+                AX_LIDAR_Start(ser)
+                data, role = _capture(ser, duration)
+                if role == 'lidar':
+                    AX_LIDAR_Stop(ser)
+                    return role, baudrate
+        return None, None
+    except (serial.SerialException, OSError) as e:
+        print(f"探测 {port} 出错: {e}")
+        return None, None
+    finally:
+        ser.close()
+
+
+def list_serial_ports(patterns=PORT_PATTERNS):
+    ports = []
+    for pattern in patterns:
+        ports.extend(sorted(glob.glob(pattern)))
+    return ports
+
+
+def usb_identities():
+    """设备路径 -> 标识: 有序列号时为 VID:PID:序列号, 否则为 VID:PID@USB口位置"""
+    identities = {}
+    for info in list_ports.comports():
+        if info.vid is None:
+            continue
+        key = f"{info.vid:04X}:{info.pid:04X}"
+        key += f":{info.serial_number}" if info.serial_number else f"@{info.location}"
+        identities[os.path.realpath(info.device)] = key
+    return identities
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('devices', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(devices, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'devices': devices}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _probe_all(jobs, duration, active):
+    """同时探测多个串口, jobs 为 [(串口, 波特率列表)]"""
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        return list(pool.map(lambda job: probe_port(job[0], job[1], duration, active), jobs))
+
+
+def discover(ports=None, roles=ROLES, cache_path=CACHE_PATH, refresh=False, verify=False, active=False,
+             duration=PROBE_DURATION):
+    """
+    识别串口设备
+
+    Args:
+        ports: 要检查的串口, 默认为 PORT_PATTERNS 匹配的全部
+        roles: 需要的设备; 缓存中已经全部找到时不再探测其他串口 (如无法识别的机械臂输出)
+        cache_path: 缓存文件, None 表示不使用缓存
+        refresh: 忽略缓存, 全部重新探测
+        verify: 缓存中的设备也在缓存的波特率下快速确认一次 (比完整探测快)
+        active: 允许向没有输出的新串口发送雷达启动命令 (见模块说明)
+
+    Returns:
+        {设备类型: PortInfo}
+    """
+    ports = list_serial_ports() if ports is None else list(ports)
+    usb = usb_identities()
+    identities = {port: usb.get(os.path.realpath(port)) or f"path:{os.path.realpath(port)}" for port in ports}
+    cache = {} if refresh or not cache_path else load_cache(cache_path)
+
+    found = []
+    to_probe = []
+    to_verify = []
+    for port in ports:
+        entry = cache.get(identities[port])
+        if entry is None:
+            to_probe.append(port)
+        elif verify and entry.get('baudrate') and entry['role'] in ROLES:
+            # 只确认能按数据特征识别的设备, 手工标记的机械臂输出等直接使用
+            to_verify.append((port, entry))
+        else:
+            found.append(PortInfo(port, entry['role'], entry.get('baudrate'), identities[port], True))
+    if set(roles) <= {info.role for info in found} | {entry['role'] for _, entry in to_verify}:
+        to_probe = []
+
+    # 新串口完整探测, 缓存中的串口只在缓存的波特率下确认, 全部同时进行
+    jobs = [(port, PROBE_BAUDRATES) for port in to_probe]
+    jobs += [(port, (entry['baudrate'],)) for port, entry in to_verify]
+    failed = []
+    for (port, _), (role, baudrate) in zip(jobs, _probe_all(jobs, duration, active)):
+        verifying = port not in to_probe
+        if role:
+            found.append(PortInfo(port, role, baudrate, identities[port], verifying))
+        elif verifying:
+            failed.append(port)
+    if failed:
+        # 缓存与实际不符 (换了设备或波特率), 完整探测
+        print(f"缓存的设备未确认: {', '.join(failed)}, 重新探测")
+        jobs = []
+        for port in failed:
+            cache.pop(identities[port], None)
+            jobs.append((port, PROBE_BAUDRATES))
+        for (port, _), (role, baudrate) in zip(jobs, _probe_all(jobs, duration, active)):
+            if role:
+                found.append(PortInfo(port, role, baudrate, identities[port], False))
+
+    result = {}
+    for info in sorted(found, key=lambda info: info.port):
+        if info.role in result:
+            print(f"⚠️ {info.port} 和 {result[info.role].port} 都识别为 {info.role}, 使用 {result[info.role].port}")
+            continue
+        result[info.role] = info
+        cache[info.identity] = {'role': info.role, 'baudrate': info.baudrate, 'port': info.port}
+    if cache_path:
+        save_cache(cache, cache_path)
+    return result
+
+
+def find_port(role, default=None, **kwargs):
+    """返回识别到的 role 设备的串口路径, 没有找到时返回 default"""
+    info = discover(roles=(role,), **kwargs).get(role)
+    return info.port if info else default
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串口设备自动识别')
+    parser.add_argument('ports', nargs='*', help='要检查的串口, 默认为全部 ttyUSB* / ttyACM*')
+    parser.add_argument('--cache', default=CACHE_PATH, help='缓存文件')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存, 全部重新探测')
+    parser.add_argument('--verify', action='store_true', help='快速确认缓存中的设备')
+    parser.add_argument('--active', action='store_true',
+                        help='向没有输出的新串口发送雷达启动命令 (机械臂等其他设备也会收到)')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    result = discover(args.ports or None, ROLES, args.cache, args.refresh, args.verify, args.active)
+    elapsed = time.monotonic() - start
+    if args.json:
+        print(json.dumps({role: info._asdict() for role, info in result.items()}, ensure_ascii=False))
+        return
+    for role, info in sorted(result.items()):
+        source = '缓存' if info.cached else '探测'
+        print(f"{role:<12} {info.port:<16} {info.baudrate or '-':>6}  {info.identity}  ({source})")
+    print(f"用时 {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
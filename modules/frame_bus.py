@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存摄像头帧总线
+
+video.py 在解码后分出一路 (tee → 丢帧队列 → 缩放 → BGR → appsink), 把帧写入名为 FRAME_BUS_NAME
+的 FrameRing。机上的视觉处理 (雷达叠加、障碍检测) 按名字连接, 读取的是指向共享内存的 NumPy 视图,
+不拷贝, 也不需要再打开 /dev/video0 或解码 SRT 流。读取慢的消费者只会跳过帧, 不会反压编码推流:
+
+    ring = FrameRing.attach(FRAME_BUS_NAME)
+    seq = 0
+    while True:
+        frame, missed = ring.wait_next(seq, timeout=1.0)
+        if frame is None:
+            continue
+        seq = frame.seq
+        gray = cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY)   # frame.image 为只读 (高, 宽, 3) BGR
+        if not ring.valid(frame):
+            continue   # 处理期间该槽已被覆盖, 结果作废
+
+每个槽的元数据: 序号, time.monotonic() (各进程可直接比较), time.time(), 帧的 PTS, 高, 宽, 通道数。
+查看帧率和延迟: python3 modules/frame_bus.py
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from shm_ring import ShmRing, H_USER
+
+FRAME_BUS_NAME = 'airunit_frames'
+FRAME_BUS_SLOTS = 4
+
+# 头部中的帧总线字段: 每个槽可容纳的最大高、宽、通道数
+H_MAX_HEIGHT, H_MAX_WIDTH, H_CHANNELS = range(H_USER, H_USER + 3)
+
+FRAME_META = np.dtype([
+    ('monotonic', '<f8'),
+    ('timestamp', '<f8'),
+    ('pts', '<u8'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('reserved', '<u4')
+])
+
+Frame = namedtuple('Frame', ['seq', 'monotonic', 'timestamp', 'pts', 'image'])
+
+
+class FrameRing(ShmRing):
+    """共享内存中的帧环, 每个槽为一帧 uint8 图像"""
+
+    MAGIC = 0x46524D52494E47  # 'FRMRING'
+
+    @classmethod
+    def _payload_size(cls, slots, height=360, width=640, channels=3):
+        return slots * FRAME_META.itemsize + slots * height * width * channels
+
+    @classmethod
+    def _init_header(cls, header, height=360, width=640, channels=3):
+        header[H_MAX_HEIGHT] = height
+        header[H_MAX_WIDTH] = width
+        header[H_CHANNELS] = channels
+
+    def _map(self, offset):
+        header = self.header
+        self.max_height = int(header[H_MAX_HEIGHT])
+        self.max_width = int(header[H_MAX_WIDTH])
+        self.channels = int(header[H_CHANNELS])
+        self.slot_bytes = self.max_height * self.max_width * self.channels
+        buf = self.shm.buf
+        self.meta = np.ndarray((self.slots,), dtype=FRAME_META, buffer=buf, offset=offset)
+        offset += self.slots * FRAME_META.itemsize
+        self.data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8, buffer=buf, offset=offset)
+        if not self.writer:
+            self.meta.flags.writeable = False
+            self.data.flags.writeable = False
+
+    def _read_slot(self, i, seq):
+        meta = self.meta[i]
+        h, w, c = int(meta['height']), int(meta['width']), int(meta['channels'])
+        image = self.data[i, :h * w * c].reshape(h, w, c)
+        return Frame(seq, float(meta['monotonic']), float(meta['timestamp']), int(meta['pts']), image)
+
+    def write(self, data, height, width, stride=None, pts=0):
+        """
+        写入一帧 (只能有一个写者)
+
+        Args:
+            data: 支持缓冲区协议的像素数据, 每行 stride 字节 (默认 width * 通道数, GStreamer 可能按 4 字节对齐补齐)
+        """
+        c = self.channels
+        if height > self.max_height or width > self.max_width:
+            raise ValueError(f"帧 {width}x{height} 超过槽大小 {self.max_width}x{self.max_height}")
+        row = width * c
+        stride = stride or row
+        src = np.frombuffer(data, dtype=np.uint8, count=height * stride).reshape(height, stride)
+        i, seq = self.begin_write()
+        self.data[i, :height * row].reshape(height, row)[:] = src[:, :row]
+        self.meta[i] = (time.monotonic(), time.time(), pts, height, width, c, 0)
+        self.end_write(i, seq)
+        return seq
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看帧总线的帧率、延迟和跳帧')
+    parser.add_argument('--name', default=FRAME_BUS_NAME, help='共享内存名')
+    parser.add_argument('--interval', type=float, default=1.0, help='统计间隔 (秒)')
+    args = parser.parse_args()
+
+    ring = FrameRing.attach(args.name)
+    print(f"帧总线 {args.name}: {ring.slots} 槽, 最大 {ring.max_width}x{ring.max_height}x{ring.channels}")
+    seq = 0
+    frames = missed_total = 0
+    ages = []
+    last = time.monotonic()
+    try:
+        while True:
+            frame, missed = ring.wait_next(seq, timeout=1.0)
+            if frame is not None:
+                seq = frame.seq
+                frames += 1
+                missed_total += missed
+                ages.append((time.monotonic() - frame.monotonic) * 1000)
+            now = time.monotonic()
+            if now - last >= args.interval:
+                shape = frame.image.shape if frame is not None else None
+                age = f"{sorted(ages)[len(ages) // 2]:.1f} ms" if ages else '-'
+                print(f"{frames / (now - last):.1f} fps, 跳过 {missed_total} 帧, 延迟中位数 {age}, 形状 {shape}")
+                frames = missed_total = 0
+                ages = []
+                last = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frame = None
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 import serial
 import time
+import asyncio
+import threading
+from collections import namedtuple
+import numpy as np
+from metrics import REGISTRY, hotlog
 
 # 定义常量
 LD_HEADER1 = 0xAA
@@ -7,15 +12,17 @@ LD_HEADER2 = 0x55
 LD_F_LEN = 85
 LD_PNAM = 25
 LD_ALARM_DistanceMin = 50
+LD_HEADER = bytes([LD_HEADER1, LD_HEADER2])
+LD_READ_BUF_SIZE = 8192  # 接收缓冲区大小
 
 # 初始化雷达数据数组
-ax_lidar_data = [0] * 360
+ax_lidar_data = np.zeros(360, dtype=np.uint16)
 
 # 初始化串口
-def init_serial():
+def init_serial(port='/dev/ttyUSB0'):
     try:
         ser = serial.Serial(
-            port='/dev/ttyUSB0',  # 根据实际情况修改串口号
+            port=port,  # 根据实际情况修改串口号, 回放时传入 pty 路径
             baudrate=230400,
             bytesize=serial.EIGHTBITS,
             parity=serial.PARITY_NONE,
@@ -44,29 +51,526 @@ def AX_LIDAR_Stop(ser):
     for byte in uart4_tx_buf:
         ser.write(bytes([byte]))
 
-# 数据处理
-def LD_DataHandle(uart4_rx_buf2):
-    global ax_lidar_data
-    frame_data = []
-    angle_start = (((uart4_rx_buf2[5] << 8) + (uart4_rx_buf2[4] >> 1)) / 64.0)
-    angle_end = (((uart4_rx_buf2[7] << 8) + (uart4_rx_buf2[6] >> 1)) / 64.0)
-    if angle_start > angle_end:
-        angle_area = (angle_end + 360 - angle_start) / 24
-    else:
-        angle_area = (angle_end - angle_start) / 24
-
-    for i in range(25):
-        temp = angle_start + angle_area * i
-        angle = temp % 360
-        distance = ((uart4_rx_buf2[12 + i * 3] << 6) + (uart4_rx_buf2[11 + i * 3] >> 2))
-        frame_data.append({'angle': angle, 'distance': distance})
-
-    for point in frame_data:
-        index = int(point['angle'])
-        if 0 <=index < 360:
-            ax_lidar_data[index] = point['distance']
+# 最近障碍物索引
+class ObstacleIndex:
+    """
+    按扇区分块的最近障碍物索引, 随写入增量更新
+
+    角度箱每 SECTOR 个为一个扇区, 扇区最小值存放在一棵小线段树中。写入一帧只需一次 NumPy 赋值,
+    再重算受影响扇区的最小值和它们到根的路径 (一帧通常只落在一两个扇区)。
+    只统计大于 min_distance 的距离值 (更小的视为无效)。
+    nearest() 为 O(log n), 扇区查询为 O(log n + SECTOR); 注册的报警回调只在状态变化时触发。
+    """
+
+    INF = 0xFFFF
+    SECTOR = 16  # 每个扇区的角度箱数
+
+    def __init__(self, bins: int = 360, min_distance: int = LD_ALARM_DistanceMin):
+        self.bins = bins
+        self.min_distance = min_distance
+        sectors = -(-bins // self.SECTOR)
+        size = 1
+        while size < sectors:
+            size <<= 1
+        self.size = size
+        # 各角度箱的距离, 补齐到整数个扇区, 无效为 INF
+        self.values = np.full(sectors * self.SECTOR, self.INF, dtype=np.int32)
+        self._blocks = self.values.reshape(sectors, self.SECTOR)
+        # 扇区最小值的线段树 (Python 列表, 逐节点访问比 NumPy 标量快)
+        self.tree = [self.INF] * (2 * size)
+        self._alarms = []
+
+    def update(self, index: int, distance: int):
+        """写入单个角度箱"""
+        self.values[index] = distance if distance > self.min_distance else self.INF
+        self._refresh([index // self.SECTOR])
+        self._check_alarms()
+
+    def update_many(self, indices, distances):
+        """按时间顺序批量写入, 同一角度箱以最后一个值为准"""
+        indices = np.asarray(indices, dtype=np.intp)
+        if not len(indices):
+            return
+        distances = np.asarray(distances)
+        # 一维花式索引赋值按顺序写入, 重复的角度箱保留最后一个值 (与 ScanBuffer._write 相同)
+        self.values[indices] = np.where(distances > self.min_distance, distances, self.INF)
+        # 只重算写入涉及的扇区; 跨0度的一帧落在首尾两端, 不能按最小/最大角度箱取整段
+        self._refresh(list(set((indices // self.SECTOR).tolist())))
+        self._check_alarms()
+
+    def _refresh(self, sectors):
+        """重算给定扇区 (列表) 的最小值, 并更新它们到根的路径"""
+        tree = self.tree
+        for sector, value in zip(sectors, self._blocks[sectors].min(axis=1).tolist()):
+            pos = sector + self.size
+            tree[pos] = value
+            pos >>= 1
+            while pos:
+                left, right = tree[2 * pos], tree[2 * pos + 1]
+                tree[pos] = left if left <= right else right
+                pos >>= 1
+
+    def _descend(self, node: int):
+        """从节点向下找到最小值所在的角度箱 (相等时取角度小的)"""
+        tree = self.tree
+        while node < self.size:
+            node = 2 * node if tree[2 * node] <= tree[2 * node + 1] else 2 * node + 1
+        block = self._blocks[node - self.size]
+        return (node - self.size) * self.SECTOR + int(block.argmin())
+
+    def _scan(self, lo: int, hi: int):
+        """直接扫描角度箱 [lo, hi) 的最小值和所在角度箱"""
+        if lo >= hi:
+            return self.INF, None
+        values = self.values[lo:hi]
+        i = int(values.argmin())
+        return int(values[i]), lo + i
+
+    def _query(self, lo: int, hi: int):
+        """角度箱 [lo, hi) 的最小值和所在角度箱: 两端不完整的扇区直接扫描, 中间的整扇区查线段树"""
+        sector = self.SECTOR
+        first = -(-lo // sector)
+        last = hi // sector
+        if first >= last:
+            return self._scan(lo, hi)
+        tree = self.tree
+        nodes_lo, nodes_hi = first + self.size, last + self.size
+        left, right = [], []
+        while nodes_lo < nodes_hi:
+            if nodes_lo & 1:
+                left.append(nodes_lo)
+                nodes_lo += 1
+            if nodes_hi & 1:
+                nodes_hi -= 1
+                right.append(nodes_hi)
+            nodes_lo >>= 1
+            nodes_hi >>= 1
+        best, best_node = self.INF, 0
+        for node in left + right[::-1]:
+            if tree[node] < best:
+                best, best_node = tree[node], node
+        # 按角度从小到大比较, 相等时保留角度小的
+        candidates = [self._scan(lo, first * sector)]
+        if best != self.INF:
+            candidates.append((best, self._descend(best_node)))
+        candidates.append(self._scan(last * sector, hi))
+        return min(candidates, key=lambda c: c[0])
+
+    def nearest(self):
+        """全向最近障碍物 (角度箱, 距离), 没有有效数据时返回 (None, None)"""
+        if self.tree[1] == self.INF:
+            return None, None
+        return self._descend(1), self.tree[1]
+
+    def nearest_in(self, start: int, end: int):
+        """
+        扇区 [start, end) 内最近障碍物, 支持跨0度 (如 start=350, end=10), start == end 表示全向
+
+        Returns:
+            (角度箱, 距离), 没有有效数据时返回 (None, None)
+        """
+        start %= self.bins
+        end %= self.bins
+        if start == end:
+            return self.nearest()
+        if start < end:
+            best, index = self._query(start, end)
         else:
-            print('null')
+            # 跨0度分成两段
+            best, index = self._query(start, self.bins)
+            best2, index2 = self._query(0, end)
+            if best2 < best:
+                best, index = best2, index2
+        if best == self.INF:
+            return None, None
+        return index, best
+
+    def any_closer(self, threshold: int, start: int = 0, end: int = None) -> bool:
+        """扇区 [start, end) 内是否有比 threshold 更近的障碍物, end 默认为 bins"""
+        _, distance = self.nearest_in(start, self.bins if end is None else end)
+        return distance is not None and distance < threshold
+
+    def add_alarm(self, threshold: int, callback, start: int = 0, end: int = None):
+        """
+        注册报警回调, 扇区 [start, end) 内出现/解除比 threshold 更近的障碍物时调用一次, end 默认为 bins
+
+        callback(active, angle, distance): active 为 True 表示进入报警状态
+
+        Returns:
+            报警句柄, 用于 remove_alarm
+        """
+        alarm = [threshold, callback, start, self.bins if end is None else end, False]
+        self._alarms.append(alarm)
+        return alarm
+
+    def remove_alarm(self, alarm):
+        """注销报警回调"""
+        self._alarms.remove(alarm)
+
+    def _check_alarms(self):
+        for alarm in self._alarms:
+            threshold, callback, start, end, active = alarm
+            angle, distance = self.nearest_in(start, end)
+            now = distance is not None and distance < threshold
+            if now != active:
+                alarm[4] = now
+                callback(now, angle, distance)
+
+# 全向最近障碍物索引, 作为 obstacles 传给 LD_DataHandle 时更新
+ax_obstacle_index = ObstacleIndex()
+
+# 每帧内各点的序号 0..24
+LD_POINT_INDEX = np.arange(LD_PNAM, dtype=np.float64)
+
+def _as_frames(buf):
+    """把原始数据转换为 (N, LD_F_LEN) 的 uint8 数组, 尽量不拷贝"""
+    if isinstance(buf, np.ndarray):
+        arr = buf if buf.dtype == np.uint8 else buf.astype(np.uint8)
+    elif isinstance(buf, (bytes, bytearray, memoryview)):
+        arr = np.frombuffer(buf, dtype=np.uint8)
+    else:
+        arr = np.asarray(buf, dtype=np.uint8)
+    if arr.ndim == 1:
+        arr = arr[:len(arr) - len(arr) % LD_F_LEN].reshape(-1, LD_F_LEN)
+    return arr
+
+# 批量解码
+def LD_DecodeFrames(buf):
+    """
+    一次解码 N 帧数据
+
+    Args:
+        buf: N 帧连续数据 (bytes/memoryview/列表), 或 (N, LD_F_LEN) 的 uint8 数组
+
+    Returns:
+        (angles, distances): 形状均为 (N, LD_PNAM), 角度单位为度 [0, 360), 距离为14位原始值
+    """
+    frames = _as_frames(buf)
+    angle_start = ((frames[:, 5].astype(np.uint16) << 8) + (frames[:, 4] >> 1)) / 64.0
+    angle_end = ((frames[:, 7].astype(np.uint16) << 8) + (frames[:, 6] >> 1)) / 64.0
+    angle_area = np.where(angle_start > angle_end,
+                          angle_end + 360 - angle_start,
+                          angle_end - angle_start) / 24
+
+    angles = (angle_start[:, None] + angle_area[:, None] * LD_POINT_INDEX) % 360
+    distances = ((frames[:, 12:LD_F_LEN:3].astype(np.uint16) << 6)
+                 + (frames[:, 11:LD_F_LEN:3] >> 2))
+    return angles, distances
+
+def LD_DataHandleBatch(buf, obstacles=None):
+    """
+    批量解码 N 帧并按1度分辨率写入 ax_lidar_data
+
+    Args:
+        buf: 同 LD_DecodeFrames
+        obstacles: 需要同步更新的 ObstacleIndex (如 ax_obstacle_index), 默认不更新
+    """
+    angles, distances = LD_DecodeFrames(buf)
+    index = angles.astype(np.intp).ravel()
+    distances = distances.ravel()
+    # 按时间顺序写入, 同一角度以最新的点为准
+    ax_lidar_data[index] = distances
+    if obstacles is not None:
+        obstacles.update_many(index, distances)
+
+# 数据处理
+def LD_DataHandle(uart4_rx_buf2, obstacles=None):
+    """解码单帧数据, 保留给原有调用方; 等同于对一帧调用 LD_DataHandleBatch"""
+    LD_DataHandleBatch(uart4_rx_buf2, obstacles)
+
+# 角度查表精度 (1/64 度, 与雷达协议的角度单位一致)
+LD_ANGLE_LUT_SCALE = 64
+_lut_rad = np.deg2rad(np.arange(360 * LD_ANGLE_LUT_SCALE) / LD_ANGLE_LUT_SCALE)
+LD_COS_LUT = np.cos(_lut_rad)
+LD_SIN_LUT = np.sin(_lut_rad)
+del _lut_rad
+
+# 极坐标转直角坐标
+def LD_PolarToXY(angles, distances):
+    """用预计算的 sin/cos 表把 (角度, 距离) 转换为 (x, y), 角度按 1/64 度取整"""
+    k = np.rint(np.asarray(angles) * LD_ANGLE_LUT_SCALE).astype(np.intp) % len(LD_COS_LUT)
+    return distances * LD_COS_LUT[k], distances * LD_SIN_LUT[k]
+
+# 一圈完整扫描的只读快照
+# seq: 圈序号, timestamp: time.time(), monotonic: time.monotonic(), distances: 只读 uint16 数组
+Scan = namedtuple('Scan', ['seq', 'timestamp', 'monotonic', 'distances'])
+
+# 一圈的原始点云, angles/distances 为等长的只读数组
+class PointCloud(namedtuple('PointCloud', ['seq', 'timestamp', 'monotonic', 'angles', 'distances'])):
+    __slots__ = ()
+
+    def xy(self):
+        """转换为直角坐标 (x, y)"""
+        return LD_PolarToXY(self.angles, self.distances)
+
+class _RevolutionBuffer:
+    """
+    按圈切分解码后的点, 子类实现 _write() 和 _complete()
+
+    角度回落超过 WRAP_THRESHOLD 视为新的一圈; 第一次回绕之前的数据不是完整的一圈, 丢弃。
+    """
+
+    WRAP_THRESHOLD = 180.0
+
+    def __init__(self):
+        self._front = None
+        self._seq = 0
+        self._last_angle = None
+        self._primed = False
+        self._cond = threading.Condition()
+        self._waiters = []  # asyncio 等待者 (loop, future)
+
+    def update(self, angles, distances):
+        """写入解码后的点 (按时间顺序), 返回本次完成的圈数"""
+        angles = np.asarray(angles, dtype=np.float64).ravel()
+        distances = np.asarray(distances).ravel()
+        if not len(angles):
+            return 0
+
+        # 找出所有回绕位置, 按回绕点把数据切成若干段
+        wraps = np.flatnonzero(np.diff(angles) < -self.WRAP_THRESHOLD) + 1
+        if self._last_angle is not None and angles[0] - self._last_angle < -self.WRAP_THRESHOLD:
+            wraps = np.concatenate(([0], wraps))
+        self._last_angle = angles[-1]
+
+        completed = 0
+        start = 0
+        for end in wraps.tolist():
+            self._write(angles[start:end], distances[start:end])
+            if self._primed:
+                self._publish(self._complete)
+                completed += 1
+            else:
+                self._discard()
+            self._primed = True
+            start = end
+        self._write(angles[start:], distances[start:])
+        return completed
+
+    def _write(self, angles, distances):
+        raise NotImplementedError
+
+    def _complete(self, seq, timestamp, monotonic):
+        """一圈结束, 返回该圈的只读快照"""
+        raise NotImplementedError
+
+    def _discard(self):
+        """丢弃第一次回绕之前的不完整数据"""
+
+    def _publish(self, complete):
+        with self._cond:
+            self._seq += 1
+            snapshot = complete(self._seq, time.time(), time.monotonic())
+            self._front = snapshot
+            waiters, self._waiters = self._waiters, []
+            self._cond.notify_all()
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_set_future, fut, snapshot)
+
+    def latest(self):
+        """最近一圈的快照, 还没有时返回 None"""
+        return self._front
+
+    def wait_next(self, after_seq: int = None, timeout: float = None):
+        """
+        阻塞等待序号大于 after_seq 的一圈
+
+        Args:
+            after_seq: 已处理的圈序号, 为空时等待下一圈
+            timeout: 超时时间 (秒)
+
+        Returns:
+            快照, 超时返回 None
+        """
+        with self._cond:
+            if after_seq is None:
+                after_seq = self._seq
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            return self._front
+
+    async def next_scan(self, after_seq: int = None):
+        """asyncio 版本的 wait_next"""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if after_seq is not None and self._seq > after_seq:
+                return self._front
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+        return await fut
+
+def _set_future(fut, result):
+    if not fut.done():
+        fut.set_result(result)
+
+# 按圈双缓冲的扫描数据
+class ScanBuffer(_RevolutionBuffer):
+    """
+    按圈缓存按角度分箱的雷达扫描数据
+
+    读取线程调用 update() 写入后台缓冲区, 一圈结束时交换前后台:
+    后台缓冲区冻结为只读快照 Scan 交给读者, 并以它为初值新建后台缓冲区继续写入。
+    读者拿到的 Scan 不会再被修改, 无需加锁拷贝。
+    """
+
+    def __init__(self, resolution: float = 1.0):
+        """
+        Args:
+            resolution: 角分辨率 (度), 如 1, 0.5, 0.25
+        """
+        super().__init__()
+        self.resolution = resolution
+        self.bins = int(round(360 / resolution))
+        self.scale = self.bins / 360.0
+        self._back = np.zeros(self.bins, dtype=np.uint16)
+        # 每个角度箱起始角的 sin/cos 表
+        bin_angles = np.arange(self.bins) / self.scale
+        self.cos_table = np.cos(np.deg2rad(bin_angles))
+        self.sin_table = np.sin(np.deg2rad(bin_angles))
+
+    def _write(self, angles, distances):
+        index = (angles * self.scale).astype(np.intp) % self.bins
+        self._back[index] = distances
+
+    def _complete(self, seq, timestamp, monotonic):
+        front = self._back
+        front.flags.writeable = False
+        self._back = front.copy()
+        return Scan(seq, timestamp, monotonic, front)
+
+    def xy(self, scan):
+        """把一圈扫描转换为直角坐标 (x, y)"""
+        return scan.distances * self.cos_table, scan.distances * self.sin_table
+
+# 按圈缓存的原始点云
+class PointCloudBuffer(_RevolutionBuffer):
+    """
+    按圈保留每个原始 (角度, 距离) 点, 不做角度分箱
+
+    使用 depth 组预分配的定长数组轮流写入, 内存固定; 一圈超过 max_points 的点计入 overflow 并丢弃。
+    快照是这些数组上的只读视图, 在之后第 depth-1 圈结束时会被覆盖, 读者应及时处理或自行拷贝。
+    """
+
+    def __init__(self, max_points: int = 2048, depth: int = 3):
+        super().__init__()
+        if depth < 2:
+            raise ValueError("depth 至少为2")
+        self.max_points = max_points
+        self.depth = depth
+        self._angles = np.zeros((depth, max_points), dtype=np.float64)
+        self._distances = np.zeros((depth, max_points), dtype=np.uint16)
+        self._slot = 0
+        self._count = 0
+        self.overflow = 0
+
+    def _write(self, angles, distances):
+        n = min(len(angles), self.max_points - self._count)
+        self.overflow += len(angles) - n
+        end = self._count + n
+        self._angles[self._slot, self._count:end] = angles[:n]
+        self._distances[self._slot, self._count:end] = distances[:n]
+        self._count = end
+
+    def _discard(self):
+        self._count = 0
+
+    def _complete(self, seq, timestamp, monotonic):
+        angles = self._angles[self._slot, :self._count]
+        distances = self._distances[self._slot, :self._count]
+        angles.flags.writeable = False
+        distances.flags.writeable = False
+        self._slot = (self._slot + 1) % self.depth
+        self._count = 0
+        return PointCloud(seq, timestamp, monotonic, angles, distances)
+
+# 分块读取雷达帧
+class LidarFrameReader:
+    """
+    分块读取雷达串口数据, 在预分配的缓冲区中按帧头 0xAA 0x55 切分完整帧
+
+    产出的帧是缓冲区上的 memoryview 切片 (不拷贝), 只在下一次读取/喂入数据之前有效,
+    需要保留时请自行 bytes(frame)。一次喂入的数据超过缓冲区剩余空间时需要分几轮写入,
+    之后还要搬移缓冲区的那几轮产出的帧是 bytes 拷贝, 因此同一次 feed() 产出的帧可以一起保留到下一次调用。
+    """
+
+    def __init__(self, ser=None, buf_size=LD_READ_BUF_SIZE):
+        if buf_size < 2 * LD_F_LEN:
+            raise ValueError("buf_size 至少为两帧长度")
+        self.ser = ser
+        self.buf = bytearray(buf_size)
+        self.view = memoryview(self.buf)
+        self.head = 0  # 未处理数据起点
+        self.tail = 0  # 有效数据终点
+
+        # 统计
+        self.bytes_read = 0
+        self.frame_count = 0
+        self.resyncs = 0
+        self.dropped_bytes = 0
+
+    def _compact(self):
+        """把未处理的数据搬到缓冲区开头"""
+        if self.head:
+            n = self.tail - self.head
+            if n:
+                self.view[:n] = self.view[self.head:self.tail]
+            self.head = 0
+            self.tail = n
+
+    def _extract(self, copy=False):
+        """切出缓冲区中所有完整帧, copy 为 True 时产出 bytes 拷贝"""
+        buf = self.buf
+        while True:
+            pos = buf.find(LD_HEADER, self.head, self.tail)
+            if pos < 0:
+                # 没有帧头, 丢弃数据, 只保留可能是半个帧头的最后一个字节
+                keep = 1 if self.tail > self.head and buf[self.tail - 1] == LD_HEADER1 else 0
+                skipped = self.tail - self.head - keep
+                if skipped:
+                    self.resyncs += 1
+                    self.dropped_bytes += skipped
+                    self.head += skipped
+                return
+            if pos != self.head:
+                self.resyncs += 1
+                self.dropped_bytes += pos - self.head
+                self.head = pos
+            end = pos + LD_F_LEN
+            if end > self.tail:
+                return
+            self.head = end
+            self.frame_count += 1
+            yield bytes(self.view[pos:end]) if copy else self.view[pos:end]
+
+    def feed(self, data):
+        """喂入一段原始数据, 逐个产出其中的完整帧"""
+        src = memoryview(data)
+        size = len(self.buf)
+        self.bytes_read += len(src)
+        while len(src):
+            self._compact()
+            n = min(len(src), size - self.tail)
+            self.view[self.tail:self.tail + n] = src[:n]
+            self.tail += n
+            src = src[n:]
+            # 还有剩余数据时下一轮会搬移缓冲区, 本轮的帧必须拷贝出来
+            yield from self._extract(copy=bool(len(src)))
+
+    def register_metrics(self, prefix='lidar', registry=REGISTRY):
+        """把统计计数注册为指标 (采集时读取, 不增加读取开销)"""
+        registry.counter(f'{prefix}_bytes_read_total', '串口读取字节数', fn=lambda: self.bytes_read)
+        registry.counter(f'{prefix}_frames_total', '切分出的完整帧数', fn=lambda: self.frame_count)
+        registry.counter(f'{prefix}_resyncs_total', '帧头重同步次数', fn=lambda: self.resyncs)
+        registry.counter(f'{prefix}_dropped_bytes_total', '重同步丢弃的字节数', fn=lambda: self.dropped_bytes)
+
+    def poll(self):
+        """读取串口当前可用的全部数据 (无数据时按串口超时阻塞), 产出完整帧"""
+        n = min(max(self.ser.in_waiting, 1), len(self.buf) - LD_F_LEN)
+        return self.feed(self.ser.read(n))
+
+    def __iter__(self):
+        while True:
+            yield from self.poll()
 
 # 主函数
 def main():
@@ -78,41 +582,18 @@ def main():
     time.sleep(1)
     AX_LIDAR_Start(ser)
 
-    uart4_rx_con = 0
-    uart4_rx_buf = [0] * 100
-    uart4_rx_buf2 = [0] * 100
-
+    reader = LidarFrameReader(ser)
+    # 最近障碍物只在用 AIRUNIT_HOT_LOG 打开热路径日志时维护和打印, 默认热路径上只解码
     try:
-        while True:
-            if ser.in_waiting:
-                res = ser.read(1)[0]
-                if uart4_rx_con < 2:
-                    if uart4_rx_con == 0:
-                        if res == LD_HEADER1:
-                            uart4_rx_buf[uart4_rx_con] = res
-                            uart4_rx_con = 1
-                    else:
-                        if res == LD_HEADER2:
-                            uart4_rx_buf[uart4_rx_con] = res
-                            uart4_rx_con = 2
-                else:
-                    if uart4_rx_con < LD_F_LEN:
-                        uart4_rx_buf[uart4_rx_con] = res
-                        uart4_rx_con += 1
-                    else:
-                        uart4_rx_buf2 = uart4_rx_buf.copy()
-                        uart4_rx_con = 0
-                        LD_DataHandle(uart4_rx_buf2)
-
-                        min_distance = 5000
-                        min_angle = 0
-                        for i in range(360):
-                            if ax_lidar_data[i] > LD_ALARM_DistanceMin:
-                                if ax_lidar_data[i] < min_distance:
-                                    min_distance = ax_lidar_data[i]
-                                    min_angle = i
-
-                        print(f"{min_angle} {min_distance}")
+        for frame in reader:
+            if not hotlog.enabled:
+                LD_DataHandle(frame)
+            else:
+                LD_DataHandle(frame, ax_obstacle_index)
+                min_angle, min_distance = ax_obstacle_index.nearest()
+                if min_distance is None or min_distance >= 5000:
+                    min_angle, min_distance = 0, 5000
+                hotlog('lidar_nearest', angle=min_angle, distance=min_distance)
 
     except KeyboardInterrupt:
         AX_LIDAR_Stop(ser)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lidar 话题的载荷编解码
+
+JSON 格式 (旧订阅者使用):
+    {"timestamp": 1700000000.123, "lidar_data": [d0, d1, ..., d359]}
+
+二进制格式 (小端):
+    头部 24 字节: 魔数 b'LD', 版本 u8, 标志 u8, 序号 u32, 参考帧序号 u32, 时间戳 f64,
+                  角分辨率 u16 (千分之一度), 点数 u16
+    数据: 点数个 uint16 距离值
+    标志 FLAG_DELTA: 数据为与参考帧 (最近的完整帧) 的差值 (按 uint16 回绕)
+    标志 FLAG_ZLIB: 数据部分经 zlib 压缩
+
+差分帧只依赖最近的完整帧, 不依赖前一条消息: 发布队列丢弃或链路丢失一条差分帧只影响这一帧,
+丢失完整帧时到下一个完整帧之前的差分帧无法解码。
+"""
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'LD'
+VERSION = 1
+FLAG_DELTA = 0x01
+FLAG_ZLIB = 0x02
+
+HEADER = struct.Struct('<2sBBIIdHH')
+
+# 支持的载荷格式
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+FORMAT_DELTA = 'delta'  # 差分 + zlib
+FORMATS = (FORMAT_JSON, FORMAT_BINARY, FORMAT_DELTA)
+
+
+def encode_json(timestamp, distances) -> bytes:
+    """编码为原有的JSON格式"""
+    data = {
+        'timestamp': timestamp,
+        'lidar_data': np.asarray(distances).tolist()  # NumPy 标量不能直接序列化
+    }
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class LidarEncoder:
+    """lidar 载荷编码器, 差分模式下保存上一帧作为参考"""
+
+    def __init__(self, fmt: str = FORMAT_BINARY, resolution: float = 1.0, keyframe_interval: int = 10):
+        """
+        Args:
+            fmt: 载荷格式, 见 FORMATS
+            resolution: 角分辨率 (度)
+            keyframe_interval: 差分模式下每隔多少帧发送一次完整帧
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的载荷格式: {fmt}")
+        self.fmt = fmt
+        self.resolution = resolution
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.seq = 0
+        self.key = None  # 最近的完整帧
+        self.key_seq = 0
+
+    def encode(self, timestamp: float, distances) -> bytes:
+        """编码一帧扫描数据"""
+        if self.fmt == FORMAT_JSON:
+            return encode_json(timestamp, distances)
+
+        cur = np.asarray(distances, dtype='<u2')
+        seq = self.seq & 0xFFFFFFFF
+        flags = 0
+        body = cur
+        ref = seq
+        if self.fmt == FORMAT_DELTA:
+            flags |= FLAG_ZLIB
+            if (self.key is not None and len(self.key) == len(cur)
+                    and self.seq % self.keyframe_interval):
+                flags |= FLAG_DELTA
+                body = cur - self.key  # uint16 回绕
+                ref = self.key_seq
+            else:
+                self.key = cur.copy()
+                self.key_seq = seq
+
+        data = body.tobytes()
+        if flags & FLAG_ZLIB:
+            data = zlib.compress(data)
+
+        header = HEADER.pack(MAGIC, VERSION, flags, seq, ref, timestamp,
+                             int(round(self.resolution * 1000)), len(cur))
+        self.seq += 1
+        return header + data
+
+    def force_keyframe(self):
+        """下一帧发送完整帧 (上一条载荷没有发出时调用, 否则后续差分帧引用的完整帧对方没有收到)"""
+        self.key = None
+
+
+class LidarDecoder:
+    """lidar 载荷解码器, 自动识别 JSON 和二进制格式"""
+
+    def __init__(self):
+        self.key = None  # 最近的完整帧
+        self.key_seq = None
+
+    def decode(self, payload: bytes) -> dict:
+        """
+        解码一条消息
+
+        Returns:
+            与 JSON 格式相同的字典, 二进制格式额外带 seq 和 resolution
+        Raises:
+            ValueError: 格式错误, 或差分帧缺少参考帧
+        """
+        if payload[:2] != MAGIC:
+            return json.loads(payload)
+
+        if len(payload) < HEADER.size:
+            raise ValueError("载荷长度不足")
+        magic, version, flags, seq, ref, timestamp, resolution, count = HEADER.unpack_from(payload)
+        if version != VERSION:
+            raise ValueError(f"不支持的版本: {version}")
+
+        data = payload[HEADER.size:]
+        if flags & FLAG_ZLIB:
+            data = zlib.decompress(data)
+        if len(data) != count * 2:
+            raise ValueError("数据长度与点数不符")
+        cur = np.frombuffer(data, dtype='<u2')
+
+        if flags & FLAG_DELTA:
+            if self.key is None or self.key_seq != ref or len(self.key) != count:
+                raise ValueError("差分帧缺少参考帧")
+            cur = self.key + cur  # uint16 回绕
+        else:
+            self.key = cur
+            self.key_seq = seq
+        return {
+            'timestamp': timestamp,
+            'lidar_data': cur.tolist(),
+            'seq': seq,
+            'resolution': resolution / 1000.0
+        }
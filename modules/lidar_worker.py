@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+雷达读取/解码工作进程和共享内存扫描环
+
+串口读取、帧切分和解码放在单独的进程中, 不与 MQTT 发布等线程争用同一个 GIL。
+每转完一圈, 工作进程把距离数组写入 multiprocessing.shared_memory 中的环形缓冲区 (ScanRing),
+消费者进程 (MQTT 发布、避障、录制) 按名字连接后直接读取 uint16 视图, 不拷贝也不经过 pickle:
+
+    worker = LidarWorker('/dev/ttyUSB0')
+    worker.start()
+    ring = ScanRing.attach(worker.ring.name)   # 其他进程中
+    seq = 0
+    while True:
+        scan, missed = ring.wait_next(seq, timeout=1.0)
+        ...
+        if not ring.valid(scan):   # 处理期间该槽已被覆盖
+            ...
+
+共享内存布局见 shm_ring.py, 每个槽为 时间 float64[2] (time.time(), time.monotonic()) 和距离 uint16[点数];
+头部还保存工作进程的读取字节数、帧数、重同步次数、丢弃字节数和运行状态。
+串口打开失败或读取出错时工作进程把状态设为 STATUS_FAILED 并以退出码 1 结束, 消费者在 wait_next 超时后
+用 LidarWorker.failed() (同一进程) 或 ScanRing.status (其他进程) 检查, 不会一直等待。
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import serial
+
+from laser import init_serial, AX_LIDAR_Init, AX_LIDAR_Start, AX_LIDAR_Stop, LD_DecodeFrames, LidarFrameReader, ScanBuffer
+from metrics import REGISTRY
+from shm_ring import ShmRing, H_PID, H_SEQ, H_USER
+
+RING_SLOTS = 8
+
+# 头部中的扫描环字段
+H_POINTS, H_BYTES_READ, H_FRAMES, H_RESYNCS, H_DROPPED, H_STATUS = range(H_USER, H_USER + 6)
+
+# 工作进程状态 (H_STATUS)
+STATUS_STARTING, STATUS_RUNNING, STATUS_STOPPED, STATUS_FAILED = range(4)
+STATUS_NAMES = ('starting', 'running', 'stopped', 'failed')
+
+RingScan = namedtuple('RingScan', ['seq', 'timestamp', 'monotonic', 'distances'])
+
+
+class ScanRing(ShmRing):
+    """共享内存中的扫描环, 每个槽为一圈距离数据"""
+
+    MAGIC = 0x4C44524E47  # 'LDRNG'
+
+    @classmethod
+    def _payload_size(cls, slots, points=360):
+        return slots * 16 + slots * points * 2
+
+    @classmethod
+    def _init_header(cls, header, points=360):
+        header[H_POINTS] = points
+
+    def _map(self, offset):
+        self.points = int(self.header[H_POINTS])
+        buf = self.shm.buf
+        self.slot_time = np.ndarray((self.slots, 2), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.slots * 16
+        self.data = np.ndarray((self.slots, self.points), dtype=np.uint16, buffer=buf, offset=offset)
+        if not self.writer:
+            self.slot_time.flags.writeable = False
+            self.data.flags.writeable = False
+
+    def _read_slot(self, i, seq):
+        timestamp, monotonic = self.slot_time[i]
+        return RingScan(seq, float(timestamp), float(monotonic), self.data[i])
+
+    @property
+    def status(self):
+        """工作进程状态, STATUS_* 之一"""
+        return int(self.header[H_STATUS])
+
+    def write(self, distances, timestamp, monotonic):
+        """写入一圈 (只能有一个写者)"""
+        i, seq = self.begin_write()
+        self.data[i] = distances
+        self.slot_time[i] = (timestamp, monotonic)
+        self.end_write(i, seq)
+        return seq
+
+    def stats(self):
+        header = self.header
+        return {
+            'seq': int(header[H_SEQ]),
+            'bytes_read': int(header[H_BYTES_READ]),
+            'frames': int(header[H_FRAMES]),
+            'resyncs': int(header[H_RESYNCS]),
+            'dropped_bytes': int(header[H_DROPPED]),
+            'pid': int(header[H_PID]),
+            'status': STATUS_NAMES[int(header[H_STATUS])]
+        }
+
+
+def _worker_main(ring_name, port, resolution, stop_event):
+    """工作进程: 读取串口, 切帧解码, 每转完一圈写入扫描环; 串口失败时状态设为 STATUS_FAILED, 退出码为 1"""
+    ring = ScanRing.attach(ring_name, writer=True)
+    header = ring.header
+    header[H_PID] = os.getpid()
+    ser = init_serial(port)
+    if ser is None:
+        header[H_STATUS] = STATUS_FAILED
+        ring.close()
+        sys.exit(1)
+    status = STATUS_STOPPED
+    try:
+        AX_LIDAR_Init(ser)
+        time.sleep(1)
+        AX_LIDAR_Start(ser)
+        ser.timeout = 0.1  # 便于及时响应 stop_event
+        header[H_STATUS] = STATUS_RUNNING
+
+        reader = LidarFrameReader(ser)
+        scan_buffer = ScanBuffer(resolution)
+        last_seq = 0
+        while not stop_event.is_set():
+            # 一次读到的所有帧合并成一块批量解码
+            frames = b''.join(reader.poll())
+            if frames:
+                scan_buffer.update(*LD_DecodeFrames(frames))
+                scan = scan_buffer.latest()
+                if scan is not None and scan.seq != last_seq:
+                    last_seq = scan.seq
+                    ring.write(scan.distances, scan.timestamp, scan.monotonic)
+            header[H_BYTES_READ] = reader.bytes_read
+            header[H_FRAMES] = reader.frame_count
+            header[H_RESYNCS] = reader.resyncs
+            header[H_DROPPED] = reader.dropped_bytes
+    except KeyboardInterrupt:
+        pass
+    except serial.SerialException as e:
+        print(f"雷达串口错误: {e}")
+        status = STATUS_FAILED
+    finally:
+        try:
+            AX_LIDAR_Stop(ser)
+        except serial.SerialException:
+            pass  # 串口已断开
+        finally:
+            ser.close()
+            header[H_STATUS] = status
+            ring.close()
+    if status == STATUS_FAILED:
+        sys.exit(1)
+
+
+class LidarWorker:
+    """在单独进程中运行雷达读取和解码, 结果写入 self.ring"""
+
+    def __init__(self, port='/dev/ttyUSB0', resolution=1.0, slots=RING_SLOTS):
+        self.port = port
+        self.resolution = resolution
+        self.ring = ScanRing.create(slots, points=int(round(360 / resolution)))
+        self.stop_event = mp.Event()
+        self.process = mp.Process(target=_worker_main, name='lidar-worker', daemon=True,
+                                  args=(self.ring.name, port, resolution, self.stop_event))
+
+    def start(self):
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def failed(self):
+        """工作进程是否已经异常结束 (串口失败或进程意外退出); 消费者在 wait_next 超时后检查"""
+        return self.ring.status == STATUS_FAILED or self.process.exitcode not in (None, 0)
+
+    def stop(self, timeout=3.0):
+        """通知工作进程停止雷达并退出, 然后删除共享内存"""
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.ring.close()
+        self.ring.unlink()
+
+    def register_metrics(self, prefix='lidar', registry=REGISTRY):
+        """工作进程的统计在共享内存头部, 采集时读取"""
+        header = self.ring.header
+        registry.counter(f'{prefix}_bytes_read_total', '串口读取字节数', fn=lambda: int(header[H_BYTES_READ]))
+        registry.counter(f'{prefix}_frames_total', '切分出的完整帧数', fn=lambda: int(header[H_FRAMES]))
+        registry.counter(f'{prefix}_resyncs_total', '帧头重同步次数', fn=lambda: int(header[H_RESYNCS]))
+        registry.counter(f'{prefix}_dropped_bytes_total', '重同步丢弃的字节数', fn=lambda: int(header[H_DROPPED]))
+        registry.counter(f'{prefix}_scans_total', '完整扫描圈数', fn=lambda: int(header[H_SEQ]))
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量指标和热路径日志
+
+指标: Counter (只增)、Gauge (可增减)、Histogram (固定分桶)。
+Counter / Gauge 可以传入 fn, 在采集时读取已有的统计属性 (如 LidarFrameReader.bytes_read),
+热路径上不增加任何开销。
+
+    from metrics import REGISTRY, start_http_server
+    REGISTRY.counter('lidar_bytes_read_total', '雷达串口读取字节数', fn=lambda: reader.bytes_read)
+    start_http_server(9100)        # http://127.0.0.1:9100/metrics (Prometheus 文本格式)
+    start_mqtt_stats(publisher, 'airunit/stats', interval=10)   # 可选, 定时发布 JSON
+
+热路径日志 (hotlog) 默认关闭, 打开后每种事件按速率限制输出一行 JSON:
+    if hotlog.enabled:
+        hotlog('arm_rx', data=...)
+用环境变量 AIRUNIT_HOT_LOG=<每种事件每秒行数> 或 hotlog.enable(rate) 打开。
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 默认延迟分桶上界 (毫秒)
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Counter:
+    """只增计数器; 给出 fn 时由 fn 提供当前值"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help='', fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._value = 0
+
+    def inc(self, n=1):
+        self._value += n
+
+    @property
+    def value(self):
+        return self.fn() if self.fn else self._value
+
+
+class Gauge(Counter):
+    """可增减的当前值; 给出 fn 时由 fn 提供当前值"""
+
+    kind = 'gauge'
+
+    def set(self, value):
+        self._value = value
+
+    def dec(self, n=1):
+        self._value -= n
+
+
+class Histogram:
+    """固定分桶直方图, 最后一个桶统计超过所有上界的值"""
+
+    kind = 'histogram'
+
+    def __init__(self, name='', help='', bounds=LATENCY_BUCKETS_MS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    add = observe
+
+    def quantile(self, q):
+        """按分桶估计分位数 (返回所在桶的上界, 落在最后一个桶时返回最大值)"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def summary(self):
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {label: n for label, n in zip(labels, self.counts) if n}
+
+    @property
+    def value(self):
+        return {
+            'count': self.total,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99)
+        }
+
+
+class Registry:
+    """指标注册表, 同名指标只注册一次 (重复注册返回已有的)"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif kwargs.get('fn') is not None:
+                # 同名指标重新绑定到新的对象 (如重新打开的串口读取器)
+                metric.fn = kwargs['fn']
+            return metric
+
+    def register(self, metric):
+        """注册已经创建的指标对象 (如组件自带的 Histogram), 同名时替换"""
+        with self.lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help='', fn=None) -> Counter:
+        return self._register(Counter, name, help, fn=fn)
+
+    def gauge(self, name, help='', fn=None) -> Gauge:
+        return self._register(Gauge, name, help, fn=fn)
+
+    def histogram(self, name, help='', bounds=LATENCY_BUCKETS_MS) -> Histogram:
+        return self._register(Histogram, name, help, bounds)
+
+    def snapshot(self):
+        """所有指标当前值的字典"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        out = {}
+        for metric in metrics:
+            try:
+                out[metric.name] = metric.value
+            except Exception:
+                out[metric.name] = None
+        return out
+
+    def render_text(self):
+        """Prometheus 文本格式"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(metric.bounds, metric.counts):
+                    cumulative += count
+                    lines.append(f'{metric.name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric.name}_bucket{{le="+Inf"}} {metric.total}')
+                lines.append(f"{metric.name}_sum {metric.sum}")
+                lines.append(f"{metric.name}_count {metric.total}")
+            else:
+                try:
+                    value = metric.value
+                except Exception:
+                    continue
+                if value is None:
+                    continue
+                lines.append(f"{metric.name} {float(value):g}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(port=9100, host='127.0.0.1', registry=REGISTRY):
+    """在后台线程提供 /metrics (Prometheus 文本) 和 /metrics.json, 返回服务器对象"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = registry.render_text().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(registry.snapshot()).encode()
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 不打印访问日志
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='MetricsHTTP', daemon=True).start()
+    print(f"指标: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_mqtt_stats(publisher, topic, interval=10.0, registry=REGISTRY):
+    """
+    每 interval 秒把所有指标以 JSON 发布到 topic
+
+    publisher 为任何带 publish(topic, payload) 方法的对象 (MqttPublisher, paho 客户端等)。
+    返回一个 threading.Event, set() 后停止发布。
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                payload = json.dumps({'time': time.time(), 'metrics': registry.snapshot()},
+                                     separators=(',', ':'))
+                publisher.publish(topic, payload)
+            except Exception as e:
+                print(f"指标发布错误: {e}")
+
+    threading.Thread(target=run, name='MqttStats', daemon=True).start()
+    return stop
+
+
+class HotLogger:
+    """
+    热路径日志: 默认关闭, 打开后每种事件每秒最多输出 rate 行 JSON
+
+    被限速丢掉的行数计入下一次输出的 suppressed 字段。调用前先检查 enabled,
+    避免在关闭时构造日志参数的开销。
+    """
+
+    def __init__(self, rate=0.0, stream=None):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self._next = {}  # 事件 -> 下次允许输出的时间
+        self._suppressed = {}
+        self.enable(rate)
+
+    def enable(self, rate=1.0):
+        """每种事件每秒最多 rate 行, 0 表示关闭"""
+        self.rate = rate
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.enabled = rate > 0
+
+    def __call__(self, event, **fields):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now < self._next.get(event, 0.0):
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return
+            self._next[event] = now + self.interval
+            suppressed = self._suppressed.pop(event, 0)
+        record = {'t': round(time.time(), 3), 'event': event}
+        record.update(fields)
+        if suppressed:
+            record['suppressed'] = suppressed
+        print(json.dumps(record, ensure_ascii=False, default=str), file=self.stream or sys.stdout)
+
+
+hotlog = HotLogger(float(os.environ.get('AIRUNIT_HOT_LOG', 0) or 0))
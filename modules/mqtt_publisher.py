@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可靠的 MQTT 发布端
+
+- paho 网络循环在后台线程运行 (loop_start), 断线后按指数退避自动重连
+- 待发送消息放在有界队列中, 队列满时丢弃最旧的
+- 同时在途的消息数有上限; max_batch 大于 1 时, 链路慢 (确认跟不上) 或断线期间积压的同主题消息
+  合并成一条批量消息, 发往 "<主题>/batch", 载荷格式见 pack_batch。订阅端需要同时订阅批量主题,
+  所以默认不合并
+- metrics() 返回队列深度、丢弃数、重连次数和发布延迟 (入队到 on_publish)
+
+QoS 0 的 on_publish 在报文写入 socket 时触发, QoS 1 在收到 PUBACK 时触发,
+需要按链路速度批量发送时应使用 QoS 1。
+    publisher = MqttPublisher('47.109.142.1', qos=1)
+    publisher.start()
+    publisher.publish('lidar', payload)
+"""
+
+import json
+import struct
+import threading
+import time
+from collections import deque
+
+from paho.mqtt import client as mqtt_client
+
+from metrics import REGISTRY, Histogram
+
+BATCH_MAGIC = b'MB'
+BATCH_HEADER = struct.Struct('<2sH')
+BATCH_ITEM = struct.Struct('<I')
+BATCH_SUFFIX = '/batch'
+
+LATENCY_WINDOW = 1000  # 统计延迟分位数的最近消息数
+
+
+def pack_batch(payloads):
+    """
+    合并多条载荷
+
+    全部为 JSON 对象时合并为 JSON 数组, 否则为二进制容器:
+        魔数 b'MB', 条数 u16, 然后每条为 长度 u32 + 载荷 (小端)
+    """
+    if all(p[:1] == b'{' for p in payloads):
+        return b'[' + b','.join(payloads) + b']'
+    out = bytearray(BATCH_HEADER.pack(BATCH_MAGIC, len(payloads)))
+    for payload in payloads:
+        out += BATCH_ITEM.pack(len(payload))
+        out += payload
+    return bytes(out)
+
+
+def unpack_batch(data):
+    """拆分 pack_batch 合并的载荷, 返回载荷列表 (JSON 数组返回解析后的对象列表)"""
+    if data[:1] == b'[':
+        return json.loads(data)
+    magic, count = BATCH_HEADER.unpack_from(data)
+    if magic != BATCH_MAGIC:
+        raise ValueError("不是批量消息")
+    pos = BATCH_HEADER.size
+    out = []
+    for _ in range(count):
+        n, = BATCH_ITEM.unpack_from(data, pos)
+        pos += BATCH_ITEM.size
+        out.append(bytes(data[pos:pos + n]))
+        pos += n
+    if pos != len(data):
+        raise ValueError("批量消息长度不符")
+    return out
+
+
+def _as_bytes(payload):
+    return payload.encode() if isinstance(payload, str) else bytes(payload)
+
+
+class MqttPublisher:
+    """带有界队列、批量发送和自动重连的 MQTT 发布端"""
+
+    def __init__(self, broker, port=1883, client_id='', keepalive=60, qos=0,
+                 max_queue=100, max_inflight=2, max_batch=1,
+                 reconnect_min=1, reconnect_max=60):
+        """
+        Args:
+            qos: 发布使用的 QoS
+            max_queue: 队列上限, 超出时丢弃最旧的消息
+            max_inflight: 已交给 paho 但还没有 on_publish 的消息数上限
+            max_batch: 一条批量消息最多合并的条数, 1 (默认) 表示不合并
+            reconnect_min, reconnect_max: 重连退避的最小/最大间隔 (秒)
+        """
+        self.broker = broker
+        self.port = port
+        self.keepalive = keepalive
+        self.qos = qos
+        self.max_inflight = max(1, max_inflight)
+        self.max_batch = max(1, max_batch)
+
+        self.client = mqtt_client.Client(client_id=client_id)
+        self.client.reconnect_delay_set(reconnect_min, reconnect_max)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+
+        self.queue = deque(maxlen=max_queue)  # (主题, 载荷, 入队时间)
+        self.cond = threading.Condition()
+        self.connected = False
+        self.running = False
+        self.thread = None
+        self._inflight = {}  # mid -> 各条消息的入队时间
+        self._early = set()  # publish 返回前就已经 on_publish 的 mid
+
+        # 统计
+        self.enqueued = 0
+        self.dropped = 0  # 队列满时丢弃
+        self.published = 0  # 已确认的消息条数 (批量消息按包含的条数计)
+        self.batches = 0  # 批量消息数
+        self.lost = 0  # 断线时在途未确认的消息条数
+        self.connects = 0
+        self.max_depth = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.latency = Histogram('mqtt_publish_latency_ms', '入队到 on_publish 的延迟 (毫秒)')
+
+    # paho 回调 (网络线程)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        with self.cond:
+            self.connected = rc == 0
+            if self.connected:
+                self.connects += 1
+            self.cond.notify()
+        print(f"MQTT{'已连接' if rc == 0 else f'连接被拒绝 ({rc})'}")
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self.cond:
+            self.connected = False
+            # 未确认的 QoS 0 消息已经丢失; QoS 1 的由 paho 在重连后重发
+            if self.qos == 0:
+                for times in self._inflight.values():
+                    self.lost += len(times)
+                self._inflight.clear()
+            self.cond.notify()
+        print(f"MQTT断开 ({rc}), 等待重连")
+
+    def _on_publish(self, client, userdata, mid):
+        now = time.monotonic()
+        with self.cond:
+            times = self._inflight.pop(mid, None)
+            if times is None:
+                self._early.add(mid)
+                return
+            self._complete(times, now)
+            self.cond.notify()
+
+    def _complete(self, times, now):
+        self.published += len(times)
+        for t in times:
+            self.latencies.append(now - t)
+            self.latency.observe((now - t) * 1000)
+
+    # 发送线程
+
+    def _take(self):
+        """取出队首消息, 后面紧跟的同主题消息一起取出 (最多 max_batch 条)"""
+        topic, payload, t = self.queue.popleft()
+        payloads = [payload]
+        times = [t]
+        while self.queue and len(payloads) < self.max_batch and self.queue[0][0] == topic:
+            _, payload, t = self.queue.popleft()
+            payloads.append(payload)
+            times.append(t)
+        return topic, payloads, times
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not (self.connected and self.queue
+                                            and len(self._inflight) < self.max_inflight):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                topic, payloads, times = self._take()
+
+            if len(payloads) > 1:
+                info = self.client.publish(topic + BATCH_SUFFIX, pack_batch(payloads), self.qos)
+            else:
+                info = self.client.publish(topic, payloads[0], self.qos)
+
+            with self.cond:
+                if info.rc == mqtt_client.MQTT_ERR_NO_CONN:
+                    self.connected = False
+                # QoS 1 在没有连接时 paho 仍然保留消息 (mid 有效), 重连后自己重发, 按在途处理;
+                # QoS 0 没有连接时消息没有发出, 其他错误 (如 paho 队列满) 消息也没有保留
+                if info.rc != mqtt_client.MQTT_ERR_SUCCESS and (self.qos == 0
+                                                                 or info.rc != mqtt_client.MQTT_ERR_NO_CONN):
+                    # 放回队首 (队列满时放不回的部分计入丢弃)
+                    for item in reversed(list(zip([topic] * len(payloads), payloads, times))):
+                        if len(self.queue) == self.queue.maxlen:
+                            self.dropped += 1
+                            continue
+                        self.queue.appendleft(item)
+                    continue
+                if len(payloads) > 1:
+                    self.batches += 1
+                if info.mid in self._early:
+                    self._early.discard(info.mid)
+                    self._complete(times, time.monotonic())
+                else:
+                    self._inflight[info.mid] = times
+
+    # 对外接口
+
+    def start(self):
+        """开始连接 (不阻塞) 并启动网络线程和发送线程"""
+        self.running = True
+        self.client.connect_async(self.broker, self.port, self.keepalive)
+        self.client.loop_start()
+        self.thread = threading.Thread(target=self._run, name='MqttPublisher', daemon=True)
+        self.thread.start()
+
+    def publish(self, topic, payload):
+        """消息入队, 不阻塞; 队列满时丢弃最旧的消息"""
+        item = (topic, _as_bytes(payload), time.monotonic())
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(item)
+            self.enqueued += 1
+            if len(self.queue) > self.max_depth:
+                self.max_depth = len(self.queue)
+            self.cond.notify()
+
+    def flush(self, timeout=5.0):
+        """等待队列和在途消息清空, 超时返回 False"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.queue or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=2.0):
+        """尽量发完队列中的消息后断开"""
+        if self.connected:
+            self.flush(timeout)
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=1)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def register_metrics(self, registry=REGISTRY):
+        """把队列和发布统计注册为指标"""
+        registry.gauge('mqtt_connected', 'MQTT 是否已连接', fn=lambda: int(self.connected))
+        registry.gauge('mqtt_queue_depth', '待发送消息数', fn=lambda: len(self.queue))
+        registry.gauge('mqtt_inflight', '在途未确认的消息数', fn=lambda: len(self._inflight))
+        registry.counter('mqtt_connects_total', '连接成功次数', fn=lambda: self.connects)
+        registry.counter('mqtt_enqueued_total', '入队消息数', fn=lambda: self.enqueued)
+        registry.counter('mqtt_published_total', '已确认的消息数', fn=lambda: self.published)
+        registry.counter('mqtt_batches_total', '批量消息数', fn=lambda: self.batches)
+        registry.counter('mqtt_dropped_total', '队列满时丢弃的消息数', fn=lambda: self.dropped)
+        registry.counter('mqtt_lost_total', '断线时丢失的在途消息数', fn=lambda: self.lost)
+        registry.register(self.latency)
+
+    def metrics(self):
+        """队列和发布统计, 延迟单位为毫秒"""
+        with self.cond:
+            latencies = sorted(self.latencies)
+            metrics = {
+                'connected': self.connected,
+                'connects': self.connects,
+                'queue_depth': len(self.queue),
+                'queue_max_depth': self.max_depth,
+                'inflight': len(self._inflight),
+                'enqueued': self.enqueued,
+                'published': self.published,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'lost': self.lost
+            }
+        if latencies:
+            n = len(latencies)
+            metrics['latency_ms_p50'] = latencies[n // 2] * 1000
+            metrics['latency_ms_p99'] = latencies[min(n - 1, n * 99 // 100)] * 1000
+            metrics['latency_ms_max'] = latencies[-1] * 1000
+        return metrics
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存单写多读环形缓冲区
+
+一个写者把数据依次写入定长的槽, 消费者进程按名字连接后直接读取 NumPy 视图 (不拷贝),
+跟不上时跳过被覆盖的槽, 不会阻塞写者。子类 (lidar_worker.ScanRing, frame_bus.FrameRing)
+定义每个槽的数据布局。
+
+共享内存布局 (均为本机字节序):
+    头部 uint64[16]: 魔数, 版本, 槽数, 最新序号, 写者 pid, 3 个保留, 其余 8 个由子类使用
+    槽序号 uint64[槽数]: 写入过程中为 0, 写完后为该槽数据的序号
+    子类的数据区
+"""
+
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_POLL_INTERVAL = 0.002  # wait_next 轮询间隔 (秒)
+
+# 头部字段下标, 子类字段从 H_USER 开始
+H_MAGIC, H_VERSION, H_SLOTS, H_SEQ, H_PID = range(5)
+H_USER = 8
+HEADER_FIELDS = 16
+
+
+def attach_shm(name):
+    """
+    按名字连接共享内存
+
+    multiprocessing 子进程与创建者共用 resource_tracker, 直接连接即可;
+    无关的进程连接后要取消登记, 否则它退出时 resource_tracker 会删除仍在使用的共享内存。
+    """
+    if mp.parent_process() is not None:
+        return shared_memory.SharedMemory(name=name)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class ShmRing:
+    """
+    单写多读环, 子类实现 _payload_size(), _map() 和 _read_slot()
+
+    写者: i, seq = ring.begin_write(); 写入槽 i; ring.end_write(i, seq)
+    读者: read() / latest() / next() / wait_next() 返回的视图直接指向共享内存,
+    处理完后用 valid() 确认期间没有被覆盖。
+    """
+
+    MAGIC = 0
+    VERSION = 1
+
+    def __init__(self, shm, writer=False):
+        self.shm = shm
+        self.writer = writer
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        if header[H_MAGIC] != self.MAGIC or header[H_VERSION] != self.VERSION:
+            raise ValueError(f"不是 {type(self).__name__} 共享内存")
+        self.header = header
+        self.slots = int(header[H_SLOTS])
+        offset = HEADER_FIELDS * 8
+        self.slot_seq = np.ndarray((self.slots,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        self._map(offset + self.slots * 8)
+
+    @classmethod
+    def _payload_size(cls, slots, **params):
+        raise NotImplementedError
+
+    @classmethod
+    def _init_header(cls, header, **params):
+        """把子类的参数写入头部 H_USER 之后的字段"""
+
+    def _map(self, offset):
+        """在 offset 之后建立子类数据区的视图; self.writer 为 False 时应设为只读"""
+        raise NotImplementedError
+
+    def _read_slot(self, i, seq):
+        raise NotImplementedError
+
+    @classmethod
+    def create(cls, slots, name=None, **params):
+        """创建环 (由创建者负责 unlink); 同名的共享内存已存在时 (上次异常退出遗留) 先删除"""
+        size = HEADER_FIELDS * 8 + slots * 8 + cls._payload_size(slots, **params)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[H_SLOTS] = slots
+        cls._init_header(header, **params)
+        header[H_VERSION] = cls.VERSION
+        header[H_MAGIC] = cls.MAGIC
+        np.ndarray((slots,), dtype=np.uint64, buffer=shm.buf, offset=HEADER_FIELDS * 8)[:] = 0
+        return cls(shm, writer=True)
+
+    @classmethod
+    def attach(cls, name, writer=False):
+        """按名字连接已有的环; writer 为 True 时可写 (写者在其他进程时使用)"""
+        return cls(attach_shm(name), writer=writer)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        """最新数据的序号, 0 表示还没有数据"""
+        return int(self.header[H_SEQ])
+
+    def begin_write(self):
+        """返回 (槽下标, 序号), 写完后调用 end_write (只能有一个写者)"""
+        seq = int(self.header[H_SEQ]) + 1
+        i = seq % self.slots
+        self.slot_seq[i] = 0
+        return i, seq
+
+    def end_write(self, i, seq):
+        self.slot_seq[i] = seq
+        self.header[H_SEQ] = seq
+
+    def read(self, seq):
+        """读取序号为 seq 的数据 (只读视图), 已被覆盖或正在写入时返回 None"""
+        i = seq % self.slots
+        if int(self.slot_seq[i]) != seq:
+            return None
+        item = self._read_slot(i, seq)
+        # 读取元数据期间被覆盖
+        if int(self.slot_seq[i]) != seq:
+            return None
+        return item
+
+    def valid(self, item):
+        """item 的数据是否仍未被覆盖; 零拷贝读取的数据在处理完后用它确认"""
+        return int(self.slot_seq[item.seq % self.slots]) == item.seq
+
+    def latest(self):
+        """最新的数据, 还没有时返回 None"""
+        for _ in range(3):
+            seq = self.seq
+            if not seq:
+                return None
+            item = self.read(seq)
+            if item is not None:
+                return item
+        return None
+
+    def next(self, after_seq=0):
+        """
+        after_seq 之后的下一条
+
+        Returns:
+            (item, missed): 没有新数据时 item 为 None; missed 为因消费太慢被覆盖而跳过的条数
+        """
+        while True:
+            seq = self.seq
+            if seq <= after_seq:
+                return None, 0
+            # 写者随时可能开始覆盖最旧的槽, 只读取 seq - slots + 2 之后的
+            oldest = max(1, seq - self.slots + 2)
+            want = max(after_seq + 1, oldest)
+            item = self.read(want)
+            if item is not None:
+                return item, want - after_seq - 1
+
+    def wait_next(self, after_seq=0, timeout=None):
+        """阻塞等待 after_seq 之后的下一条 (轮询), 超时返回 (None, 0)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            item, missed = self.next(after_seq)
+            if item is not None:
+                return item, missed
+            if deadline is not None and time.monotonic() >= deadline:
+                return None, 0
+            time.sleep(RING_POLL_INTERVAL)
+
+    def close(self):
+        # 释放所有 numpy 视图后才能关闭共享内存
+        for attr, value in list(vars(self).items()):
+            if isinstance(value, np.ndarray):
+                setattr(self, attr, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
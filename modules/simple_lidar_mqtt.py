@@ -4,52 +4,140 @@
 import json
 import time
 import threading
-from paho.mqtt import client as mqtt_client
-from laser import init_serial, AX_LIDAR_Init, AX_LIDAR_Start, AX_LIDAR_Stop, LD_DataHandle, ax_lidar_data, LD_F_LEN, LD_HEADER1, LD_HEADER2, LD_ALARM_DistanceMin
+from mqtt_publisher import MqttPublisher
+from lidar_codec import LidarEncoder, FORMAT_JSON
+from laser import init_serial, AX_LIDAR_Init, AX_LIDAR_Start, AX_LIDAR_Stop, LD_DecodeFrames, LidarFrameReader, ScanBuffer
+from metrics import REGISTRY, hotlog, start_http_server, start_mqtt_stats
 
 # MQTT配置
 BROKER = '47.109.142.1'  # 修改为你的MQTT服务器地址
 PORT = 1883
 TOPIC = 'lidar'
+# QoS 1 时发布端根据 PUBACK 判断链路速度, 断线期间的消息由 paho 在重连后重发
+MQTT_QOS = 1
+MQTT_MAX_QUEUE = 50  # 待发送扫描数上限, 超出时丢弃最旧的
+# 大于 1 时链路慢或断线期间积压的扫描合并发往 'lidar/batch', 订阅端需要同时订阅该主题
+MQTT_MAX_BATCH = 1
+# 载荷格式: 'json' (兼容旧订阅者), 'binary' (uint16二进制), 'delta' (差分+zlib), 见 lidar_codec.py
+PAYLOAD_FORMAT = 'json'
+# 角分辨率 (度): 1 / 0.5 / 0.25, 非1度时 lidar_data 长度为 360 / LIDAR_RESOLUTION
+LIDAR_RESOLUTION = 1.0
+# 为 True 时串口读取和解码在单独的进程中运行, 扫描经共享内存传回 (见 lidar_worker.py)
+LIDAR_WORKER = False
+LIDAR_PORT = '/dev/ttyUSB0'
+# 指标: http://127.0.0.1:METRICS_PORT/metrics, 0 表示不启动; STATS_TOPIC 非空时定时发布指标 JSON
+METRICS_PORT = 9100
+STATS_TOPIC = ''
+STATS_INTERVAL = 10
+
+# 按圈缓存的雷达数据
+scan_buffer = ScanBuffer(LIDAR_RESOLUTION)
+# 工作进程模式下编码期间被覆盖而丢弃的扫描数
+torn_scans = 0
 
 def connect_mqtt():
-    """连接MQTT服务器"""
-    client = mqtt_client.Client()
-    client.connect(BROKER, PORT)
+    """启动MQTT发布端 (后台连接, 断线自动重连)"""
+    client = MqttPublisher(BROKER, PORT, qos=MQTT_QOS, max_queue=MQTT_MAX_QUEUE, max_batch=MQTT_MAX_BATCH)
+    client.start()
     return client
 
-def publish_data(client):
-    """发布所有雷达数据"""
-    data = {
-        'timestamp': time.time(),
-        'lidar_data': ax_lidar_data.copy()  # 发送完整的360度数据
-    }
-    
-    client.publish(TOPIC, json.dumps(data, separators=(',', ':')))
-    print(f"发送完整雷达数据 - 时间戳: {data['timestamp']}")
+def publish_data(client, scan, encoder=None, ring=None):
+    """
+    发布一圈完整的雷达数据, encoder 为空时使用JSON格式
 
-def read_lidar_thread(ser):
+    ring 不为空时 scan 是扫描环中的零拷贝视图, 编码后确认这一圈没有被工作进程覆盖,
+    被覆盖 (数据不完整) 时不发布, 返回 False。
+    """
+    global torn_scans
+    if encoder is None:
+        data = {
+            'timestamp': scan.timestamp,
+            'lidar_data': scan.distances.tolist()  # 发送完整的360度数据
+        }
+        payload = json.dumps(data, separators=(',', ':'))
+    else:
+        payload = encoder.encode(scan.timestamp, scan.distances)
+    if ring is not None and not ring.valid(scan):
+        torn_scans += 1
+        if encoder is not None:
+            # 差分模式下丢弃的可能是完整帧, 下一圈重新发送完整帧
+            encoder.force_keyframe()
+        if hotlog.enabled:
+            hotlog('lidar_scan_torn', seq=scan.seq)
+        return False
+    client.publish(TOPIC, payload)
+    if hotlog.enabled:
+        hotlog('lidar_publish', seq=scan.seq, timestamp=scan.timestamp, size=len(payload))
+    return True
+
+def read_lidar_thread(reader):
     """读取雷达数据线程"""
-    uart4_rx_con = 0
-    uart4_rx_buf = [0] * 100
-    
     while True:
-        if ser.in_waiting:
-            res = ser.read(1)[0]
-            if uart4_rx_con < 2:
-                if (uart4_rx_con == 0 and res == LD_HEADER1) or (uart4_rx_con == 1 and res == LD_HEADER2):
-                    uart4_rx_buf[uart4_rx_con] = res
-                    uart4_rx_con += 1
-            else:
-                uart4_rx_buf[uart4_rx_con] = res
-                uart4_rx_con += 1
-                if uart4_rx_con >= LD_F_LEN:
-                    LD_DataHandle(uart4_rx_buf)
-                    uart4_rx_con = 0
+        # 一次读到的所有帧合并成一块批量解码
+        frames = b''.join(reader.poll())
+        if frames:
+            scan_buffer.update(*LD_DecodeFrames(frames))
+
+def start_metrics(client):
+    """注册发布端指标, 启动指标 HTTP 服务和定时发布"""
+    client.register_metrics()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+    if STATS_TOPIC:
+        start_mqtt_stats(client, STATS_TOPIC, STATS_INTERVAL)
+
+def publish_loop(client, source, encoder, worker=None):
+    """
+    每转完一圈发送一次, source 为 ScanBuffer 或 ScanRing
+
+    worker 为产生 source 的 LidarWorker 时, 等待超时后检查工作进程, 已经异常结束时抛出 RuntimeError。
+    """
+    seq = 0
+    ring = source if LIDAR_WORKER else None
+    while True:
+        if LIDAR_WORKER:
+            scan, missed = source.wait_next(seq, timeout=1.0)
+            if missed and hotlog.enabled:
+                hotlog('lidar_scan_missed', missed=missed)
+        else:
+            scan = source.wait_next(seq, timeout=1.0)
+        if scan is None:
+            if worker is not None and worker.failed():
+                raise RuntimeError(f"雷达工作进程已结束: {worker.ring.stats()}")
+            continue
+        seq = scan.seq
+        publish_data(client, scan, encoder, ring)
+
+def main_worker():
+    """读取和解码在工作进程中, 本进程只负责发布"""
+    from lidar_worker import LidarWorker
+    worker = LidarWorker(LIDAR_PORT, LIDAR_RESOLUTION)
+    worker.register_metrics()
+    REGISTRY.counter('lidar_scans_torn_total', '编码期间被覆盖而丢弃的扫描数', fn=lambda: torn_scans)
+    worker.start()
+
+    client = connect_mqtt()
+    start_metrics(client)
+    print("MQTT发布端已启动，雷达工作进程 pid %d" % worker.process.pid)
+    encoder = None if PAYLOAD_FORMAT == FORMAT_JSON else LidarEncoder(PAYLOAD_FORMAT, resolution=LIDAR_RESOLUTION)
+    try:
+        publish_loop(client, worker.ring, encoder, worker)
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(e)
+    worker.stop()
+    client.stop()
+    print(f"MQTT统计: {client.metrics()}")
+    print("程序已停止")
 
 def main():
+    if LIDAR_WORKER:
+        main_worker()
+        return
+
     # 初始化串口和雷达
-    ser = init_serial()
+    ser = init_serial(LIDAR_PORT)
     if not ser:
         print("串口初始化失败")
         return
@@ -60,19 +148,23 @@ def main():
     
     # 连接MQTT
     client = connect_mqtt()
-    print("MQTT已连接，开始读取雷达数据...")
+    reader = LidarFrameReader(ser)
+    reader.register_metrics()
+    REGISTRY.counter('lidar_scans_total', '完整扫描圈数', fn=lambda: getattr(scan_buffer.latest(), 'seq', 0))
+    start_metrics(client)
+    print("MQTT发布端已启动，开始读取雷达数据...")
+    encoder = None if PAYLOAD_FORMAT == FORMAT_JSON else LidarEncoder(PAYLOAD_FORMAT, resolution=LIDAR_RESOLUTION)
     
     # 启动读取线程
-    threading.Thread(target=read_lidar_thread, args=(ser,), daemon=True).start()
+    threading.Thread(target=read_lidar_thread, args=(reader,), daemon=True).start()
     
     try:
-        while True:
-            publish_data(client)
-            time.sleep(0.1)  # 每100ms发送一次
+        publish_loop(client, scan_buffer, encoder)
     except KeyboardInterrupt:
         AX_LIDAR_Stop(ser)
         ser.close()
-        client.disconnect()
+        client.stop()
+        print(f"MQTT统计: {client.metrics()}")
         print("程序已停止")
 
 if __name__ == "__main__":
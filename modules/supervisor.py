@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+airunit-supervisor: 按配置启动、检查和重启各个组件, 代替 start.sh 中的 screen 会话和固定的 sleep
+
+    python3 modules/supervisor.py -c supervisor.json
+
+配置文件 (JSON) 的 components 中每一项是一个组件, 只需写出与 COMPONENT_DEFAULTS 不同的项:
+    command      命令 (列表, 或按 shell 规则拆分的字符串), 相对路径相对于配置文件所在目录
+    container    非空时在该容器内运行 (podman exec), CPU 绑定和 nice 用容器内的 taskset / nice 实现
+    depends_on   依赖的组件, 这些组件就绪后才启动
+    wait_for     启动前必须满足的检查 (如设备存在), 一直等待
+    ready        启动后的就绪检查, ready_timeout 秒内不满足则视为启动失败
+    restart      'always' / 'on-failure' / 'no'; 退出后按 backoff_min 到 backoff_max 秒指数退避重启,
+                 运行超过 stable_after 秒后退避重新从 backoff_min 开始
+    cpus, nice   CPU 绑定 (核编号列表) 和 nice 值; rt_priority 非 0 时使用 SCHED_FIFO
+    stop_signal, stop_timeout, stop_command   停止方式: 先执行 stop_command (可选), 再向进程组发信号,
+                 超时后 SIGKILL
+
+检查 (wait_for / ready) 的类型:
+    {"type": "path", "path": "/dev/video0"}                      文件或设备存在
+    {"type": "tcp", "port": 9100, "host": "127.0.0.1"}          端口在监听
+    {"type": "http", "url": "...", "contains": "..."}           返回 200 (且包含指定文本)
+    {"type": "metric", "url": ".../metrics.json", "name": "video_decode_frames_total", "min": 1}
+                                                                 指标 (metrics.py 的 JSON) 达到 min, 如已解码第一帧
+    {"type": "log", "pattern": "airunit 已启动"}                 组件输出中出现匹配的行
+    {"type": "command", "command": [...]}                        命令返回 0
+    {"type": "delay", "seconds": 3}                              启动后固定等待
+
+仓库根目录的 supervisor.json 与 start.sh 相同: 在容器内用 gst-launch-1.0 推流 (stream 组件)。
+改用 modules/video.py 推流时, 把 video 组件 command 中的 /path/to/modules/video.py 改为仓库在容器内的挂载路径
+(取决于 compose.yaml 的 volumes), 再把 video 的 enabled 设为 true、stream 的 enabled 设为 false。
+
+各组件的输出追加写入 log_dir/<组件名>.log。所有组件第一次就绪后打印各自的等待时间 (wait_for) 和启动时间
+(启动到就绪)。metrics_port 非 0 时提供 supervisor_* 指标。Ctrl+C 或 SIGTERM 时按依赖的相反顺序停止。
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import re
+import shlex
+import signal
+import time
+import urllib.request
+
+from metrics import REGISTRY, start_http_server
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'supervisor.json')
+
+DEFAULT_CONFIG = {
+    'log_dir': '/tmp/my_app_logs',
+    'metrics_port': 0,
+    'components': {}
+}
+
+COMPONENT_DEFAULTS = {
+    'enabled': True,
+    'command': None,
+    'cwd': None,  # 默认为配置文件所在目录
+    'env': {},
+    'container': None,
+    'depends_on': [],
+    'wait_for': [],
+    'ready': None,
+    'ready_timeout': 30.0,
+    'restart': 'on-failure',
+    'backoff_min': 1.0,
+    'backoff_max': 60.0,
+    'stable_after': 30.0,
+    'cpus': None,
+    'nice': 0,
+    'rt_priority': 0,
+    'stop_signal': 'SIGTERM',
+    'stop_timeout': 5.0,
+    'stop_command': None
+}
+
+PROBE_INTERVAL = 0.5  # 检查间隔 (秒)
+PROBE_TIMEOUT = 2.0  # 单次检查 (连接/请求/命令) 的超时
+
+
+def load_config(path=None):
+    """读取配置文件, 每个组件与 COMPONENT_DEFAULTS 合并"""
+    path = os.path.abspath(path or DEFAULT_CONFIG_PATH)
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    with open(path, encoding='utf-8') as f:
+        user = json.load(f)
+    for key, value in user.items():
+        if key not in config:
+            raise ValueError(f"未知的配置项: {key}")
+        config[key] = value
+    components = {}
+    for name, values in config['components'].items():
+        unknown = set(values) - set(COMPONENT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"组件 {name} 有未知的配置项: {', '.join(sorted(unknown))}")
+        component = copy.deepcopy(COMPONENT_DEFAULTS)
+        component.update(values)
+        if not component['command']:
+            raise ValueError(f"组件 {name} 没有 command")
+        if component['restart'] not in ('always', 'on-failure', 'no'):
+            raise ValueError(f"组件 {name} 的 restart 无效: {component['restart']}")
+        component['cwd'] = os.path.join(os.path.dirname(path), component['cwd'] or '')
+        components[name] = component
+    config['components'] = components
+    return config
+
+
+def start_order(components):
+    """按依赖关系排序 (依赖在前), 只包含启用的组件"""
+    enabled = {name for name, c in components.items() if c['enabled']}
+    order = []
+    visiting = set()
+
+    def visit(name, chain):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"组件循环依赖: {' -> '.join(chain + [name])}")
+        if name not in enabled:
+            raise ValueError(f"{chain[-1]} 依赖的组件 {name} 不存在或未启用")
+        visiting.add(name)
+        for dep in components[name]['depends_on']:
+            visit(dep, chain + [name])
+        visiting.discard(name)
+        order.append(name)
+
+    for name in components:
+        if name in enabled:
+            visit(name, [])
+    return order
+
+
+def _split(command):
+    return shlex.split(command) if isinstance(command, str) else list(command)
+
+
+def _http_get(url):
+    with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT) as resp:
+        return resp.status, resp.read()
+
+
+class Component:
+    """一个受管理的进程: 等待依赖和前置条件, 启动, 就绪检查, 退出后按策略重启"""
+
+    def __init__(self, name, config, log_dir, deps=(), echo=False):
+        self.name = name
+        self.config = config
+        self.deps = list(deps)
+        self.echo = echo
+        self.log_path = os.path.join(log_dir, f'{name}.log')
+        self.proc = None
+        self.ready = asyncio.Event()
+        self.stopping = False
+        self._stop_event = asyncio.Event()
+        self._log_patterns = {}  # 日志检查的正则 -> 本次启动后是否已匹配
+        for spec in [config['ready']] + config['wait_for']:
+            if spec and spec['type'] == 'log':
+                self._log_patterns[re.compile(spec['pattern'])] = False
+        self._launched_at = 0.0
+
+        # 统计
+        self.starts = 0
+        self.restarts = 0
+        self.failures = 0  # 就绪检查超时次数
+        self.wait_time = None  # 最近一次启动前等待 wait_for 的时间 (秒)
+        self.startup_time = None  # 最近一次从启动到就绪的时间 (秒)
+        self.last_exit = None
+
+    def _command(self):
+        config = self.config
+        command = _split(config['command'])
+        if not config['container']:
+            return command
+        wrapper = ['podman', 'exec', config['container']]
+        if config['cpus']:
+            wrapper += ['taskset', '-c', ','.join(str(c) for c in config['cpus'])]
+        if config['nice']:
+            wrapper += ['nice', '-n', str(config['nice'])]
+        return wrapper + command
+
+    def _scheduling(self):
+        """
+        返回在子进程 exec 之前执行的函数 (preexec_fn), 设置 CPU 绑定和优先级; 不需要设置时返回 None
+
+        Linux 上这些设置按线程生效, 在 exec 前的单线程子进程中设置, 程序之后创建的所有线程和子进程都继承。
+        子进程中不能打印到终端, 某一项失败 (如没有权限设置负 nice 或 SCHED_FIFO) 时把原因写到组件的输出
+        (日志文件), 其余设置照常进行。
+        """
+        config = self.config
+        if config['container']:
+            return None
+        cpus, nice, rt_priority = config['cpus'], config['nice'], config['rt_priority']
+        steps = []
+        if cpus:
+            steps.append(('CPU 绑定', lambda: os.sched_setaffinity(0, cpus)))
+        if nice:
+            steps.append(('nice', lambda: os.setpriority(os.PRIO_PROCESS, 0, nice)))
+        if rt_priority:
+            steps.append(('SCHED_FIFO', lambda: os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(rt_priority))))
+        if not steps:
+            return None
+        name = self.name
+
+        def apply():
+            for what, step in steps:
+                try:
+                    step()
+                except (OSError, ValueError) as e:
+                    os.write(2, f"[{name}] 设置 {what} 失败: {e}\n".encode(errors='replace'))
+        return apply
+
+    async def _launch(self):
+        config = self.config
+        env = dict(os.environ)
+        env.update({k: str(v) for k, v in config['env'].items()})
+        env.setdefault('PYTHONUNBUFFERED', '1')
+        for pattern in self._log_patterns:
+            self._log_patterns[pattern] = False
+        # 启动失败 (OSError) 时也要更新, 否则 run 中的 stable_after 判断用的是上一次的启动时间
+        self._launched_at = time.monotonic()
+        # 新会话: 终端的 Ctrl+C 不直接发给组件, 停止时向整个进程组发信号
+        self.proc = await asyncio.create_subprocess_exec(
+            *self._command(), cwd=config['cwd'], env=env, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, start_new_session=True,
+            preexec_fn=self._scheduling())
+        self.starts += 1
+        asyncio.get_running_loop().create_task(self._pump(self.proc))
+        print(f"[{self.name}] 已启动 pid {self.proc.pid}")
+
+    async def _pump(self, proc):
+        """把组件输出写入日志文件, 并检查日志就绪条件"""
+        with open(self.log_path, 'ab') as log:
+            while True:
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                log.write(line)
+                log.flush()
+                if self.echo:
+                    print(f"[{self.name}] {line.decode(errors='replace').rstrip()}")
+                if self._log_patterns:
+                    text = line.decode(errors='replace')
+                    for pattern in self._log_patterns:
+                        if pattern.search(text):
+                            self._log_patterns[pattern] = True
+
+    async def check(self, spec):
+        """执行一次检查"""
+        kind = spec['type']
+        if kind == 'path':
+            return os.path.exists(spec['path'])
+        if kind == 'tcp':
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(spec.get('host', '127.0.0.1'), spec['port']), PROBE_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                return False
+            writer.close()
+            return True
+        if kind in ('http', 'metric'):
+            loop = asyncio.get_running_loop()
+            try:
+                status, body = await loop.run_in_executor(None, _http_get, spec['url'])
+            except (OSError, ValueError):
+                return False
+            if status != 200:
+                return False
+            if kind == 'http':
+                return spec.get('contains', '') in body.decode(errors='replace')
+            value = json.loads(body).get(spec['name'])
+            return value is not None and value >= spec.get('min', 1)
+        if kind == 'log':
+            return self._log_patterns.get(re.compile(spec['pattern']), False)
+        if kind == 'command':
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *_split(spec['command']), stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL)
+            except OSError:
+                return False
+            try:
+                return await asyncio.wait_for(proc.wait(), spec.get('timeout', PROBE_TIMEOUT)) == 0
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return False
+        if kind == 'delay':
+            return time.monotonic() - self._launched_at >= spec['seconds']
+        raise ValueError(f"未知的检查类型: {kind}")
+
+    async def _wait_for(self, spec):
+        """等待前置条件, 第一次不满足时打印一次"""
+        if await self.check(spec):
+            return
+        print(f"[{self.name}] 等待 {spec}")
+        while not await self.check(spec):
+            await asyncio.sleep(spec.get('interval', PROBE_INTERVAL))
+
+    async def _wait_ready(self):
+        """等待就绪检查通过; 进程退出或超时返回 False"""
+        spec = self.config['ready']
+        if not spec:
+            return True
+        deadline = time.monotonic() + self.config['ready_timeout']
+        while time.monotonic() < deadline:
+            if self.proc.returncode is not None:
+                return False
+            if await self.check(spec):
+                return True
+            await asyncio.sleep(spec.get('interval', PROBE_INTERVAL))
+        print(f"[{self.name}] {self.config['ready_timeout']} 秒内未就绪")
+        self.failures += 1
+        return False
+
+    async def run(self):
+        config = self.config
+        backoff = config['backoff_min']
+        while not self.stopping:
+            for dep in self.deps:
+                await dep.ready.wait()
+            t0 = time.monotonic()
+            for spec in config['wait_for']:
+                await self._wait_for(spec)
+            self.wait_time = time.monotonic() - t0
+
+            try:
+                await self._launch()
+            except OSError as e:
+                print(f"[{self.name}] 启动失败: {e}")
+                rc = None
+            else:
+                if self.stopping:
+                    # 启动过程中收到了停止请求
+                    await self._terminate()
+                    break
+                if await self._wait_ready():
+                    self.startup_time = time.monotonic() - self._launched_at
+                    self.ready.set()
+                    print(f"[{self.name}] 就绪, 用时 {self.startup_time:.2f} s")
+                    rc = await self.proc.wait()
+                else:
+                    rc = await self._terminate() if self.proc.returncode is None else self.proc.returncode
+                self.ready.clear()
+            self.last_exit = rc
+            if self.stopping:
+                break
+
+            policy = config['restart']
+            if policy == 'no' or (policy == 'on-failure' and rc == 0):
+                print(f"[{self.name}] 退出 ({rc}), 不重启")
+                break
+            if time.monotonic() - self._launched_at >= config['stable_after']:
+                backoff = config['backoff_min']
+            print(f"[{self.name}] 退出 ({rc}), {backoff:.1f} 秒后重启")
+            self.restarts += 1
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, config['backoff_max'])
+
+    async def _terminate(self):
+        """停止进程: stop_command, 然后向进程组发 stop_signal, 超时后 SIGKILL"""
+        config = self.config
+        proc = self.proc
+        if config['stop_command']:
+            try:
+                stopper = await asyncio.create_subprocess_exec(*_split(config['stop_command']))
+                await asyncio.wait_for(stopper.wait(), config['stop_timeout'])
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"[{self.name}] stop_command 失败: {e!r}")
+        if proc.returncode is None:
+            try:
+                os.killpg(proc.pid, signal.Signals[config['stop_signal']])
+            except ProcessLookupError:
+                pass
+        try:
+            return await asyncio.wait_for(proc.wait(), config['stop_timeout'])
+        except asyncio.TimeoutError:
+            print(f"[{self.name}] {config['stop_timeout']} 秒内未退出, 强制结束")
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            return await proc.wait()
+
+    def request_stop(self):
+        """不再重启 (停止前先对所有组件调用, 避免停止过程中又被重启)"""
+        self.stopping = True
+        self._stop_event.set()
+
+    async def stop(self):
+        self.request_stop()
+        if self.proc and self.proc.returncode is None:
+            rc = await self._terminate()
+            print(f"[{self.name}] 已停止 ({rc})")
+
+    def stats(self):
+        return {
+            'pid': self.proc.pid if self.proc and self.proc.returncode is None else None,
+            'ready': self.ready.is_set(),
+            'starts': self.starts,
+            'restarts': self.restarts,
+            'ready_timeouts': self.failures,
+            'wait_s': self.wait_time,
+            'startup_s': self.startup_time,
+            'last_exit': self.last_exit
+        }
+
+    def register_metrics(self, registry=REGISTRY):
+        prefix = f"supervisor_{re.sub(r'[^a-zA-Z0-9_]', '_', self.name)}"
+        registry.gauge(f'{prefix}_ready', '组件是否就绪', fn=lambda: int(self.ready.is_set()))
+        registry.gauge(f'{prefix}_startup_seconds', '最近一次启动到就绪的时间', fn=lambda: self.startup_time)
+        registry.gauge(f'{prefix}_wait_seconds', '最近一次启动前等待前置条件的时间', fn=lambda: self.wait_time)
+        registry.counter(f'{prefix}_restarts_total', '重启次数', fn=lambda: self.restarts)
+
+
+async def _report_startup(components, t0):
+    """所有组件第一次就绪后打印启动耗时"""
+    await asyncio.gather(*(c.ready.wait() for c in components))
+    print(f"全部就绪, 总用时 {time.monotonic() - t0:.2f} s")
+    for c in components:
+        print(f"  {c.name:<16} 等待 {c.wait_time:6.2f} s  启动 {c.startup_time:6.2f} s")
+
+
+async def run(config, echo=False):
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    os.makedirs(config['log_dir'], exist_ok=True)
+    components = {}
+    for name in start_order(config['components']):
+        spec = config['components'][name]
+        components[name] = Component(name, spec, config['log_dir'],
+                                     [components[dep] for dep in spec['depends_on']], echo)
+        components[name].register_metrics()
+    if config['metrics_port']:
+        start_http_server(config['metrics_port'])
+
+    t0 = time.monotonic()
+    tasks = [loop.create_task(c.run()) for c in components.values()]
+    report = loop.create_task(_report_startup(list(components.values()), t0))
+    await stop_event.wait()
+
+    print("正在停止...")
+    report.cancel()
+    for component in components.values():
+        component.request_stop()
+    for component in reversed(list(components.values())):
+        await component.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for component in components.values():
+        print(f"{component.name}: {component.stats()}")
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.remove_signal_handler(sig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='airunit-supervisor: 组件启动、就绪检查和重启')
+    parser.add_argument('-c', '--config', help='配置文件 (JSON), 默认为仓库根目录的 supervisor.json')
+    parser.add_argument('--echo', action='store_true', help='同时在终端打印各组件的输出')
+    parser.add_argument('--check', action='store_true', help='只检查配置并打印启动顺序')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    order = start_order(config['components'])
+    if args.check:
+        for name in order:
+            print(f"{name}: {shlex.join(Component(name, config['components'][name], config['log_dir'])._command())}")
+        return
+    asyncio.run(run(config, args.echo))
+
+
+if __name__ == "__main__":
+    main()
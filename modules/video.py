@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频推流管线 (PyGObject / GStreamer)
+
+与 start.sh 中 gst-launch-1.0 的管线相同 (MJPEG 1080p60 → jpegdec → x264enc ultrafast → SRT),
+但由 Python 管理, 运行时根据管线的 QoS 消息、丢帧和编码延迟自动调整档位
+(分辨率、帧率、码率、key-int-max), 尽量把延迟保持在 LATENCY_TARGET_MS 以内:
+
+    camera → srccaps → videorate → ratecaps → jpegdec → queue(leaky) → videoconvert → videoscale
+           → scalecaps → x264enc → h264parse → mpegtsmux → sink
+
+降帧率由 videorate 在解码之前完成, 被丢掉的帧不会解码。编码跟不上时 queue 丢弃旧帧, 不积压延迟。
+延迟按编码器输出的帧计算: 当前管线运行时间 - 帧的 PTS (直播源的 PTS 即采集时刻)。
+
+--frame-bus 时在解码之后用 tee 分出一路, 缩放为 FRAME_BUS_SIZE 的 BGR 帧写入共享内存帧总线 (frame_bus.py),
+供机上的 OpenCV 处理读取。这一路前面是只保留 1 帧的丢帧队列, appsink 也只保留最新一帧,
+消费者读得慢只会丢帧, 不影响编码推流。
+
+测试时不需要摄像头和 SRT 服务器:
+    python3 modules/video.py --source test --sink file:/tmp/test.ts --duration 20
+    python3 modules/video.py --source test --sink udp:127.0.0.1:5000
+"""
+
+import argparse
+import signal
+import threading
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib, Gst
+
+from frame_bus import FrameRing, FRAME_BUS_NAME, FRAME_BUS_SLOTS
+from metrics import REGISTRY, Histogram, hotlog, start_http_server
+
+CAMERA_DEVICE = '/dev/video0'
+SRT_URI = 'srt://47.109.142.1:10000?mode=caller&streamid=push_auth_key&latency=50'
+
+# 档位: (宽, 高, 帧率, 码率 kbit/s, key-int-max), 第一个为摄像头输出的格式
+PROFILES = [
+    (1920, 1080, 60, 8000, 60),
+    (1920, 1080, 30, 6000, 30),
+    (1280, 720, 30, 4000, 30),
+    (1280, 720, 15, 2500, 15),
+    (960, 540, 15, 1500, 15),
+    (640, 360, 15, 800, 15),
+]
+
+LATENCY_TARGET_MS = 150  # 编码完成时的目标延迟
+CONTROL_INTERVAL = 1.0  # 调整周期 (秒)
+DROP_RATIO_MAX = 0.02  # 一个周期内非主动丢帧比例超过此值视为过载
+DOWN_HOLD = 2.0  # 降档后至少等待 (秒) 再判断, 让新档位生效
+UP_HOLD = 10.0  # 连续这么久没有过载且延迟低于目标一半时升一档
+ENC_QUEUE_BUFFERS = 2  # 编码器前队列长度, 满时丢弃旧帧
+
+FRAME_BUS_SIZE = (640, 360)  # 帧总线的宽、高
+FRAME_BUS_FPS = 15  # 帧总线的最高帧率
+
+METRICS_PORT = 9102
+
+# 计数帧数的位置: (名字, 元素名, 衬垫名), 相邻两个位置的差即这一段丢掉的帧
+STAGES = [
+    ('source', 'srccaps', 'src'),
+    ('rate', 'ratecaps', 'src'),
+    ('decode', 'dec', 'src'),
+    ('queue', 'enc_queue', 'src'),
+    ('encode', 'enc', 'src'),
+    ('sink', 'sink', 'sink'),
+]
+
+
+def sink_description(spec):
+    """
+    输出端: 'srt' (SRT_URI), 'srt://...', 'udp:主机:端口', 'file:路径', 'fake'
+    """
+    if spec == 'srt':
+        spec = SRT_URI
+    if spec.startswith('srt://'):
+        return f'srtsink name=sink uri="{spec}" qos=true'
+    if spec.startswith('udp:'):
+        _, host, port = spec.split(':')
+        return f'udpsink name=sink host={host} port={int(port)} qos=true'
+    if spec.startswith('file:'):
+        return f'filesink name=sink location="{spec[5:]}"'
+    if spec == 'fake':
+        return 'fakesink name=sink sync=true qos=true'
+    raise ValueError(f"未知的输出端: {spec}")
+
+
+class VideoPipeline:
+    """视频推流管线和自适应档位控制"""
+
+    def __init__(self, source='camera', sink='srt', device=CAMERA_DEVICE, profiles=PROFILES,
+                 latency_target=LATENCY_TARGET_MS, adapt=True, frame_bus=False):
+        """
+        Args:
+            source: 'camera' (v4l2 MJPEG) 或 'test' (videotestsrc)
+            sink: 见 sink_description
+            latency_target: 目标延迟 (毫秒)
+            adapt: 为 False 时固定在第一个档位
+            frame_bus: 为 True 时把解码后的帧写入共享内存帧总线
+        """
+        self.source = source
+        self.profiles = profiles
+        self.latency_target = latency_target
+        self.adapt = adapt
+        self.media_type = 'image/jpeg' if source == 'camera' else 'video/x-raw'
+
+        self.pipeline = Gst.parse_launch(self._description(source, sink, device, frame_bus))
+        self.ratecaps = self.pipeline.get_by_name('ratecaps')
+        self.scalecaps = self.pipeline.get_by_name('scalecaps')
+        self.enc = self.pipeline.get_by_name('enc')
+        self.loop = None
+        self.profile = 0
+
+        # 统计 (计数在 GStreamer 流线程中更新)
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.stages = []
+        for name, element, pad in STAGES:
+            element = self.pipeline.get_by_name(element)
+            if element is None:
+                continue  # 测试源没有 jpegdec
+            self.frames[name] = 0
+            self.stages.append(name)
+            element.get_static_pad(pad).add_probe(Gst.PadProbeType.BUFFER, self._count, name)
+        self.enc.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self._measure, None)
+        self.latency = Histogram('video_latency_ms', '采集到编码完成的延迟 (毫秒)')
+        self._window = []  # 本周期的延迟样本
+        self.qos_events = 0
+        self.qos_dropped = {}  # 元素名 -> QoS 消息中报告的丢帧数
+        self.profile_changes = 0
+
+        self.frame_ring = None
+        self.bus_frames = 0
+        if frame_bus:
+            w, h = FRAME_BUS_SIZE
+            self.frame_ring = FrameRing.create(FRAME_BUS_SLOTS, name=FRAME_BUS_NAME, height=h, width=w)
+            self.pipeline.get_by_name('framesink').connect('new-sample', self._on_sample)
+
+        # 控制状态
+        self._prev = None
+        self._qos_in_window = 0
+        self._last_change = 0.0
+        self._calm_since = time.monotonic()
+
+    def _description(self, source, sink, device, frame_bus):
+        w, h, fps, kbps, gop = self.profiles[0]
+        if source == 'camera':
+            src = (f'v4l2src device={device} '
+                   f'! capsfilter name=srccaps caps="image/jpeg,width={w},height={h},framerate={fps}/1" '
+                   f'! videorate name=rate drop-only=true '
+                   f'! capsfilter name=ratecaps caps="image/jpeg,framerate={fps}/1" '
+                   f'! jpegdec name=dec ')
+        elif source == 'test':
+            src = (f'videotestsrc is-live=true pattern=ball '
+                   f'! capsfilter name=srccaps caps="video/x-raw,width={w},height={h},framerate={fps}/1" '
+                   f'! videorate name=rate drop-only=true '
+                   f'! capsfilter name=ratecaps caps="video/x-raw,framerate={fps}/1" ')
+        else:
+            raise ValueError(f"未知的视频源: {source}")
+        if frame_bus:
+            src += '! tee name=t '
+        description = (src +
+                       f'! queue name=enc_queue leaky=downstream max-size-buffers={ENC_QUEUE_BUFFERS} '
+                       f'max-size-bytes=0 max-size-time=0 '
+                       f'! videoconvert ! videoscale '
+                       f'! capsfilter name=scalecaps caps="video/x-raw,width={w},height={h}" '
+                       f'! x264enc name=enc tune=zerolatency speed-preset=ultrafast intra-refresh=true '
+                       f'key-int-max={gop} bitrate={kbps} '
+                       f'! h264parse ! mpegtsmux ! ' + sink_description(sink))
+        if frame_bus:
+            bus_w, bus_h = FRAME_BUS_SIZE
+            description += (f' t. ! queue name=bus_queue leaky=downstream max-size-buffers=1 '
+                            f'max-size-bytes=0 max-size-time=0 '
+                            f'! videorate drop-only=true max-rate={FRAME_BUS_FPS} ! videoscale ! videoconvert '
+                            f'! capsfilter caps="video/x-raw,format=BGR,width={bus_w},height={bus_h}" '
+                            f'! appsink name=framesink emit-signals=true max-buffers=1 drop=true '
+                            f'sync=false async=false')
+        return description
+
+    # 流线程中的探针
+
+    def _count(self, pad, info, name):
+        with self.lock:
+            self.frames[name] += 1
+        return Gst.PadProbeReturn.OK
+
+    def _measure(self, pad, info, _):
+        pts = info.get_buffer().pts
+        clock = self.pipeline.get_clock()
+        if pts != Gst.CLOCK_TIME_NONE and clock is not None:
+            latency_ms = (clock.get_time() - self.pipeline.get_base_time() - pts) / 1e6
+            with self.lock:
+                self.latency.observe(latency_ms)
+                self._window.append(latency_ms)
+        return Gst.PadProbeReturn.OK
+
+    def _on_sample(self, sink):
+        """帧总线分支的 appsink 回调, 把帧拷入共享内存"""
+        sample = sink.emit('pull-sample')
+        if sample is None:
+            return Gst.FlowReturn.OK
+        buf = sample.get_buffer()
+        structure = sample.get_caps().get_structure(0)
+        width, height = structure.get_value('width'), structure.get_value('height')
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if ok:
+            try:
+                self.frame_ring.write(info.data, height, width, stride=info.size // height, pts=buf.pts)
+                self.bus_frames += 1
+            finally:
+                buf.unmap(info)
+        return Gst.FlowReturn.OK
+
+    # 档位
+
+    def set_profile(self, index):
+        """切换档位; key-int-max 在编码器按新格式重新初始化时生效"""
+        index = max(0, min(index, len(self.profiles) - 1))
+        w, h, fps, kbps, gop = self.profiles[index]
+        self.ratecaps.set_property('caps', Gst.Caps.from_string(f'{self.media_type},framerate={fps}/1'))
+        self.scalecaps.set_property('caps', Gst.Caps.from_string(f'video/x-raw,width={w},height={h}'))
+        self.enc.set_property('bitrate', kbps)
+        self.enc.set_property('key-int-max', gop)
+        if index != self.profile:
+            self.profile_changes += 1
+            print(f"视频档位 {self.profile} -> {index}: {w}x{h}@{fps} {kbps}kbit/s key-int-max={gop}")
+        self.profile = index
+
+    def _control(self):
+        """每个周期检查一次: 过载降档, 持续空闲升档"""
+        now = time.monotonic()
+        with self.lock:
+            frames = dict(self.frames)
+            window, self._window = self._window, []
+        qos, self._qos_in_window = self._qos_in_window, 0
+        prev, self._prev = self._prev, frames
+        if prev is None:
+            return True
+
+        # videorate 主动降帧率丢掉的不算, 只看 ratecaps 之后到编码输出之间丢掉的
+        rate = frames['rate'] - prev['rate']
+        encoded = frames['encode'] - prev['encode']
+        drop_ratio = (rate - encoded) / rate if rate > 0 else 0.0
+        window.sort()
+        p90 = window[int(len(window) * 0.9)] if window else None
+
+        overloaded = (qos > 0 or drop_ratio > DROP_RATIO_MAX
+                      or (p90 is not None and p90 > self.latency_target))
+        if hotlog.enabled:
+            hotlog('video_control', profile=self.profile, p90_ms=p90, drop_ratio=round(drop_ratio, 3),
+                   qos=qos, fps=encoded / CONTROL_INTERVAL)
+        if not self.adapt:
+            return True
+        if overloaded:
+            self._calm_since = now
+            if now - self._last_change >= DOWN_HOLD and self.profile < len(self.profiles) - 1:
+                self.set_profile(self.profile + 1)
+                self._last_change = now
+        elif p90 is not None and p90 < self.latency_target / 2 and now - self._calm_since >= UP_HOLD \
+                and self.profile > 0:
+            self.set_profile(self.profile - 1)
+            self._last_change = self._calm_since = now
+        return True
+
+    # 总线消息
+
+    def _on_message(self, bus, message):
+        t = message.type
+        if t == Gst.MessageType.QOS:
+            _, processed, dropped = message.parse_qos_stats()
+            jitter, proportion, quality = message.parse_qos_values()
+            name = message.src.get_name()
+            self.qos_events += 1
+            self._qos_in_window += 1
+            if dropped != GLib.MAXUINT64:
+                self.qos_dropped[name] = dropped
+            if hotlog.enabled:
+                hotlog('video_qos', element=name, jitter_ms=jitter / 1e6, proportion=proportion, dropped=dropped)
+        elif t == Gst.MessageType.LATENCY:
+            self.pipeline.recalculate_latency()
+        elif t == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"视频管线错误 ({message.src.get_name()}): {err.message}")
+            self.loop.quit()
+        elif t == Gst.MessageType.WARNING:
+            err, debug = message.parse_warning()
+            print(f"视频管线警告 ({message.src.get_name()}): {err.message}")
+        elif t == Gst.MessageType.EOS:
+            self.loop.quit()
+
+    def stats(self):
+        """各位置的帧数和相邻位置之间丢掉的帧数"""
+        with self.lock:
+            frames = dict(self.frames)
+        drops = {}
+        for upstream, stage in zip(self.stages, self.stages[1:]):
+            drops[stage] = frames[upstream] - frames[stage]
+        return {
+            'profile': self.profile,
+            'frames': frames,
+            'drops': drops,
+            'frame_bus': self.bus_frames,
+            'qos_events': self.qos_events,
+            'qos_dropped': dict(self.qos_dropped),
+            'latency_ms': self.latency.value
+        }
+
+    def register_metrics(self, prefix='video', registry=REGISTRY):
+        for stage in self.stages:
+            registry.counter(f'{prefix}_{stage}_frames_total', f'经过 {stage} 的帧数',
+                             fn=lambda stage=stage: self.frames[stage])
+        registry.gauge(f'{prefix}_profile', '当前档位 (0 为最高)', fn=lambda: self.profile)
+        registry.counter(f'{prefix}_profile_changes_total', '档位切换次数', fn=lambda: self.profile_changes)
+        registry.counter(f'{prefix}_qos_events_total', 'QoS 消息数', fn=lambda: self.qos_events)
+        registry.counter(f'{prefix}_frame_bus_frames_total', '写入帧总线的帧数', fn=lambda: self.bus_frames)
+        registry.register(self.latency)
+
+    # 运行
+
+    def stop(self):
+        """发送 EOS 让复用器写完最后的数据, 超时未结束则直接退出"""
+        self.pipeline.send_event(Gst.Event.new_eos())
+        GLib.timeout_add_seconds(3, self.loop.quit)
+        return GLib.SOURCE_REMOVE
+
+    def run(self, duration=None):
+        """运行到 Ctrl+C / SIGTERM / 出错 / duration 秒后"""
+        self.loop = GLib.MainLoop()
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect('message', self._on_message)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, sig, self.stop)
+        GLib.timeout_add(int(CONTROL_INTERVAL * 1000), self._control)
+        if duration:
+            GLib.timeout_add(int(duration * 1000), self.stop)
+
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            print("视频管线启动失败")
+            return
+        try:
+            self.loop.run()
+        finally:
+            self.pipeline.set_state(Gst.State.NULL)
+            bus.remove_signal_watch()
+            if self.frame_ring:
+                self.frame_ring.close()
+                self.frame_ring.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='视频推流管线, 按延迟自动调整档位')
+    parser.add_argument('--source', choices=('camera', 'test'), default='camera', help='视频源')
+    parser.add_argument('--device', default=CAMERA_DEVICE, help='摄像头设备')
+    parser.add_argument('--sink', default='srt', help="输出端: srt / srt://... / udp:主机:端口 / file:路径 / fake")
+    parser.add_argument('--latency-target', type=float, default=LATENCY_TARGET_MS, help='目标延迟 (毫秒)')
+    parser.add_argument('--profile', type=int, default=0, help='起始档位')
+    parser.add_argument('--no-adapt', action='store_true', help='不自动调整档位')
+    parser.add_argument('--frame-bus', action='store_true', help=f'把解码后的帧写入共享内存 {FRAME_BUS_NAME}')
+    parser.add_argument('--duration', type=float, help='运行秒数 (测试用)')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help='指标 HTTP 端口, 0 表示不启动')
+    args = parser.parse_args()
+
+    Gst.init(None)
+    video = VideoPipeline(args.source, args.sink, args.device, latency_target=args.latency_target,
+                          adapt=not args.no_adapt, frame_bus=args.frame_bus)
+    if args.profile:
+        video.set_profile(args.profile)
+    video.register_metrics()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    video.run(args.duration)
+    print(f"视频统计: {video.stats()}")
+
+
+if __name__ == "__main__":
+    main()
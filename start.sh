@@ -1,7 +1,10 @@
 #!/bin/bash
 
+# 也可以用 python3 modules/supervisor.py -c supervisor.json 代替本脚本喵:
+# 用真实的就绪检查代替 sleep, 崩溃后自动重启, 并把各组件绑定到配置的 CPU 核喵
+
 # --- 配置区 (请根据你的实际情况修改喵) ---
-PYTHON_SCRIPT="modules/simple_lidar_mqtt.py" # 替换成你的Python脚本的绝对路径喵
+PYTHON_SCRIPT="modules/airunit.py" # 单进程运行雷达/GNSS/机械臂/MQTT, 子系统在 airunit.json 中启用喵
 COMPOSE_FILE="/home/orangepi/podman/compose.yaml" # 替换成你的podman-compose.yaml文件的绝对路径喵
 COMPOSE_DIR=$(dirname "${COMPOSE_FILE}") # 自动提取 compose 文件所在的目录喵
 CONTAINER_NAME="my-arch-container" # 替换成你要进入的容器的服务名 (在compose文件里定义的)喵
@@ -9,6 +12,8 @@ CONTAINER_NAME="my-arch-container" # 替换成你要进入的容器的服务名
 # 喵！这里是修改后的 GStreamer 命令字符串喵！
 # 使用单引号包裹整个命令，让 bash -c 去处理内部的双引号喵。
 COMMAND_IN_CONTAINER='gst-launch-1.0 v4l2src device=/dev/video0 ! image/jpeg,width=1920,height=1080,framerate=60/1 ! jpegdec ! videoconvert ! x264enc tune=zerolatency speed-preset=ultrafast intra-refresh=true key-int-max=60 ! h264parse ! mpegtsmux ! srtsink uri="srt://47.109.142.1:10000?mode=caller&streamid=push_auth_key&latency=50"'
+# 也可以在容器内运行 modules/video.py: 同一条管线, 但会按延迟自动调整分辨率/帧率/码率喵 (路径按 compose.yaml 中仓库的容器内挂载位置修改, supervisor.json 的 video 组件同理)
+# COMMAND_IN_CONTAINER='python3 /path/to/modules/video.py --source camera --sink srt'
 
 # podman exec -it my-arch-container /bin/bash
 
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 模块之间按文件名直接导入 (from laser import ...), 与在 modules/ 下运行脚本一致;
+# benchmarks/generators.py 提供确定性的合成数据, tests/support/ 下是只用于测试的模拟设备和服务器
+sys.path.insert(0, os.path.join(ROOT, 'modules'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, os.path.join(ROOT, 'tests', 'support'))
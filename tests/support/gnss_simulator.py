@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pty 上的模拟 GNSS 接收机, 用于在没有硬件时测试 GNSS.detect_baudrate / configure_receiver
+
+接收机按自己的波特率和定位频率输出 NMEA, 并响应配置命令:
+    PMTK251 (波特率), PMTK220 (定位周期), PMTK314 (输出语句), 回复 $PMTK001 确认
+    UBX CFG-PRT (波特率), CFG-RATE (定位周期), CFG-MSG (输出语句), 回复 ACK-ACK
+pty 不会真的按波特率传输, 这里读取从端当前的波特率设置: 与接收机不一致时只输出乱码, 收到的命令也丢弃,
+与真实串口波特率不匹配时的表现相同。每个定位周期输出的字节数超过波特率的传输能力时降低实际频率。
+
+    sim = SimulatedReceiver(baudrate=9600, rate_hz=1)
+    port = sim.start()                  # pty 从端路径, 交给 GNSS(port=...)
+    ...
+    sim.stop()
+
+也可以单独运行: python3 tests/support/gnss_simulator.py --baudrate 9600 --link /tmp/ttyGNSS
+"""
+
+import argparse
+import os
+import random
+import select
+import struct
+import sys
+import termios
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'modules'))
+
+from GNSS import pmtk_command, ubx_command, PMTK314_SENTENCES, UBX_NMEA_MSG_ID
+from capture import open_pty
+
+# termios 波特率常量 -> 波特率
+TERMIOS_BAUDRATES = {getattr(termios, f'B{b}'): b for b in
+                     (4800, 9600, 19200, 38400, 57600, 115200, 230400) if hasattr(termios, f'B{b}')}
+
+UBX_SYNC = b'\xB5\x62'
+
+
+class SimulatedReceiver:
+    """在后台线程中运行的模拟接收机"""
+
+    def __init__(self, baudrate=9600, rate_hz=1.0, sentences=('GGA', 'RMC', 'GSA', 'GSV', 'VTG', 'GLL'),
+                 protocol='pmtk', link=None, seed=0):
+        """
+        Args:
+            baudrate: 接收机初始波特率
+            rate_hz: 初始定位频率
+            sentences: 初始输出的语句
+            protocol: 'pmtk' (MTK芯片) 或 'ubx' (u-blox), 只响应对应的命令
+            link: 不为空时在该路径创建指向 pty 从端的符号链接
+        """
+        if protocol not in ('pmtk', 'ubx'):
+            raise ValueError(f"未知的协议: {protocol}")
+        self.baudrate = baudrate
+        self.period = 1.0 / rate_hz
+        self.sentences = {name: 1 for name in sentences}  # 语句 -> 每隔几次定位输出一次
+        self.protocol = protocol
+        self.link = link
+        self.rng = random.Random(seed)
+        self.master = None
+        self.slave = None
+        self.path = None
+        self._rx = bytearray()
+        self._thread = None
+        self._running = False
+        self._epoch = 0
+
+        # 统计
+        self.commands = []  # 收到的命令 (如 'PMTK251,115200', 'UBX 06 00')
+        self.epochs = 0
+        self.garbage_bytes = 0  # 波特率不匹配时输出的乱码字节数
+
+    def start(self):
+        """创建 pty 并开始输出, 返回从端路径"""
+        self.master, self.slave, self.path = open_pty(self.link)
+        os.set_blocking(self.master, False)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='gnss-sim', daemon=True)
+        self._thread.start()
+        return self.path
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(2)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    @property
+    def rate_hz(self):
+        return 1.0 / self.period
+
+    def host_baudrate(self):
+        """主机 (pty 从端) 当前设置的波特率"""
+        return TERMIOS_BAUDRATES.get(termios.tcgetattr(self.master)[5])
+
+    def _matched(self):
+        return self.host_baudrate() == self.baudrate
+
+    def _write(self, data):
+        """写入主机, 主机不读取导致缓冲区满时丢弃 (与串口溢出相同)"""
+        if not self._matched():
+            self.garbage_bytes += len(data)
+            data = bytes(self.rng.randrange(256) for _ in range(len(data)))
+        try:
+            os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        next_epoch = time.monotonic()
+        while self._running:
+            timeout = max(0.0, min(next_epoch - time.monotonic(), 0.01))
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self.master, 4096)
+                except (BlockingIOError, OSError):
+                    data = b''
+                # 按读到数据时的波特率判断, 一块数据处理完才切换波特率
+                if data and self._matched():
+                    self._handle(data)
+            now = time.monotonic()
+            if now >= next_epoch:
+                epoch = self._epoch_bytes()
+                self._write(epoch)
+                # 一个周期的数据超过波特率的传输能力时, 下一次定位顺延
+                next_epoch = max(next_epoch + max(self.period, len(epoch) * 10 / self.baudrate), now)
+
+    def _epoch_bytes(self):
+        """一个定位周期的语句"""
+        self._epoch += 1
+        self.epochs += 1
+        t = time.time()
+        hhmmss = time.strftime('%H%M%S', time.gmtime(t)) + f".{int(t * 100) % 100:02d}"
+        bodies = {
+            'GGA': f"GPGGA,{hhmmss},3030.0000,N,10400.0000,E,1,08,0.9,500.0,M,0.0,M,,",
+            'RMC': f"GPRMC,{hhmmss},A,3030.0000,N,10400.0000,E,0.00,0.00,010124,,,A",
+            'GSA': "GPGSA,A,3,02,05,12,15,18,24,29,,,,,,1.8,0.9,1.5",
+            'GSV': "GPGSV,1,1,04,02,45,120,40,05,30,200,35,12,60,300,42,15,10,030,20",
+            'VTG': "GPVTG,0.00,T,,M,0.00,N,0.00,K,A",
+            'GLL': f"GPGLL,3030.0000,N,10400.0000,E,{hhmmss},A,A",
+        }
+        out = bytearray()
+        for name, body in bodies.items():
+            divider = self.sentences.get(name, 0)
+            if divider and self._epoch % divider == 0:
+                out += pmtk_command(body)
+        return bytes(out)
+
+    def _handle(self, data):
+        rx = self._rx
+        rx += data
+        new_baudrate = None
+        while rx:
+            if rx[0] == 0x24:  # '$'
+                end = rx.find(b'\n')
+                if end < 0:
+                    break
+                line = bytes(rx[:end]).strip()
+                del rx[:end + 1]
+                new_baudrate = self._pmtk(line) or new_baudrate
+            elif rx[:2] == UBX_SYNC:
+                if len(rx) < 6:
+                    break
+                length = struct.unpack_from('<H', rx, 4)[0]
+                if len(rx) < 8 + length:
+                    break
+                frame = bytes(rx[:8 + length])
+                del rx[:8 + length]
+                new_baudrate = self._ubx(frame) or new_baudrate
+            else:
+                # 跳到下一个可能的命令起点
+                starts = [p for p in (rx.find(b'$', 1), rx.find(UBX_SYNC, 1)) if p > 0]
+                if not starts:
+                    rx.clear()
+                    break
+                del rx[:min(starts)]
+        if len(rx) > 4096:
+            rx.clear()
+        if new_baudrate:
+            self.baudrate = new_baudrate
+
+    def _pmtk(self, line):
+        """处理一条 PMTK 命令, 返回新的波特率 (如有)"""
+        if self.protocol != 'pmtk' or not line.startswith(b'$PMTK') or line[-3:-2] != b'*':
+            return None
+        body = line[1:-3].decode('ascii', errors='ignore')
+        if pmtk_command(body).strip() != line:
+            return None  # 校验和错误
+        self.commands.append(body)
+        fields = body.split(',')
+        command = fields[0][4:]
+        baudrate = None
+        if command == '251' and len(fields) > 1:
+            baudrate = int(fields[1])
+        elif command == '220' and len(fields) > 1:
+            self.period = int(fields[1]) / 1000.0
+        elif command == '314':
+            self.sentences = {name: int(value) for name, value in zip(PMTK314_SENTENCES, fields[1:]) if int(value)}
+        self._write(pmtk_command(f"PMTK001,{command},3"))
+        return baudrate
+
+    def _ubx(self, frame):
+        """处理一条 UBX 命令, 返回新的波特率 (如有)"""
+        msg_class, msg_id, length = struct.unpack_from('<BBH', frame, 2)
+        payload = frame[6:6 + length]
+        if self.protocol != 'ubx' or ubx_command(msg_class, msg_id, payload) != frame:
+            return None
+        self.commands.append(f"UBX {msg_class:02X} {msg_id:02X}")
+        baudrate = None
+        if (msg_class, msg_id) == (0x06, 0x00) and length >= 12:
+            baudrate = struct.unpack_from('<I', payload, 8)[0]
+        elif (msg_class, msg_id) == (0x06, 0x08) and length >= 2:
+            self.period = struct.unpack_from('<H', payload)[0] / 1000.0
+        elif (msg_class, msg_id) == (0x06, 0x01) and length >= 3 and payload[0] == 0xF0:
+            names = {v: k for k, v in UBX_NMEA_MSG_ID.items()}
+            name = names.get(payload[1])
+            if name:
+                if payload[2]:
+                    self.sentences[name] = payload[2]
+                else:
+                    self.sentences.pop(name, None)
+        self._write(ubx_command(0x05, 0x01, bytes([msg_class, msg_id])))
+        return baudrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pty 上的模拟 GNSS 接收机')
+    parser.add_argument('--baudrate', type=int, default=9600, help='初始波特率')
+    parser.add_argument('--rate', type=float, default=1.0, help='初始定位频率 (Hz)')
+    parser.add_argument('--protocol', choices=('pmtk', 'ubx'), default='pmtk', help='响应的配置命令')
+    parser.add_argument('--link', help='在该路径创建指向 pty 的符号链接')
+    args = parser.parse_args()
+
+    sim = SimulatedReceiver(args.baudrate, args.rate, protocol=args.protocol, link=args.link)
+    print(f"模拟接收机: {sim.start()}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{sim.baudrate} bps, {sim.rate_hz:.1f} Hz, 语句 {sim.sentences}, 命令 {len(sim.commands)} 条")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
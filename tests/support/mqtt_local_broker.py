@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内的最小 MQTT 3.1.1 服务器, 用于在没有真实服务器时测试发布端
+
+支持 CONNECT / PUBLISH (QoS 0, 1) / SUBSCRIBE / PINGREQ / DISCONNECT, 收到的消息保存在 messages 中。
+可以模拟慢速链路 (每个报文处理前等待 delay 秒) 和断线 (disconnect_all):
+    broker = LocalBroker()
+    port = broker.start()
+    ...
+    broker.stop()
+
+也可以单独运行: python3 tests/support/mqtt_local_broker.py --port 1883
+"""
+
+import argparse
+import asyncio
+import struct
+import threading
+import time
+from collections import namedtuple
+
+Message = namedtuple('Message', ['topic', 'payload', 'qos', 'time'])
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+
+def topic_matches(pattern, topic):
+    """MQTT 主题过滤 (支持 + 和 #)"""
+    p_parts = pattern.split('/')
+    t_parts = topic.split('/')
+    for i, p in enumerate(p_parts):
+        if p == '#':
+            return True
+        if i >= len(t_parts) or (p != '+' and p != t_parts[i]):
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+def _packet(kind, flags, body):
+    length = len(body)
+    out = bytearray([kind << 4 | flags])
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(out) + body
+
+
+class LocalBroker:
+    """在后台线程的事件循环中运行的 MQTT 服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.delay = 0.0  # 每个报文处理前的等待 (秒), 模拟慢速链路
+        self.refuse = False  # 为 True 时拒绝新连接
+        self.messages = []
+        self.connects = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self._clients = {}  # writer -> 订阅的主题过滤
+        self._ready = threading.Event()
+
+    async def _read_packet(self, reader):
+        header = (await reader.readexactly(1))[0]
+        length = 0
+        shift = 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return header >> 4, header & 0x0F, await reader.readexactly(length)
+
+    async def _handle(self, reader, writer):
+        if self.refuse:
+            writer.close()
+            return
+        self._clients[writer] = []
+        try:
+            while True:
+                kind, flags, body = await self._read_packet(reader)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if kind == CONNECT:
+                    self.connects += 1
+                    writer.write(_packet(CONNACK, 0, b'\x00\x00'))
+                elif kind == PUBLISH:
+                    qos = (flags >> 1) & 3
+                    topic_len, = struct.unpack_from('>H', body)
+                    topic = body[2:2 + topic_len].decode()
+                    pos = 2 + topic_len
+                    if qos:
+                        writer.write(_packet(PUBACK, 0, body[pos:pos + 2]))
+                        pos += 2
+                    payload = body[pos:]
+                    self.messages.append(Message(topic, payload, qos, time.monotonic()))
+                    for client, patterns in list(self._clients.items()):
+                        if any(topic_matches(p, topic) for p in patterns):
+                            client.write(_packet(PUBLISH, 0, body[:2 + topic_len] + payload))
+                elif kind == SUBSCRIBE:
+                    pos = 2
+                    granted = bytearray()
+                    while pos < len(body):
+                        n, = struct.unpack_from('>H', body, pos)
+                        self._clients[writer].append(body[pos + 2:pos + 2 + n].decode())
+                        pos += 2 + n + 1
+                        granted.append(0)
+                    writer.write(_packet(SUBACK, 0, body[:2] + bytes(granted)))
+                elif kind == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b''))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def start(self):
+        """在后台线程启动, 返回监听端口"""
+        self.thread = threading.Thread(target=self._run, name='LocalBroker', daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        return self.port
+
+    def disconnect_all(self):
+        """断开所有客户端 (模拟网络故障)"""
+        def abort():
+            for writer in list(self._clients):
+                writer.transport.abort()
+        self.loop.call_soon_threadsafe(abort)
+
+    def stop(self):
+        self.disconnect_all()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='进程内最小 MQTT 服务器')
+    parser.add_argument('--port', type=int, default=1883)
+    args = parser.parse_args()
+    broker = LocalBroker(host='0.0.0.0', port=args.port)
+    print(f"监听端口 {broker.start()}")
+    try:
+        while True:
+            time.sleep(1)
+            print(f"连接 {broker.connects} 次, 消息 {len(broker.messages)} 条")
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
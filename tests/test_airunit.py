@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from airunit import load_config, run
+from capture import open_pty
+from generators import synthetic_stream
+from mqtt_local_broker import LocalBroker
+
+AIRUNIT = os.path.join(os.path.dirname(__file__), '..', 'modules', 'airunit.py')
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = load_config(str(tmp_path / 'missing.json'))
+    config['mqtt']['enabled'] = False
+    config['metrics']['port'] = 0
+    return config
+
+
+def test_lidar_unit_publishes_scans_from_pty(config):
+    broker = LocalBroker()
+    master, slave, path = open_pty()
+    config['mqtt'].update(enabled=True, broker='127.0.0.1', port=broker.start())
+    config['lidar']['port'] = path
+    stream = synthetic_stream(400, noise=0)
+
+    async def scenario():
+        task = asyncio.get_running_loop().create_task(run(config))
+        # LidarUnit 启动时等待 1 s 再发送启动命令
+        await asyncio.sleep(1.2)
+        os.read(master, 4096)
+        for pos in range(0, len(stream), 1024):
+            os.write(master, stream[pos:pos + 1024])
+            await asyncio.sleep(0.005)
+        deadline = time.monotonic() + 3
+        while len(broker.messages) < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        os.kill(os.getpid(), signal.SIGINT)
+        await asyncio.wait_for(task, 5)
+
+    try:
+        asyncio.run(scenario())
+        # 停止时向雷达发送了停止命令
+        assert os.read(master, 4096)
+    finally:
+        broker.stop()
+        os.close(master)
+        os.close(slave)
+
+    messages = [m for m in broker.messages if m.topic == 'lidar']
+    assert len(messages) >= 2
+    payload = json.loads(messages[0].payload)
+    assert len(payload['lidar_data']) == 360 and any(payload['lidar_data'])
+
+
+def test_startup_failure_is_raised_after_cleanup(config):
+    config['lidar']['port'] = '/nonexistent/ttyLIDAR'
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(config))
+
+
+def test_startup_failure_exits_nonzero(config, tmp_path):
+    path = tmp_path / 'airunit.json'
+    path.write_text(json.dumps({'mqtt': config['mqtt'], 'metrics': config['metrics'],
+                                'lidar': {'port': '/nonexistent/ttyLIDAR'}}))
+    result = subprocess.run([sys.executable, AIRUNIT, '-c', str(path)], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 1
+    assert '启动失败' in result.stdout
@@ -0,0 +1,249 @@
+import threading
+import time
+
+from arm import ArmFrameParser, ArmWriter, ArmController, ARM_FRAME_LEN
+from generators import make_arm_frame, synthetic_arm_stream
+
+
+def frames_of(n):
+    return [tuple((i + j) % 256 for j in range(12)) for i in range(n)]
+
+
+def test_parser_reassembles_frames_split_across_reads():
+    values = frames_of(20)
+    stream = b''.join(make_arm_frame(v) for v in values)
+    parser = ArmFrameParser(buf_size=2 * ARM_FRAME_LEN)
+    out = []
+    # 逐字节喂入: 帧头和数据都被切开
+    for i in range(len(stream)):
+        out.extend(parser.feed(stream[i:i + 1]))
+    assert out == values
+    assert parser.frame_count == 20 and parser.resyncs == 0 and parser.dropped_bytes == 0
+    assert parser.bytes_read == len(stream)
+
+    # 一次喂入远大于缓冲区的数据
+    parser = ArmFrameParser(buf_size=2 * ARM_FRAME_LEN)
+    assert list(parser.feed(stream)) == values
+
+
+def test_parser_resyncs_on_garbage_and_counts_dropped_bytes():
+    values = frames_of(3)
+    garbage = [b'\x01\x02\x03', b'\x03\xFF\xD0', b'\x00' * 40]
+    # 垃圾在帧前、帧间 (含半个帧头) 和帧后
+    stream = (garbage[0] + make_arm_frame(values[0]) + garbage[1] + make_arm_frame(values[1])
+              + garbage[2] + make_arm_frame(values[2]))
+    parser = ArmFrameParser()
+    assert list(parser.feed(stream)) == values
+    assert parser.resyncs == 3
+    assert parser.dropped_bytes == sum(map(len, garbage))
+
+    # 分块末尾的半个帧头保留到下一块
+    parser = ArmFrameParser()
+    frame = make_arm_frame(values[0])
+    assert list(parser.feed(b'\x55' * 10 + frame[:3])) == []
+    assert parser.dropped_bytes == 10
+    assert list(parser.feed(frame[3:])) == [values[0]]
+    assert parser.dropped_bytes == 10
+
+
+def test_parser_matches_whole_stream_with_random_chunks():
+    import random
+
+    stream = synthetic_arm_stream(500, noise=0.2, seed=3)
+    expected = list(ArmFrameParser().feed(stream))
+    rng = random.Random(0)
+    parser = ArmFrameParser(buf_size=64)
+    out = []
+    pos = 0
+    while pos < len(stream):
+        n = rng.randint(1, 50)
+        out.extend(parser.feed(stream[pos:pos + n]))
+        pos += n
+    assert out == expected and len(out) == 500
+
+
+class FlakySerial:
+    """前 failures 次写入抛出异常的串口"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.lines = []
+
+    def write(self, data):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('write failed')
+        self.lines.append(bytes(data))
+        return len(data)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_failed_write_is_retried_with_same_joints():
+    ser = FlakySerial(failures=1)
+    writer = ArmWriter(ser, 'ARM1', max_rate=0)
+    writer.start()
+    try:
+        writer.submit((1, 2, 3, 4, 5))
+        assert wait_for(lambda: writer.errors == 1)
+        # 写失败的关节值没有记录为已发送, 同样的值再次提交时不会被死区跳过
+        writer.submit((1, 2, 3, 4, 5))
+        assert wait_for(lambda: ser.lines)
+        writer.submit((1, 2, 3, 4, 5))
+        time.sleep(0.05)
+    finally:
+        writer.stop()
+        writer.join(2)
+    assert ser.lines == [b'{"T": 122, "b": 1, "s": 2, "e": 3, "t": 4, "r": 5, "h": 180, "spd": 10, "acc": 10}\n']
+    assert writer.encoder.suppressed == 1
+
+
+class BlockingSerial(FlakySerial):
+    """第一次写入阻塞到 release 被设置"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, data):
+        if not self.entered.is_set():
+            self.entered.set()
+            self.release.wait(2)
+        return super().write(data)
+
+
+def test_writer_coalesces_to_latest_command():
+    ser = BlockingSerial()
+    writer = ArmWriter(ser, 'ARM1', max_rate=0, deadband=0)
+    writer.start()
+    try:
+        writer.submit((1, 1, 1, 1, 1))
+        assert ser.entered.wait(2)
+        # 第一条命令写出期间到达的命令互相覆盖, 只发送最新的一条
+        for v in range(2, 6):
+            writer.submit((v, v, v, v, v))
+        ser.release.set()
+        assert wait_for(lambda: len(ser.lines) == 2)
+        time.sleep(0.05)
+    finally:
+        writer.stop()
+        writer.join(2)
+    assert [line[:33] for line in ser.lines] == [b'{"T": 122, "b": 1, "s": 1, "e": 1',
+                                                 b'{"T": 122, "b": 5, "s": 5, "e": 5']
+    assert writer.coalesced == 3 and writer.sent == 2
+
+
+def test_writer_honours_deadband():
+    ser = FlakySerial()
+    writer = ArmWriter(ser, 'ARM1', max_rate=0, deadband=2)
+    writer.start()
+    try:
+        for joints in [(10, 10, 10, 10, 10), (12, 8, 10, 11, 9), (10, 10, 13, 10, 10), (11, 11, 11, 11, 11)]:
+            writer.submit(joints)
+            assert wait_for(lambda: writer.pending is None)
+            time.sleep(0.02)
+    finally:
+        writer.stop()
+        writer.join(2)
+    # 第二条和第四条与上次发送的变化都不超过死区
+    assert [line[:20] for line in ser.lines] == [b'{"T": 122, "b": 10, ', b'{"T": 122, "b": 10, ']
+    assert b'"e": 13' in ser.lines[1]
+    assert writer.encoder.suppressed == 2 and writer.encoder.last == (10, 10, 13, 10, 10)
+
+
+class SlowWriter:
+    """submit 耗时 delay 秒, 模拟阻塞的下游"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.submitted = []
+
+    def submit(self, joints):
+        self.submitted.append(joints)
+        time.sleep(self.delay)
+
+
+def test_controller_records_overrun_histograms():
+    # 周期 10 ms, 每个周期处理 35 ms: 每次超时跳过 3~4 个周期
+    writer = SlowWriter(0.035)
+    controller = ArmController([writer], rate=100.0)
+    controller.set_targets((0, 0, 0, 0, 0))
+    controller.start()
+    assert wait_for(lambda: controller.ticks >= 5)
+    controller.stop()
+    controller.join(2)
+
+    assert controller.overrun.total >= 4
+    assert controller.overrun_periods.sum == controller.overruns
+    assert controller.overrun_periods.quantile(0.5) in (3, 5)
+    assert controller.overrun.max >= 20
+    assert controller.jitter.total == controller.ticks
+
+
+class SocketSerial:
+    """只提供 fileno 的串口替身, 数据写入 socketpair 的一端"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+
+def test_async_writer_does_not_block_loop_on_full_serial():
+    import asyncio
+    import socket
+
+    from arm import AsyncArmWriter
+
+    # 对端 (机械臂) 不读取: 先把发送缓冲区写满, 之后的写入都会 BlockingIOError
+    sock, peer = socket.socketpair()
+    sock.setblocking(False)
+    peer.setblocking(False)
+    while True:
+        try:
+            sock.send(b'x' * 4096)
+        except BlockingIOError:
+            break
+    ser = SocketSerial(sock)
+
+    async def scenario():
+        writer = AsyncArmWriter(ser, 'ARM1', max_rate=0, write_timeout=0.2)
+        task = asyncio.get_running_loop().create_task(writer.run())
+        writer.submit((1, 2, 3, 4, 5))
+        # 写超时期间事件循环照常运行
+        ticks = [time.monotonic()]
+        for _ in range(30):
+            await asyncio.sleep(0.01)
+            ticks.append(time.monotonic())
+        assert writer.errors == 1 and writer.sent == 0
+
+        # 机械臂开始读取后, 同样的命令重新发送成功
+        received = bytearray()
+        writer.submit((1, 2, 3, 4, 5))
+        for _ in range(100):
+            try:
+                while True:
+                    received += peer.recv(65536)
+            except BlockingIOError:
+                pass
+            if writer.sent:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return ticks, writer, received
+
+    try:
+        ticks, writer, received = asyncio.run(scenario())
+    finally:
+        sock.close()
+        peer.close()
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+    assert writer.sent == 1 and writer.errors == 1 and writer.encoder.last == (1, 2, 3, 4, 5)
+    assert received.endswith(b'{"T": 122, "b": 1, "s": 2, "e": 3, "t": 4, "r": 5, "h": 180, "spd": 10, "acc": 10}\n')
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import pytest
+import serial
+
+from capture import CaptureWriter, CaptureLog, Replayer, DIR_RX, DIR_TX
+from generators import synthetic_stream
+from laser import LidarFrameReader
+
+
+def record_session(path, devices, start_ns, count, step_ns=1000):
+    """录制一个会话: devices 中的每个设备从 start_ns 起每隔 step_ns 收到一块数据"""
+    writer = CaptureWriter(path)
+    ids = [writer.add_device(name) for name in devices]
+    for i in range(count):
+        for device, name in zip(ids, devices):
+            writer.write(device, DIR_RX, f'{name}{i}'.encode(), start_ns + i * step_ns)
+    writer.close()
+
+
+def test_appended_sessions_are_rebased(tmp_path):
+    path = str(tmp_path / 'field.cap')
+    record_session(path, ['lidar', 'gnss'], start_ns=5_000_000, count=3)
+    # 重启后单调时钟从更小的值开始, 设备声明顺序也不同
+    record_session(path, ['gnss', 'lidar', 'arm'], start_ns=1_000, count=2)
+
+    log = CaptureLog(path)
+    assert len(log.sessions) == 2
+    assert sorted(info['name'] for info in log.devices.values()) == ['arm', 'gnss', 'lidar']
+    records = list(log.records())
+    timestamps = [r.timestamp_ns for r in records]
+    assert timestamps == sorted(timestamps)
+    # 第二个会话接在第一个会话的最后一条记录之后
+    assert timestamps[6] == timestamps[5]
+    assert log.summary()[0] == pytest.approx((2000 + 1000) / 1e9)
+
+    lidar = log.device_id('lidar')
+    assert [bytes(r.data) for r in records if r.device == lidar] == [b'lidar0', b'lidar1', b'lidar2',
+                                                                     b'lidar0', b'lidar1']
+    log.close()
+    # 关闭后记录数据仍然有效
+    assert bytes(records[-1].data) == b'arm1'
+
+
+def test_append_repairs_truncated_tail(tmp_path):
+    path = str(tmp_path / 'field.cap')
+    record_session(path, ['lidar'], start_ns=0, count=2)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 10)  # 录制被中断, 记录头不完整
+
+    log = CaptureLog(path)
+    assert log.truncated and log.end == size
+    log.close()
+
+    writer = CaptureWriter(path)
+    writer.write(writer.add_device('lidar'), DIR_TX, b'x', 10)
+    writer.close()
+    log = CaptureLog(path)
+    assert not log.truncated
+    assert [bytes(r.data) for r in log.records()] == [b'lidar0', b'lidar1', b'x']
+    assert len(log.sessions) == 2
+    log.close()
+
+
+def test_refuses_to_append_to_other_files(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not a capture log')
+    with pytest.raises(ValueError):
+        CaptureWriter(str(path))
+    assert path.read_bytes() == b'not a capture log'
+
+
+def test_replay_to_pty_feeds_lidar_reader(tmp_path):
+    path = str(tmp_path / 'lidar.cap')
+    stream = synthetic_stream(300, noise=0)
+    writer = CaptureWriter(path)
+    device = writer.add_device('lidar', '/dev/ttyUSB0', 230400)
+    # 录制时的读取块大小与帧边界无关
+    for i, pos in enumerate(range(0, len(stream), 100)):
+        writer.write(device, DIR_RX, stream[pos:pos + 100], i * 100_000)
+    writer.close()
+
+    log = CaptureLog(path)
+    replayer = Replayer(log, speed=0)
+    ser = serial.Serial(replayer.attach_pty('lidar'), timeout=0.05)
+    reader = LidarFrameReader(ser)
+    thread = threading.Thread(target=replayer.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while reader.frame_count < 300 and time.monotonic() < deadline:
+        for _ in reader.poll():
+            pass
+    thread.join(2)
+    ser.close()
+    log.close()
+
+    assert not thread.is_alive()
+    assert replayer.bytes == len(stream)
+    assert reader.frame_count == 300 and reader.dropped_bytes == 0
@@ -0,0 +1,128 @@
+import os
+import random
+import select
+import termios
+import threading
+import time
+
+import pytest
+
+from capture import open_pty
+from discovery import classify, discover
+from generators import synthetic_stream, synthetic_arm_stream, synthetic_log, make_frame
+from gnss_simulator import SimulatedReceiver, TERMIOS_BAUDRATES
+
+LIDAR_START = b'\xAA\x55\xF0\x0F'
+
+
+def test_classify():
+    assert classify(synthetic_stream(10, noise=0.05)) == 'lidar'
+    assert classify(synthetic_arm_stream(10, noise=0.05)) == 'arm_input'
+    assert classify(synthetic_log(2000)) == 'gnss'
+    # 只有一两个帧头不足以判定
+    assert classify(make_frame(0, 10, [100] * 12) * 2) is None
+    assert classify(bytes(random.Random(0).randrange(256) for _ in range(4096))) is None
+    assert classify(b'') is None
+
+
+class FakeDevice:
+    """
+    pty 上的串口设备: 主机波特率与 baudrate 一致时循环输出 data, 不一致时不输出
+
+    started 为 False 时模拟未启动的雷达, 收到 AX_LIDAR_Start 后才开始输出。收到的字节保存在 received。
+    """
+
+    def __init__(self, data, baudrate, started=True):
+        self.data = data
+        self.baudrate = baudrate
+        self.started = started
+        self.received = bytearray()
+        self.running = True
+
+    def start(self):
+        self.master, self.slave, self.path = open_pty()
+        os.set_blocking(self.master, False)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.path
+
+    def stop(self):
+        self.running = False
+        self.thread.join(2)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _run(self):
+        pos = 0
+        while self.running:
+            if select.select([self.master], [], [], 0.01)[0]:
+                try:
+                    self.received += os.read(self.master, 4096)
+                except OSError:
+                    pass
+                if LIDAR_START in self.received:
+                    self.started = True
+            if self.started and TERMIOS_BAUDRATES.get(termios.tcgetattr(self.master)[5]) == self.baudrate:
+                chunk = self.data[pos:pos + 512] or self.data[:512]
+                pos = pos + len(chunk) if pos + len(chunk) < len(self.data) else 0
+                try:
+                    os.write(self.master, chunk)
+                except OSError:
+                    pass
+
+
+@pytest.fixture
+def devices():
+    started = []
+
+    def make(*args, **kwargs):
+        device = FakeDevice(*args, **kwargs)
+        started.append(device)
+        return device.start()
+    yield make
+    for device in started:
+        device.stop()
+
+
+@pytest.fixture
+def gnss_port():
+    sim = SimulatedReceiver(baudrate=9600, rate_hz=5)
+    yield sim.start()
+    sim.stop()
+
+
+def test_discover_identifies_devices_and_uses_cache(tmp_path, devices, gnss_port):
+    lidar = devices(synthetic_stream(200, noise=0), 230400)
+    arm = devices(synthetic_arm_stream(200, noise=0), 115200)
+    cache = str(tmp_path / 'ports.json')
+
+    found = discover([lidar, arm, gnss_port], cache_path=cache, duration=0.4)
+    assert {role: (info.port, info.baudrate, info.cached) for role, info in found.items()} == {
+        'lidar': (lidar, 230400, False),
+        'arm_input': (arm, 115200, False),
+        'gnss': (gnss_port, 9600, False),
+    }
+
+    # 第二次直接使用缓存, 不打开串口
+    t0 = time.monotonic()
+    cached = discover([lidar, arm, gnss_port], cache_path=cache, duration=0.4)
+    assert time.monotonic() - t0 < 0.2
+    assert {role: info.port for role, info in cached.items()} == {role: info.port for role, info in found.items()}
+    assert all(info.cached for info in cached.values())
+
+
+def test_discover_is_passive_by_default():
+    stopped_lidar = FakeDevice(synthetic_stream(200, noise=0), 230400, started=False)
+    silent_board = FakeDevice(b'', 115200)
+    ports = [stopped_lidar.start(), silent_board.start()]
+    try:
+        assert discover(ports, cache_path=None, duration=0.2) == {}
+        # 默认不向任何串口写数据 (机械臂控制板不会收到雷达启动命令)
+        assert stopped_lidar.received == b'' and silent_board.received == b''
+
+        found = discover(ports, cache_path=None, duration=0.2, active=True)
+        assert found['lidar'].port == ports[0]
+        assert LIDAR_START in silent_board.received
+    finally:
+        stopped_lidar.stop()
+        silent_board.stop()
@@ -0,0 +1,78 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from frame_bus import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(3, height=4, width=6, channels=3)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def make_image(value, height=4, width=6):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_write_with_padded_stride(ring):
+    image = np.arange(3 * 5 * 3, dtype=np.uint8).reshape(3, 5, 3)
+    # GStreamer 按 4 字节对齐补齐每行: 15 字节的行补到 16 字节, 补齐的字节不能写入槽中
+    padded = np.full((3, 16), 0xEE, dtype=np.uint8)
+    padded[:, :15] = image.reshape(3, 15)
+    seq = ring.write(padded.tobytes(), 3, 5, stride=16, pts=123)
+
+    frame = ring.read(seq)
+    assert frame.image.shape == (3, 5, 3) and frame.pts == 123
+    assert np.array_equal(frame.image, image)
+    assert 0xEE not in frame.image
+
+    with pytest.raises(ValueError):
+        ring.write(bytes(5 * 7 * 3), 5, 7)
+
+
+def test_attached_reader_gets_read_only_views(ring):
+    ring.write(make_image(7), 4, 6)
+    # 与 FrameRing.attach 相同, 只是在创建者进程中不取消 resource_tracker 登记
+    reader = FrameRing(shared_memory.SharedMemory(name=ring.name))
+    try:
+        frame = reader.latest()
+        assert (frame.image == 7).all()
+        with pytest.raises(ValueError):
+            frame.image[0, 0, 0] = 1
+        with pytest.raises(ValueError):
+            reader.meta[0]['height'] = 1
+        with pytest.raises(ValueError):
+            reader.data[0, 0] = 1
+        del frame
+    finally:
+        reader.close()
+
+
+def test_next_reports_missed_on_overrun(ring):
+    for value in range(1, 8):
+        ring.write(make_image(value), 4, 6)
+    # 3 个槽, 最新为 7: 只能安全读取 seq - slots + 2 = 6 之后的
+    frame, missed = ring.next(0)
+    assert frame.seq == 6 and missed == 5
+    assert (frame.image == 6).all()
+    frame, missed = ring.next(frame.seq)
+    assert frame.seq == 7 and missed == 0
+    assert ring.next(7) == (None, 0)
+    del frame
+
+
+def test_valid_after_overwrite(ring):
+    ring.write(make_image(1), 4, 6)
+    frame = ring.latest()
+    ring.write(make_image(2), 4, 6)
+    ring.write(make_image(3), 4, 6)
+    assert ring.valid(frame) and (frame.image == 1).all()
+    # 第 4 帧写入同一个槽
+    ring.write(make_image(4), 4, 6)
+    assert not ring.valid(frame)
+    assert ring.read(frame.seq) is None
+    del frame
@@ -0,0 +1,225 @@
+import pytest
+
+from GNSS import GNSS
+from generators import with_checksum
+
+
+def feed_lines(gnss, *bodies, t_ns=None):
+    gnss.feed(b''.join(with_checksum(body).encode() + b'\r\n' for body in bodies), t_ns)
+
+
+def test_gsa_does_not_override_gga_hdop():
+    gnss = GNSS()
+    feed_lines(gnss,
+               'GNGGA,120000.00,3030.0000,N,10400.0000,E,1,12,1.1,500.0,M,0.0,M,,',
+               'GNGSA,A,3,01,02,03,04,05,,,,,,,,1.8,0.9,1.5,1')
+    fix = gnss.get_snapshot()
+    assert fix.hdop == 1.1
+    assert fix.hdop_gsa == 0.9
+    assert fix.pdop == 1.8 and fix.vdop == 1.5
+    assert fix.active_satellites == {'GP': (1, 2, 3, 4, 5)}
+
+
+def test_chunked_parse_matches_line_by_line():
+    import numpy as np
+    from generators import synthetic_log
+    log = synthetic_log(50_000)
+    by_chunk, by_line = GNSS(), GNSS()
+    for i in range(0, len(log), 4096):
+        by_chunk.feed(log[i:i + 4096], 1_000_000_000)
+    for line in log.split(b'\r\n')[:-1]:
+        by_line._parse_nmea(line, 1_000_000_000)
+
+    assert by_chunk.get_snapshot() == by_line.get_snapshot()
+    assert by_chunk.sentences == by_line.sentences == len(log.split(b'\r\n')) - 1
+    # 同一历元的 GGA/RMC 合并为一个样本
+    assert by_chunk.history.count == by_line.history.count == log.count(b'GGA,')
+    n = by_chunk.history.count
+    assert np.array_equal(by_chunk.history.values[:, :n], by_line.history.values[:, :n], equal_nan=True)
+
+
+def test_malformed_checksum_is_counted():
+    gnss = GNSS()
+    good = with_checksum('GPGGA,120000.00,3030.0000,N,10400.0000,E,1,08,1.0,500.0,M,0.0,M,,')
+    gnss.feed(good[:-2].encode() + b'ZZ\r\n' + good[:-2].encode() + b'0\r\n' + good.encode() + b'\r\n')
+    assert gnss.checksum_errors == 2 and gnss.sentences == 1
+    gnss._parse_nmea(good[:-2] + 'ZZ')
+    assert gnss.checksum_errors == 3
+
+
+def gga(time_str, quality, lat='3030.0000', lon='10400.0000'):
+    return f'GPGGA,{time_str},{lat},{"N" if lat else ""},{lon},{"E" if lon else ""},{quality},08,1.0,500.0,M,0.0,M,,'
+
+
+def test_history_records_only_valid_fixes():
+    gnss = GNSS()
+    feed_lines(gnss, gga('120000.00', 1), t_ns=1_000_000_000)
+    for k in range(1, 6):
+        # 失去定位后接收机仍输出语句, 坐标为空或为旧值
+        feed_lines(gnss, gga(f'12000{k}.00', 0, lat='', lon=''), t_ns=(1 + k) * 1_000_000_000)
+        feed_lines(gnss, f'GPRMC,12000{k}.00,V,3030.0000,N,10400.0000,E,0.0,0.0,010124,,,N',
+                   t_ns=(1 + k) * 1_000_000_000 + 1000)
+    assert gnss.position_at(1.0)['latitude'] == 30.5
+    assert gnss.position_at(1.5)['latitude'] == 30.5  # 失去定位之前保持
+    assert gnss.position_at(2.5) is None
+    assert gnss.position_at(6.0) is None
+    assert gnss.history.count == 2  # 一个有效定位和一个失去定位标记
+
+
+def test_history_query_after_ring_wraps():
+    from GNSS import FixHistory
+    history = FixHistory(capacity=4)
+    for k in range(7):
+        history.append(float(k), str(k), [30.0 + k, 104.0, 500.0, 1.0, (340.0 + 5 * k) % 360, 1.0])
+    assert history.start == 3 and history.count == 4
+    assert history.position_at(2.5) is None  # 已被覆盖
+    fix = history.position_at(3.5)
+    assert fix['latitude'] == 33.5
+    assert abs(fix['course'] - 357.5) < 1e-9  # 355 -> 0 度, 按最短角度插值
+    lat = history.positions_at([3.0, 5.25, 6.0, 6.5])['latitude']
+    assert lat.tolist() == [33.0, 35.25, 36.0, 36.0]
+
+
+def test_history_does_not_interpolate_across_outage():
+    gnss = GNSS()
+    feed_lines(gnss, gga('120000.00', 1, lat='3000.0000'), t_ns=1_000_000_000)
+    feed_lines(gnss, gga('120001.00', 0, lat='', lon=''), t_ns=2_000_000_000)
+    feed_lines(gnss, gga('120005.00', 1, lat='3100.0000'), t_ns=6_000_000_000)
+    feed_lines(gnss, gga('120006.00', 1, lat='3200.0000'), t_ns=7_000_000_000)
+    assert gnss.position_at(4.0) is None
+    lat = gnss.positions_at([1.0, 1.9, 4.0, 6.5])['latitude']
+    assert lat[0] == 30.0 and lat[1] == 30.0
+    assert lat[2] != lat[2]  # NaN
+    assert abs(lat[3] - (31 + 32) / 2) < 1e-9
+
+
+@pytest.fixture
+def receiver(request):
+    from gnss_simulator import SimulatedReceiver
+    sim = SimulatedReceiver(**getattr(request, 'param', {}))
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.mark.parametrize('receiver', [{'baudrate': 38400, 'rate_hz': 5}], indirect=True)
+def test_detect_baudrate(receiver):
+    gnss = GNSS(port=receiver.path, baudrate=9600)
+    try:
+        assert gnss.detect_baudrate((9600, 115200, 38400), duration=0.5) == 38400
+        assert gnss.serial_conn.baudrate == 38400
+    finally:
+        gnss.disconnect()
+
+
+def test_detect_baudrate_without_receiver_output():
+    from gnss_simulator import SimulatedReceiver
+    sim = SimulatedReceiver(baudrate=57600)
+    sim.start()
+    try:
+        gnss = GNSS(port=sim.path)
+        assert gnss.detect_baudrate((9600, 115200), duration=0.3) is None
+        gnss.disconnect()
+    finally:
+        sim.stop()
+
+
+@pytest.mark.parametrize('receiver, protocol', [({'protocol': 'pmtk'}, 'pmtk'),
+                                                ({'protocol': 'ubx'}, 'ubx'),
+                                                ({'protocol': 'ubx'}, 'auto')],
+                         indirect=['receiver'])
+def test_configure_receiver(receiver, protocol):
+    gnss = GNSS(port=receiver.path, baudrate=115200)
+    try:
+        assert gnss.configure_receiver(115200, rate_hz=10, sentences=('GGA', 'RMC'), protocol=protocol)
+        assert receiver.baudrate == 115200 and gnss.baudrate == 115200
+        assert receiver.rate_hz == 10
+        assert set(receiver.sentences) == {'GGA', 'RMC'}
+    finally:
+        gnss.disconnect()
+
+
+def test_configure_receiver_verify_fails_when_link_too_slow(receiver):
+    # 9600 bps 下全部语句无法以 10 Hz 输出
+    gnss = GNSS(port=receiver.path)
+    try:
+        assert not gnss.configure_receiver(9600, rate_hz=10, sentences=('GGA', 'RMC', 'GSA', 'GSV', 'VTG', 'GLL'),
+                                           gsv_divider=1, protocol='pmtk')
+        assert receiver.rate_hz == 10
+    finally:
+        gnss.disconnect()
+
+
+def test_subscribe_notifies_on_watched_field_changes():
+    gnss = GNSS()
+    positions, everything = [], []
+    sub = gnss.subscribe(positions.append, fields=('latitude', 'longitude'))
+    gnss.subscribe(everything.append, fields=())
+    feed_lines(gnss, gga('120000.00', 1, lat='3000.0000'))
+    feed_lines(gnss, 'GNGSA,A,3,01,02,,,,,,,,,,,1.8,0.9,1.5,1')  # 位置没变
+    feed_lines(gnss, gga('120001.00', 1, lat='3030.0000'))
+    assert [fix.latitude for fix in positions] == [30.0, 30.5]
+    assert len(everything) == 3 and everything[1].pdop == 1.8
+
+    gnss.unsubscribe(sub)
+    gnss.unsubscribe(sub)  # 重复取消不报错
+    feed_lines(gnss, gga('120002.00', 1, lat='3100.0000'))
+    assert len(positions) == 2 and len(everything) == 4
+    with pytest.raises(ValueError):
+        gnss.subscribe(print, fields=('no_such_field',))
+
+
+def test_subscribe_while_reader_thread_dispatches():
+    import threading
+    gnss = GNSS()
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        k = 0
+        while not stop.is_set():
+            feed_lines(gnss, gga(f'12{k // 60 % 60:02d}{k % 60:02d}.00', 1, lat=f'30{k % 60:02d}.0000'))
+            k += 1
+
+    def churn():
+        try:
+            for _ in range(2000):
+                gnss.unsubscribe(gnss.subscribe(lambda fix: None))
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    workers = [threading.Thread(target=churn) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stop.set()
+    thread.join()
+    assert not errors and gnss._subscribers == ()
+
+
+def test_stream_yields_latest_fix_and_unsubscribes():
+    import asyncio
+
+    async def scenario():
+        gnss = GNSS()
+        stream = gnss.stream(fields=('latitude',))
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert len(gnss._subscribers) == 1
+        # 读取线程中喂入数据, 回调通过 call_soon_threadsafe 送回事件循环
+        await asyncio.to_thread(feed_lines, gnss, gga('120000.00', 1, lat='3000.0000'))
+        assert (await asyncio.wait_for(first, 5)).latitude == 30.0
+
+        # 消费者跟不上时只保留最新的快照
+        for k, lat in enumerate(('3010.0000', '3020.0000', '3030.0000'), 1):
+            await asyncio.to_thread(feed_lines, gnss, gga(f'12000{k}.00', 1, lat=lat))
+        await asyncio.sleep(0.01)
+        assert (await asyncio.wait_for(stream.__anext__(), 5)).latitude == 30.5
+
+        await stream.aclose()
+        assert gnss._subscribers == ()
+
+    asyncio.run(scenario())
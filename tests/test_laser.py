@@ -0,0 +1,252 @@
+import numpy as np
+
+from laser import LD_F_LEN, LD_HEADER, LidarFrameReader
+
+
+def make_frames(n):
+    """n 个帧头正确、内容各不相同的帧"""
+    frames = []
+    for i in range(n):
+        body = bytes((i * 7 + k) & 0xFF for k in range(LD_F_LEN - 2)).replace(b'\xaa', b'\xab')
+        frames.append(LD_HEADER + body)
+    return frames
+
+
+def test_feed_larger_than_buffer():
+    frames = make_frames(300)
+    data = b''.join(frames)
+    reader = LidarFrameReader(buf_size=1024)
+    assert len(data) > 10 * len(reader.buf)
+    assert b''.join(reader.feed(data)) == data
+    assert reader.frame_count == 300
+    assert reader.resyncs == 0
+
+
+def test_feed_frames_kept_until_next_feed():
+    frames = make_frames(50)
+    reader = LidarFrameReader(buf_size=512)
+    out = list(reader.feed(b'\x00\x01' + b''.join(frames)))
+    assert [bytes(f) for f in out] == frames
+    assert reader.dropped_bytes == 2
+
+
+def test_feed_split_across_calls():
+    frames = make_frames(20)
+    data = b''.join(frames)
+    reader = LidarFrameReader(buf_size=2 * LD_F_LEN)
+    out = []
+    for start in range(0, len(data), 37):
+        out.extend(bytes(f) for f in reader.feed(data[start:start + 37]))
+    assert out == frames
+
+
+def test_data_handle_matches_batch():
+    import laser
+    from generators import synthetic_stream
+    data = synthetic_stream(200, noise=0)
+    laser.LD_DataHandleBatch(data)
+    batch = laser.ax_lidar_data.copy()
+    laser.ax_lidar_data[:] = 0
+    for i in range(0, len(data), LD_F_LEN):
+        laser.LD_DataHandle(memoryview(data)[i:i + LD_F_LEN])
+    assert np.array_equal(laser.ax_lidar_data, batch)
+    # 每个角度取该圈最后一个点
+    angles, distances = laser.LD_DecodeFrames(data[-20 * LD_F_LEN:])
+    expected = dict(zip(angles.astype(int).ravel().tolist(), distances.ravel().tolist()))
+    assert {i: int(batch[i]) for i in expected} == expected
+
+
+def test_data_handle_updates_obstacle_index_only_when_given():
+    import laser
+    from generators import synthetic_stream
+    frame = synthetic_stream(1, noise=0)
+    laser.LD_DataHandle(frame)
+    assert laser.ax_obstacle_index.nearest() == (None, None)
+    index = laser.ObstacleIndex()
+    laser.LD_DataHandle(frame, index)
+    angles, distances = laser.LD_DecodeFrames(frame)
+    valid = distances > index.min_distance
+    assert index.nearest()[1] == distances[valid].min()
+
+
+def brute_nearest(values, start, end, min_distance):
+    bins = len(values)
+    angles = range(bins) if start % bins == end % bins else \
+        [a % bins for a in range(start, end if start <= end else end + bins)]
+    best = None
+    for a in angles:
+        if values[a] > min_distance and (best is None or values[a] < best[1]):
+            best = (a, values[a])
+    return best or (None, None)
+
+
+def test_obstacle_index_matches_brute_force():
+    from laser import ObstacleIndex
+    rng = np.random.default_rng(0)
+    for bins in (360, 720, 100):
+        index = ObstacleIndex(bins)
+        values = np.zeros(bins, dtype=np.int64)
+        for _ in range(200):
+            n = int(rng.integers(1, 40))
+            idx = rng.integers(0, bins, n)
+            dist = rng.integers(0, 3000, n)
+            index.update_many(idx, dist)
+            for i, d in zip(idx, dist):
+                values[i] = d
+            assert index.nearest() == brute_nearest(values, 0, 0, index.min_distance)
+            start, end = (int(x) for x in rng.integers(0, bins, 2))
+            assert index.nearest_in(start, end) == brute_nearest(values, start, end, index.min_distance)
+        i = int(rng.integers(0, bins))
+        index.update(i, 10)
+        values[i] = 10
+        assert index.nearest() == brute_nearest(values, 0, 0, index.min_distance)
+
+
+def test_obstacle_index_refreshes_only_touched_sectors_across_zero():
+    from laser import ObstacleIndex
+    index = ObstacleIndex(360)
+    refreshed = []
+    refresh = index._refresh
+    index._refresh = lambda sectors: (refreshed.append(sorted(sectors)), refresh(sectors))
+    index.update_many(list(range(350, 360)) + list(range(0, 8)), [1000] * 17 + [200])
+    assert refreshed == [[0, 21, 22]]
+    assert index.nearest() == (7, 200)
+    index.update_many([7], [5000])
+    assert index.nearest() == (0, 1000)
+
+
+def test_obstacle_alarm_transitions_and_default_sector():
+    from laser import ObstacleIndex
+    index = ObstacleIndex(720)
+    events = []
+    index.add_alarm(500, lambda active, angle, distance: events.append((active, angle, distance)))
+    index.update_many([700], [300])
+    index.update_many([700], [250])
+    assert index.any_closer(500)
+    index.update_many([700], [2000])
+    assert events == [(True, 700, 300), (False, 700, 2000)]
+    assert not index.any_closer(500)
+
+
+def test_scan_buffer_splits_revolutions_at_zero():
+    from laser import ScanBuffer
+    buf = ScanBuffer()
+    angles = np.arange(0, 360, 0.5)
+    # 从半圈开始: 第一次回绕之前的数据不完整, 不发布
+    assert buf.update(angles[360:], np.full(360, 1)) == 0
+    assert buf.update(angles[:400], np.full(400, 2)) == 0
+    assert buf.latest() is None
+    assert buf.update(np.concatenate((angles[400:], angles[:10])), [2] * 320 + [3] * 10) == 1
+
+    scan = buf.latest()
+    assert scan.seq == 1 and len(scan.distances) == 360
+    assert (scan.distances == 2).all()
+    assert not scan.distances.flags.writeable
+    # 快照之后的写入不影响已发布的快照
+    buf.update(angles[10:], np.full(710, 3))
+    assert buf.update(angles[:1], [3]) == 1
+    assert (scan.distances == 2).all() and (buf.latest().distances == 3).all()
+
+
+def test_scan_buffer_counts_revolutions_of_decoded_stream():
+    from laser import ScanBuffer, LD_DecodeFrames
+    from generators import synthetic_stream
+    angles, distances = LD_DecodeFrames(synthetic_stream(100, noise=0))  # 每圈 20 帧
+    buf = ScanBuffer()
+    # 5 次回绕, 第一次之前的数据不完整
+    assert sum(buf.update(a, d) for a, d in zip(angles, distances)) == 4
+    assert buf.latest().seq == 4
+
+
+def test_scan_buffer_ignores_duplicate_and_jittering_frames():
+    from laser import ScanBuffer
+    buf = ScanBuffer()
+    frame = np.linspace(10, 28, 25)
+    buf.update(np.linspace(300, 359, 25), np.full(25, 1))
+    buf.update(frame, np.full(25, 2))  # 回绕, 开始第一整圈
+    # 重复的帧和小幅回退都不是新的一圈
+    assert buf.update(frame, np.full(25, 3)) == 0
+    assert buf.update(frame - 5, np.full(25, 4)) == 0
+    assert buf.update(np.linspace(30, 359, 100), np.full(100, 5)) == 0
+    assert buf.update([1.0], [6]) == 1
+    scan = buf.latest()
+    # 同一角度箱以最后写入的点为准
+    assert scan.distances[10] == 4 and scan.distances[28] == 3 and scan.distances[359] == 5
+
+
+def test_scan_buffer_sub_degree_resolution():
+    from laser import ScanBuffer
+    buf = ScanBuffer(resolution=0.25)
+    assert buf.bins == 1440
+    buf.update([350.0], [1])
+    buf.update([10.3, 10.4, 90.0, 359.9], [100, 200, 300, 400])
+    buf.update([0.0], [0])
+    scan = buf.latest()
+    assert scan.distances[41] == 200  # 10.3 和 10.4 落在同一个 0.25 度角度箱
+    assert scan.distances[360] == 300 and scan.distances[1439] == 400
+    x, y = buf.xy(scan)
+    assert np.isclose(x[360], 0, atol=1e-9) and np.isclose(y[360], 300)
+    assert np.isclose(x[41], 200 * np.cos(np.deg2rad(10.25)))
+
+
+def test_wait_next_and_async_next_scan():
+    import asyncio
+    import threading
+    from laser import ScanBuffer
+    buf = ScanBuffer()
+    assert buf.wait_next(timeout=0.05) is None
+    buf.update([350.0], [0])
+
+    def revolutions(n):
+        # 每次从 0 度开始写一整圈, 回绕时完成上一圈 (第一次回绕之前的不发布)
+        for i in range(n):
+            buf.update(np.arange(0, 360, 10.0), np.full(36, i))
+
+    thread = threading.Thread(target=revolutions, args=(3,))
+    thread.start()
+    scan = buf.wait_next(after_seq=0, timeout=5)
+    thread.join()
+    assert scan is not None and scan.seq >= 1
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        # 已有更新的一圈时立即返回
+        assert (await buf.next_scan(after_seq=0)).seq == 2
+        waiting = loop.create_task(buf.next_scan())
+        await asyncio.sleep(0.01)
+        await loop.run_in_executor(None, revolutions, 1)
+        return await asyncio.wait_for(waiting, 5)
+
+    scan = asyncio.run(scenario())
+    assert scan.seq == 3 and (scan.distances[::10] == 2).all()
+
+
+def test_point_cloud_buffer_keeps_raw_points():
+    from laser import PointCloudBuffer
+    buf = PointCloudBuffer(max_points=50, depth=2)
+    buf.update([200.0, 300.0], [9, 9])  # 不完整的一圈, 丢弃
+    buf.update(np.linspace(0, 359, 40), np.arange(40))
+    buf.update(np.linspace(0, 359, 60), np.arange(60))
+    first = buf.latest()
+    assert first.seq == 1
+    assert np.array_equal(first.angles, np.linspace(0, 359, 40))
+    assert np.array_equal(first.distances, np.arange(40))
+    assert not first.angles.flags.writeable and not first.distances.flags.writeable
+    x, y = first.xy()
+    assert np.allclose(x, first.distances * np.cos(np.deg2rad(first.angles)), atol=0.05)
+
+    buf.update([0.0], [0])
+    assert buf.latest().seq == 2 and len(buf.latest().distances) == 50
+    assert buf.overflow == 10
+
+
+def test_polar_to_xy_lookup_table():
+    from laser import LD_PolarToXY, LD_ANGLE_LUT_SCALE
+    angles = np.array([0.0, 45.0, 90.0, 180.0, 270.0, 359.999, 123.456])
+    distances = np.full(len(angles), 1000.0)
+    x, y = LD_PolarToXY(angles, distances)
+    # 角度按 1/64 度取整, 误差不超过半个单位对应的弧长
+    tolerance = 1000 * np.deg2rad(0.5 / LD_ANGLE_LUT_SCALE)
+    assert np.allclose(x, distances * np.cos(np.deg2rad(angles)), atol=tolerance)
+    assert np.allclose(y, distances * np.sin(np.deg2rad(angles)), atol=tolerance)
+    assert x[0] == 1000 and y[0] == 0 and x[5] == 1000  # 359.999 取整到 360, 回绕到 0
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+from lidar_codec import LidarEncoder, LidarDecoder, encode_json, FORMATS, FORMAT_DELTA
+
+
+def scans(n, points=360, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 8000, points).astype(np.uint16)
+    for _ in range(n):
+        yield base + rng.integers(0, 20, points).astype(np.uint16)
+
+
+def test_encode_json_accepts_ndarray():
+    distances = np.arange(360, dtype=np.uint16)
+    payload = encode_json(1.5, distances)
+    assert json.loads(payload) == {'timestamp': 1.5, 'lidar_data': list(range(360))}
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_round_trip(fmt):
+    encoder = LidarEncoder(fmt, keyframe_interval=4)
+    decoder = LidarDecoder()
+    for i, distances in enumerate(scans(12)):
+        decoded = decoder.decode(encoder.encode(100.0 + i, distances))
+        assert decoded['timestamp'] == 100.0 + i
+        assert decoded['lidar_data'] == distances.tolist()
+        assert json.loads(encode_json(100.0 + i, distances))['lidar_data'] == decoded['lidar_data']
+
+
+def test_delta_lost_message_costs_one_scan():
+    encoder = LidarEncoder(FORMAT_DELTA, keyframe_interval=10)
+    decoder = LidarDecoder()
+    data = list(scans(10))
+    payloads = [encoder.encode(float(i), d) for i, d in enumerate(data)]
+    del payloads[3]
+    del data[3]
+    for payload, distances in zip(payloads, data):
+        assert decoder.decode(payload)['lidar_data'] == distances.tolist()
+
+
+def test_delta_without_keyframe_fails():
+    encoder = LidarEncoder(FORMAT_DELTA)
+    payloads = [encoder.encode(float(i), d) for i, d in enumerate(scans(3))]
+    with pytest.raises(ValueError):
+        LidarDecoder().decode(payloads[1])
+
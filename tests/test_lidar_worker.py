@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+import simple_lidar_mqtt
+from capture import open_pty
+from generators import synthetic_stream
+from lidar_worker import LidarWorker, STATUS_FAILED, STATUS_RUNNING
+
+
+def test_worker_reads_pty_stream_into_ring():
+    master, slave, path = open_pty()
+    worker = LidarWorker(path)
+    worker.start()
+    try:
+        # 工作进程启动时等待 1 s 再发送启动命令
+        deadline = time.monotonic() + 5
+        while worker.ring.status != STATUS_RUNNING and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert worker.ring.status == STATUS_RUNNING
+        stream = synthetic_stream(400, noise=0)
+        for pos in range(0, len(stream), 1024):
+            os.write(master, stream[pos:pos + 1024])
+            time.sleep(0.002)
+
+        scan, missed = worker.ring.wait_next(0, timeout=5)
+        # 全部写完才开始读, 最旧的几圈可能已被覆盖, 跳过的圈数计入 missed
+        assert scan is not None and scan.seq == missed + 1
+        assert len(scan.distances) == 360 and scan.distances.any()
+        del scan
+        deadline = time.monotonic() + 5
+        while worker.ring.stats()['frames'] < 400 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = worker.ring.stats()
+        assert stats['frames'] == 400 and stats['bytes_read'] == len(stream)
+        assert stats['pid'] == worker.process.pid and stats['status'] == 'running'
+        assert not worker.failed()
+    finally:
+        worker.stop()
+        os.close(master)
+        os.close(slave)
+    assert worker.process.exitcode == 0
+
+
+def test_worker_reports_serial_failure(monkeypatch):
+    worker = LidarWorker('/nonexistent/ttyLIDAR')
+    worker.start()
+    try:
+        assert worker.ring.wait_next(0, timeout=0.5) == (None, 0)
+        worker.process.join(5)
+        assert worker.failed() and worker.process.exitcode == 1
+        assert worker.ring.status == STATUS_FAILED
+
+        # 发布循环等待超时后发现工作进程已结束, 不会一直等待
+        monkeypatch.setattr(simple_lidar_mqtt, 'LIDAR_WORKER', True)
+        with pytest.raises(RuntimeError):
+            simple_lidar_mqtt.publish_loop(None, worker.ring, None, worker)
+    finally:
+        worker.stop()
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+
+import pytest
+
+from mqtt_local_broker import LocalBroker
+from mqtt_publisher import MqttPublisher, unpack_batch, BATCH_SUFFIX
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker()
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def make_publisher(broker, **kwargs):
+    kwargs.setdefault('reconnect_min', 0.1)
+    kwargs.setdefault('reconnect_max', 0.2)
+    return MqttPublisher('127.0.0.1', broker.port, **kwargs)
+
+
+def payloads(broker, topic):
+    return [m.payload for m in broker.messages if m.topic == topic]
+
+
+@pytest.mark.parametrize('qos', [0, 1])
+def test_reconnect_delivers_each_message_once(broker, qos):
+    publisher = make_publisher(broker, qos=qos)
+    publisher.start()
+    try:
+        assert wait_for(lambda: publisher.connected)
+        for i in range(3):
+            publisher.publish('lidar', b'%d' % i)
+        # QoS 0 的 on_publish 在写入 socket 时触发, 等服务器真正收到再断开
+        assert publisher.flush() and wait_for(lambda: len(broker.messages) == 3)
+
+        broker.disconnect_all()
+        # QoS 0 在 paho 发现断线前写入 socket 的消息会丢失 (最多一次), 这里只检查断线期间入队的消息
+        assert wait_for(lambda: not publisher.connected or publisher.connects == 2)
+        for i in range(3, 6):
+            publisher.publish('lidar', b'%d' % i)
+        assert wait_for(lambda: publisher.connects == 2 and publisher.flush(0.1))
+    finally:
+        publisher.stop()
+    assert wait_for(lambda: payloads(broker, 'lidar') == [b'%d' % i for i in range(6)])
+
+
+@pytest.mark.parametrize('qos', [0, 1])
+def test_publish_while_paho_disconnected_is_not_duplicated(broker, qos):
+    # 发送线程认为已连接, 但 paho 还没有连接 (断线通知到达前的竞争): publish 返回 NO_CONN
+    publisher = make_publisher(broker, qos=qos, max_inflight=10)
+    publisher.connected = True
+    publisher.running = True
+    publisher.thread = threading.Thread(target=publisher._run, daemon=True)
+    publisher.thread.start()
+    try:
+        for i in range(3):
+            publisher.publish('lidar', b'%d' % i)
+        assert wait_for(lambda: not publisher.connected)
+        if qos:
+            # paho 保留了消息, 按在途处理, 不再放回队列
+            assert len(publisher._inflight) == 1 and len(publisher.queue) == 2
+        else:
+            assert not publisher._inflight and len(publisher.queue) == 3
+
+        publisher.client.connect_async('127.0.0.1', broker.port)
+        publisher.client.loop_start()
+        assert wait_for(lambda: publisher.published == 3)
+        time.sleep(0.2)
+    finally:
+        publisher.stop()
+    # paho 保留的消息在重连后重发, 可能排在后面的消息之后
+    assert sorted(payloads(broker, 'lidar')) == [b'0', b'1', b'2']
+
+
+def test_full_queue_drops_oldest(broker):
+    broker.refuse = True
+    publisher = make_publisher(broker, qos=1, max_queue=4)
+    publisher.start()
+    try:
+        for i in range(10):
+            publisher.publish('lidar', b'%d' % i)
+        assert publisher.dropped == 6
+        broker.refuse = False
+        assert wait_for(lambda: publisher.published == 4)
+    finally:
+        publisher.stop()
+    assert payloads(broker, 'lidar') == [b'6', b'7', b'8', b'9']
+    assert publisher.metrics()['queue_max_depth'] == 4
+
+
+@pytest.mark.parametrize('max_batch', [None, 5])
+def test_batching_is_opt_in(broker, max_batch):
+    broker.refuse = True
+    kwargs = {'max_batch': max_batch} if max_batch else {}
+    publisher = make_publisher(broker, qos=1, **kwargs)
+    publisher.start()
+    try:
+        messages = [json.dumps({'seq': i}).encode() for i in range(10)]
+        for payload in messages:
+            publisher.publish('lidar', payload)
+        broker.refuse = False
+        assert wait_for(lambda: publisher.published == 10)
+    finally:
+        publisher.stop()
+
+    if max_batch is None:
+        # 默认不合并, 订阅端只需要订阅原主题
+        assert payloads(broker, 'lidar') == messages
+        assert not payloads(broker, 'lidar' + BATCH_SUFFIX)
+    else:
+        batches = payloads(broker, 'lidar' + BATCH_SUFFIX)
+        assert publisher.batches == len(batches) == 2
+        assert [item for batch in batches for item in unpack_batch(batch)] == [{'seq': i} for i in range(10)]
@@ -0,0 +1,78 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from lidar_worker import ScanRing
+
+
+@pytest.fixture
+def ring():
+    ring = ScanRing.create(4)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def write_scans(ring, first, last):
+    for value in range(first, last + 1):
+        ring.write(np.full(360, value, dtype=np.uint16), float(value), float(value))
+
+
+def test_next_reports_missed_after_overrun(ring):
+    write_scans(ring, 1, 2)
+    scan, missed = ring.next(0)
+    assert scan.seq == 1 and missed == 0
+
+    # 消费者停在 1, 写者又写了 8 圈: 只能从 seq - slots + 2 开始读
+    write_scans(ring, 3, 10)
+    scan, missed = ring.next(1)
+    assert scan.seq == 8 and missed == 6
+    assert scan.distances[0] == 8 and ring.valid(scan)
+    scan, missed = ring.next(scan.seq)
+    assert scan.seq == 9 and missed == 0
+    assert ring.next(10) == (None, 0)
+    assert ring.read(2) is None
+
+
+def test_valid_after_overwrite(ring):
+    write_scans(ring, 1, 1)
+    scan = ring.latest()
+    assert ring.valid(scan)
+    write_scans(ring, 2, 4)
+    assert ring.valid(scan)
+    # 第 5 圈写入同一个槽, 之前的零拷贝视图已经不是第 1 圈的数据
+    write_scans(ring, 5, 5)
+    assert not ring.valid(scan)
+    assert scan.distances[0] == 5
+    del scan
+
+
+def _reader_main(name, results):
+    ring = ScanRing.attach(name)
+    try:
+        scan = ring.latest()
+        results.put((scan.seq, int(scan.distances.sum()), ring.data.flags.writeable or ring.slot_time.flags.writeable))
+        scan, missed = ring.wait_next(scan.seq, timeout=5)
+        results.put((scan.seq, int(scan.distances[0]), missed))
+        del scan
+    finally:
+        ring.close()
+
+
+def test_attach_from_separate_process(ring):
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    write_scans(ring, 1, 1)
+    process = ctx.Process(target=_reader_main, args=(ring.name, results))
+    process.start()
+    try:
+        assert results.get(timeout=10) == (1, 360, False)
+        write_scans(ring, 2, 2)
+        assert results.get(timeout=5) == (2, 2, 0)
+    finally:
+        process.join(5)
+    assert process.exitcode == 0
+    # 读者进程退出后共享内存仍然可用
+    write_scans(ring, 3, 3)
+    assert ring.latest().distances[0] == 3
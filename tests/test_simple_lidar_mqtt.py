@@ -0,0 +1,52 @@
+import numpy as np
+
+import simple_lidar_mqtt
+from lidar_codec import LidarEncoder, LidarDecoder, FORMAT_DELTA
+from lidar_worker import ScanRing
+
+
+class RecordingClient:
+    def __init__(self):
+        self.payloads = []
+
+    def publish(self, topic, payload):
+        self.payloads.append(payload)
+
+
+class OverwritingEncoder(LidarEncoder):
+    """编码第一圈期间工作进程写入了两圈新数据, 覆盖了正在编码的槽"""
+
+    def __init__(self, ring):
+        super().__init__(FORMAT_DELTA)
+        self.ring = ring
+        self.calls = 0
+
+    def encode(self, timestamp, distances):
+        payload = super().encode(timestamp, distances)
+        self.calls += 1
+        if self.calls == 1:
+            for i in range(2):
+                self.ring.write(np.full(360, 100 + i, dtype=np.uint16), 2.0 + i, 2.0 + i)
+        return payload
+
+
+def test_torn_scan_is_not_published():
+    ring = ScanRing.create(2)
+    try:
+        ring.write(np.arange(360, dtype=np.uint16), 1.0, 1.0)
+        client = RecordingClient()
+        encoder = OverwritingEncoder(ring)
+
+        scan = ring.read(1)
+        assert not simple_lidar_mqtt.publish_data(client, scan, encoder, ring)
+        assert client.payloads == [] and simple_lidar_mqtt.torn_scans == 1
+
+        # 丢弃的是完整帧: 下一圈重新发送完整帧, 新的订阅端可以直接解码
+        scan, missed = ring.next(1)
+        assert simple_lidar_mqtt.publish_data(client, scan, encoder, ring)
+        decoded = LidarDecoder().decode(client.payloads[0])
+        assert decoded['lidar_data'] == scan.distances.tolist()
+        del scan
+    finally:
+        ring.close()
+        ring.unlink()
@@ -0,0 +1,182 @@
+import asyncio
+import copy
+import os
+import sys
+import time
+
+import pytest
+
+from supervisor import Component, COMPONENT_DEFAULTS, load_config, start_order
+
+
+def component_config(**values):
+    config = copy.deepcopy(COMPONENT_DEFAULTS)
+    config.update(values)
+    return config
+
+
+def python(code):
+    return [sys.executable, '-c', code]
+
+
+def test_start_order_puts_dependencies_first():
+    components = {
+        'video': component_config(command='v', depends_on=['airunit']),
+        'airunit': component_config(command='a', depends_on=['podman']),
+        'podman': component_config(command='p'),
+        'debug': component_config(command='d', enabled=False),
+    }
+    assert start_order(components) == ['podman', 'airunit', 'video']
+
+
+def test_start_order_rejects_cycles_and_disabled_dependencies():
+    cycle = {
+        'a': component_config(command='a', depends_on=['b']),
+        'b': component_config(command='b', depends_on=['a']),
+    }
+    with pytest.raises(ValueError, match='循环依赖'):
+        start_order(cycle)
+
+    disabled = {
+        'a': component_config(command='a', depends_on=['b']),
+        'b': component_config(command='b', enabled=False),
+    }
+    with pytest.raises(ValueError, match='未启用'):
+        start_order(disabled)
+
+
+def test_repository_config_has_no_placeholder_commands():
+    config = load_config()
+    order = start_order(config['components'])
+    assert order.index('compose') < order.index('stream')
+    for name in order:
+        command = config['components'][name]['command']
+        assert not any('/path/to/' in arg for arg in command), name
+
+
+def test_probes(tmp_path):
+    async def scenario():
+        component = Component('probe', component_config(command='true'), str(tmp_path))
+        assert await component.check({'type': 'path', 'path': str(tmp_path)})
+        assert not await component.check({'type': 'path', 'path': str(tmp_path / 'missing')})
+
+        server = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        assert await component.check({'type': 'tcp', 'port': port})
+        server.close()
+        await server.wait_closed()
+        assert not await component.check({'type': 'tcp', 'port': port})
+
+        assert await component.check({'type': 'command', 'command': python('pass')})
+        assert not await component.check({'type': 'command', 'command': python('raise SystemExit(3)')})
+        assert not await component.check({'type': 'command', 'command': python('import time; time.sleep(5)'),
+                                          'timeout': 0.2})
+        with pytest.raises(ValueError):
+            await component.check({'type': 'unknown'})
+    asyncio.run(scenario())
+
+
+def test_log_ready_probe_and_scheduling_in_child(tmp_path):
+    code = ("import os; print('affinity', sorted(os.sched_getaffinity(0)), 'nice', os.getpriority(os.PRIO_PROCESS, 0)); "
+            "print('ready', flush=True); import time; time.sleep(30)")
+    config = component_config(command=python(code), ready={'type': 'log', 'pattern': '^ready'},
+                              ready_timeout=10, cpus=[0], nice=5, restart='no')
+
+    async def scenario():
+        component = Component('child', config, str(tmp_path))
+        task = asyncio.get_running_loop().create_task(component.run())
+        await asyncio.wait_for(component.ready.wait(), 10)
+        assert component.startup_time is not None
+        await component.stop()
+        await task
+
+    asyncio.run(scenario())
+    log = (tmp_path / 'child.log').read_text()
+    # CPU 绑定和 nice 在 exec 之前设置, 程序启动时已经生效
+    assert f"affinity [0] nice {os.getpriority(os.PRIO_PROCESS, 0) + 5}" in log
+
+
+def test_scheduling_failure_is_logged_and_component_still_starts(tmp_path):
+    # 普通用户不能设置 SCHED_FIFO; root 下这一项会成功, 只检查组件照常启动
+    config = component_config(command=python("print('started')"), rt_priority=1, restart='no')
+
+    async def scenario():
+        component = Component('rt', config, str(tmp_path))
+        await component.run()
+        return component
+
+    component = asyncio.run(scenario())
+    assert component.last_exit == 0
+    log = (tmp_path / 'rt.log').read_text()
+    assert 'started' in log
+    if os.geteuid() != 0:
+        assert '设置 SCHED_FIFO 失败' in log
+
+
+def test_restart_backoff_doubles_up_to_max(tmp_path):
+    config = component_config(command=python('raise SystemExit(1)'), backoff_min=0.05, backoff_max=0.2,
+                              restart='on-failure')
+
+    async def scenario():
+        component = Component('crash', config, str(tmp_path))
+        launches = []
+        launch = component._launch
+
+        async def recording_launch():
+            launches.append(time.monotonic())
+            await launch()
+        component._launch = recording_launch
+
+        task = asyncio.get_running_loop().create_task(component.run())
+        while len(launches) < 6:
+            await asyncio.sleep(0.01)
+        await component.stop()
+        await asyncio.wait_for(task, 5)
+        return component, launches
+
+    component, launches = asyncio.run(scenario())
+    gaps = [b - a for a, b in zip(launches, launches[1:])]
+    # 退避 0.05, 0.1, 0.2, 0.2, 0.2 (另加进程运行时间)
+    for gap, backoff in zip(gaps, (0.05, 0.1, 0.2, 0.2, 0.2)):
+        assert backoff <= gap < backoff + 0.5
+    assert component.restarts == 5
+
+
+def test_failed_launch_keeps_backing_off(tmp_path):
+    # 命令不存在时 _launch 抛出 OSError, 不能因为上一次的启动时间而把退避重置为 backoff_min
+    config = component_config(command=[str(tmp_path / 'missing')], backoff_min=0.05, backoff_max=0.2)
+
+    async def scenario():
+        component = Component('missing', config, str(tmp_path))
+        launches = []
+        launch = component._launch
+
+        async def recording_launch():
+            launches.append(time.monotonic())
+            await launch()
+        component._launch = recording_launch
+
+        task = asyncio.get_running_loop().create_task(component.run())
+        while len(launches) < 5:
+            await asyncio.sleep(0.01)
+        await component.stop()
+        await asyncio.wait_for(task, 5)
+        return component, launches
+
+    component, launches = asyncio.run(scenario())
+    gaps = [b - a for a, b in zip(launches, launches[1:])]
+    for gap, backoff in zip(gaps, (0.05, 0.1, 0.2, 0.2)):
+        assert backoff <= gap < backoff + 0.5
+    assert component.starts == 0 and component.last_exit is None
+
+
+def test_on_failure_does_not_restart_clean_exit(tmp_path):
+    config = component_config(command=python('pass'), restart='on-failure')
+
+    async def scenario():
+        component = Component('oneshot', config, str(tmp_path))
+        await asyncio.wait_for(component.run(), 10)
+        return component
+
+    component = asyncio.run(scenario())
+    assert component.starts == 1 and component.restarts == 0 and component.last_exit == 0
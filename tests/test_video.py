@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+gi = pytest.importorskip('gi')
+try:
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+except (ValueError, ImportError):
+    pytest.skip('没有 GStreamer 1.0', allow_module_level=True)
+
+Gst.init(None)
+for _element in ('videotestsrc', 'videorate', 'videoscale', 'videoconvert', 'x264enc', 'h264parse', 'mpegtsmux',
+                 'appsink'):
+    if Gst.ElementFactory.find(_element) is None:
+        pytest.skip(f'没有 GStreamer 元素 {_element}', allow_module_level=True)
+
+import video
+from video import VideoPipeline
+
+# 测试用的小档位, 避免在测试机上编码 1080p60
+PROFILES = [
+    (320, 240, 30, 500, 30),
+    (160, 120, 15, 200, 15),
+    (96, 64, 10, 100, 10),
+]
+
+
+def test_test_source_runs_and_counts_frames(tmp_path):
+    out = tmp_path / 'out.ts'
+    pipeline = VideoPipeline('test', f'file:{out}', profiles=PROFILES, adapt=False, frame_bus=True)
+    pipeline.run(duration=3)
+    stats = pipeline.stats()
+
+    frames = stats['frames']
+    assert list(frames) == ['source', 'rate', 'queue', 'encode', 'sink']
+    assert frames['source'] >= 30 and frames['encode'] > 0 and frames['sink'] > 0
+    assert list(stats['drops']) == ['rate', 'queue', 'encode', 'sink']
+    # 每一段只会丢帧, 不会多出帧
+    assert all(stats['drops'][stage] >= 0 for stage in ('rate', 'queue', 'encode'))
+    assert stats['profile'] == 0 and stats['frame_bus'] > 0
+    assert pipeline.latency.total > 0
+    assert out.stat().st_size > 0
+
+
+def test_set_profile_updates_caps_and_encoder():
+    pipeline = VideoPipeline('test', 'fake', profiles=PROFILES)
+    pipeline.set_profile(1)
+    caps = pipeline.scalecaps.get_property('caps').get_structure(0)
+    assert (caps.get_value('width'), caps.get_value('height')) == (160, 120)
+    rate = pipeline.ratecaps.get_property('caps').get_structure(0)
+    assert rate.get_fraction('framerate')[1:] == (15, 1)
+    assert pipeline.enc.get_property('bitrate') == 200
+    assert pipeline.enc.get_property('key-int-max') == 15
+    assert pipeline.profile == 1 and pipeline.profile_changes == 1
+
+    # 超出范围时取最低档
+    pipeline.set_profile(10)
+    assert pipeline.profile == 2 and pipeline.enc.get_property('bitrate') == 100
+    pipeline.set_profile(2)
+    assert pipeline.profile_changes == 2
+
+
+def tick(pipeline, rate, encoded, latencies=(), qos=0):
+    """注入一个周期的帧数、延迟样本和 QoS 消息数, 然后执行一次档位控制"""
+    with pipeline.lock:
+        pipeline.frames['rate'] += rate
+        pipeline.frames['encode'] += encoded
+        pipeline._window = list(latencies)
+    pipeline._qos_in_window = qos
+    pipeline._control()
+    return pipeline.profile
+
+
+def test_control_steps_down_on_overload_and_up_when_calm():
+    pipeline = VideoPipeline('test', 'fake', profiles=PROFILES, latency_target=100)
+    assert tick(pipeline, 0, 0) == 0  # 第一个周期只记录帧数
+
+    # 编码前丢掉一半: 降一档
+    assert tick(pipeline, 100, 50, [20] * 10) == 1
+    # 降档后 DOWN_HOLD 内不再降
+    assert tick(pipeline, 100, 50, [20] * 10) == 1
+
+    # 延迟 p90 超过目标: 降档
+    pipeline._last_change -= video.DOWN_HOLD
+    assert tick(pipeline, 100, 100, [20] * 8 + [150] * 2) == 2
+    # 已是最低档
+    pipeline._last_change -= video.DOWN_HOLD
+    assert tick(pipeline, 100, 100, qos=1) == 2
+
+    # 没有过载但空闲时间不到 UP_HOLD: 不升档
+    assert tick(pipeline, 100, 100, [20] * 10) == 2
+    pipeline._calm_since -= video.UP_HOLD
+    # 延迟不低于目标的一半: 不升档
+    assert tick(pipeline, 100, 100, [60] * 10) == 2
+    assert tick(pipeline, 100, 100, [20] * 10) == 1
+    # 升档后重新计时
+    assert tick(pipeline, 100, 100, [20] * 10) == 1
+    # 没有延迟样本时不升档
+    pipeline._calm_since -= video.UP_HOLD
+    assert tick(pipeline, 0, 0) == 1
+    assert pipeline.profile_changes == 3
+
+
+def test_control_does_not_adapt_when_disabled():
+    pipeline = VideoPipeline('test', 'fake', profiles=PROFILES, adapt=False)
+    tick(pipeline, 0, 0)
+    pipeline._last_change = time.monotonic() - video.DOWN_HOLD
+    assert tick(pipeline, 100, 10, [500] * 10, qos=3) == 0
+    assert pipeline.profile_changes == 0